@@ -0,0 +1,330 @@
+"""
+Benchmarks for the Cosine Similarity implementation.
+
+This script measures the throughput of the text pipeline on synthetic
+corpora, so performance changes can be compared between versions.
+
+The suite sweeps vector dimension, density (the fraction of non-zero
+components), vocabulary size and document count, recording throughput
+(higher is better) and peak traced memory (lower is better) per
+configuration. Results can be saved as a JSON baseline; later runs are
+compared against it and the script exits with status 1 when a tracked
+metric is worse than the baseline by more than the tolerance.
+
+Run it directly:
+    python benchmark_cosine_similarity.py
+    python benchmark_cosine_similarity.py --save-baseline baseline.json
+    python benchmark_cosine_similarity.py --baseline baseline.json --tolerance 0.25
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from typing import List, Dict, Callable, Optional
+
+from cosine_similarity import CosineSimilarity, SparseVector, Vocabulary, np
+
+
+# Sweeps used by the full suite; --quick uses the first two values of each
+DIMENSIONS = [16, 256, 4096]
+DENSITIES = [0.01, 0.1, 0.5]
+VOCABULARY_SIZES = [100, 1000, 10000]
+DOCUMENT_COUNTS = [50, 100, 200]
+
+
+def make_corpus(documents: int, words_per_document: int, vocabulary_size: int,
+                seed: int = 0) -> List[str]:
+    """
+    Generate a synthetic corpus of random-word documents.
+
+    Args:
+        documents: Number of documents
+        words_per_document: Number of tokens per document
+        vocabulary_size: Number of distinct words to draw from
+        seed: Random seed, for reproducible corpora
+
+    Returns:
+        List[str]: The documents
+    """
+    rng = random.Random(seed)
+    words = [f"w{index}" for index in range(vocabulary_size)]
+    return [" ".join(rng.choice(words) for _ in range(words_per_document))
+            for _ in range(documents)]
+
+
+def best_time(function: Callable[[], object], repeat: int = 3) -> float:
+    """
+    Run a function several times and return the fastest run in seconds.
+
+    Args:
+        function: Function to time
+        repeat: Number of runs
+
+    Returns:
+        float: Fastest wall-clock time in seconds
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def benchmark_tokenizer(texts: List[str], repeat: int = 3) -> Dict[str, float]:
+    """
+    Measure tokenizer throughput in MB/s.
+
+    Compares plain ``CosineSimilarity.tokenize`` with batch tokenization into
+    interned token ids (``Vocabulary.encode_batch``), for a fresh vocabulary
+    and for one that already holds every word.
+
+    Args:
+        texts: Documents to tokenize
+        repeat: Number of timed runs per measurement (fastest is kept)
+
+    Returns:
+        Dict[str, float]: Throughput in MB/s per tokenizer variant
+    """
+    megabytes = sum(len(text.encode("utf-8")) for text in texts) / 1e6
+    warm = Vocabulary(texts)
+
+    timings = {
+        "tokenize": best_time(
+            lambda: [CosineSimilarity.tokenize(text) for text in texts], repeat),
+        "encode_batch_new_vocabulary": best_time(
+            lambda: Vocabulary().encode_batch(texts), repeat),
+        "encode_batch_warm_vocabulary": best_time(
+            lambda: warm.encode_batch(texts), repeat),
+    }
+    return {name: megabytes / seconds for name, seconds in timings.items()}
+
+
+def peak_memory(function: Callable[[], object]) -> int:
+    """
+    Run a function once and return the peak memory it allocated.
+
+    Args:
+        function: Function to measure
+
+    Returns:
+        int: Peak traced allocation in bytes while the function ran
+    """
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def make_vectors(count: int, dimension: int, density: float = 1.0,
+                 seed: int = 0) -> List[List[float]]:
+    """
+    Generate random dense vectors with a given fraction of non-zeros.
+
+    Args:
+        count: Number of vectors
+        dimension: Length of every vector
+        density: Fraction of components that are non-zero (1 - sparsity)
+        seed: Random seed, for reproducible vectors
+
+    Returns:
+        List[List[float]]: The vectors
+    """
+    rng = random.Random(seed)
+    nonzero = max(1, int(dimension * density))
+    vectors = []
+    for _ in range(count):
+        vector = [0.0] * dimension
+        for index in rng.sample(range(dimension), nonzero):
+            vector[index] = rng.uniform(-1.0, 1.0)
+        vectors.append(vector)
+    return vectors
+
+
+def run_suite(quick: bool = False, repeat: int = 3) -> Dict[str, Dict]:
+    """
+    Run the benchmark sweeps.
+
+    Args:
+        quick: Only run the two smallest values of each sweep
+        repeat: Number of timed runs per measurement (fastest is kept)
+
+    Returns:
+        Dict[str, Dict]: Metric name mapped to its ``value``, ``unit`` and
+        ``higher_is_better`` flag
+    """
+    def sweep(values):
+        return values[:2] if quick else values
+
+    metrics: Dict[str, Dict] = {}
+
+    def record(name, value, unit, higher_is_better=True):
+        metrics[name] = {"value": value, "unit": unit,
+                         "higher_is_better": higher_is_better}
+
+    # Dense vector operations by dimension
+    for dimension in sweep(DIMENSIONS):
+        a, b = make_vectors(2, dimension, seed=dimension)
+        calls = max(1, 200000 // dimension)
+        seconds = best_time(lambda: [CosineSimilarity.dot_product(a, b)
+                                     for _ in range(calls)], repeat)
+        record(f"dot_product/dimension={dimension}", calls * dimension / seconds,
+               "elements/s")
+        seconds = best_time(lambda: [CosineSimilarity.magnitude(a)
+                                     for _ in range(calls)], repeat)
+        record(f"magnitude/dimension={dimension}", calls * dimension / seconds,
+               "elements/s")
+
+    # Sparse vector operations by density
+    dimension = DIMENSIONS[-1]
+    for density in sweep(DENSITIES):
+        dense = make_vectors(2, dimension, density=density, seed=int(density * 100))
+        a, b = (SparseVector.from_dense(vector) for vector in dense)
+        calls = max(1, 200000 // max(1, a.nnz))
+        seconds = best_time(lambda: [CosineSimilarity.cosine_similarity(a, b)
+                                     for _ in range(calls)], repeat)
+        record(f"sparse_cosine/density={density}", calls / seconds, "pairs/s")
+
+    # Text pipeline by vocabulary size
+    for vocabulary_size in sweep(VOCABULARY_SIZES):
+        texts = make_corpus(200, 30, vocabulary_size, seed=vocabulary_size)
+        words = sum(len(text.split()) for text in texts)
+        seconds = best_time(lambda: CosineSimilarity.build_vocabulary(texts), repeat)
+        record(f"build_vocabulary/vocabulary={vocabulary_size}", words / seconds,
+               "tokens/s")
+        vocabulary = CosineSimilarity.build_vocabulary(texts)
+        seconds = best_time(lambda: [CosineSimilarity.text_to_vector(text, vocabulary)
+                                     for text in texts], repeat)
+        record(f"text_to_vector/vocabulary={vocabulary_size}", len(texts) / seconds,
+               "documents/s")
+        seconds = best_time(lambda: [CosineSimilarity.document_similarity(first, second)
+                                     for first, second in zip(texts, texts[1:])], repeat)
+        record(f"document_similarity/vocabulary={vocabulary_size}",
+               (len(texts) - 1) / seconds, "pairs/s")
+
+    # Similarity matrix by document count
+    for documents in sweep(DOCUMENT_COUNTS):
+        texts = make_corpus(documents, 30, 1000, seed=documents)
+        seconds = best_time(lambda: CosineSimilarity.similarity_matrix(
+            texts, use_numpy=False), repeat)
+        record(f"similarity_matrix/documents={documents}", documents ** 2 / seconds,
+               "pairs/s")
+        record(f"similarity_matrix_memory/documents={documents}",
+               peak_memory(lambda: CosineSimilarity.similarity_matrix(
+                   texts, use_numpy=False)), "bytes", higher_is_better=False)
+        if np is not None:
+            # Row-at-a-time streaming must not redo the corpus per row
+            seconds = best_time(lambda: sum(1 for _ in CosineSimilarity.iter_similarity_matrix(
+                texts, block_size=1, use_numpy=True)), repeat)
+            record(f"iter_similarity_matrix_numpy/documents={documents}",
+                   documents ** 2 / seconds, "pairs/s")
+    return metrics
+
+
+def compare_to_baseline(metrics: Dict[str, Dict], baseline: Dict[str, Dict],
+                        tolerance: float = 0.25) -> List[str]:
+    """
+    Find metrics that regressed against a baseline.
+
+    Args:
+        metrics: Metrics from ``run_suite``
+        baseline: Metrics from an earlier run
+        tolerance: Allowed relative change in the bad direction (0.25 allows
+            25% lower throughput or 25% more memory)
+
+    Returns:
+        List[str]: One message per regressed metric (empty when none did);
+        metrics missing from either side are ignored
+
+    Example:
+        >>> old = {"m": {"value": 100.0, "unit": "ops/s", "higher_is_better": True}}
+        >>> new = {"m": {"value": 70.0, "unit": "ops/s", "higher_is_better": True}}
+        >>> compare_to_baseline(new, old)
+        ['m: 70 ops/s vs baseline 100 ops/s (-30.0%)']
+        >>> compare_to_baseline(new, old, tolerance=0.5)
+        []
+    """
+    regressions = []
+    for name, current in metrics.items():
+        previous = baseline.get(name)
+        if previous is None or not previous["value"]:
+            continue
+        change = current["value"] / previous["value"] - 1.0
+        worse = -change if current["higher_is_better"] else change
+        if worse > tolerance:
+            regressions.append(f"{name}: {current['value']:.4g} {current['unit']} vs "
+                               f"baseline {previous['value']:.4g} {previous['unit']} "
+                               f"({change:+.1%})")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Run the benchmarks, print the results and check them against a baseline.
+
+    Args:
+        argv: Command-line arguments (defaults to ``sys.argv[1:]``)
+
+    Returns:
+        int: Exit status, 1 when a metric regressed beyond the tolerance
+    """
+    parser = argparse.ArgumentParser(description="Cosine similarity benchmarks")
+    parser.add_argument("--baseline", help="JSON baseline to compare against")
+    parser.add_argument("--save-baseline", metavar="PATH",
+                        help="write the results as a JSON baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed relative regression (default: 0.25)")
+    parser.add_argument("--quick", action="store_true",
+                        help="only run the smallest configurations")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="timed runs per measurement (default: 3)")
+    args = parser.parse_args(argv)
+
+    print("=" * 60)
+    print("COSINE SIMILARITY - BENCHMARKS")
+    print("=" * 60)
+
+    texts = make_corpus(documents=2000 if args.quick else 20000,
+                        words_per_document=30, vocabulary_size=5000)
+    print("\nTokenizer throughput (MB/s):")
+    tokenizer = benchmark_tokenizer(texts, args.repeat)
+    for name, throughput in tokenizer.items():
+        print(f"  {name:30} {throughput:8.2f}")
+
+    metrics = run_suite(args.quick, args.repeat)
+    for name, throughput in tokenizer.items():
+        metrics[f"tokenizer/{name}"] = {"value": throughput, "unit": "MB/s",
+                                        "higher_is_better": True}
+    print("\nSuite:")
+    for name, metric in metrics.items():
+        print(f"  {name:45} {metric['value']:14.1f} {metric['unit']}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as file:
+            json.dump({"python": platform.python_version(), "metrics": metrics},
+                      file, indent=2, sort_keys=True)
+        print(f"\nBaseline written to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)["metrics"]
+        regressions = compare_to_baseline(metrics, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} metric(s) regressed beyond "
+                  f"{args.tolerance:.0%}:")
+            for message in regressions:
+                print(f"  {message}")
+            return 1
+        print(f"\nNo regressions beyond {args.tolerance:.0%} "
+              f"against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
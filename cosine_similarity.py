@@ -24,276 +24,3140 @@ Course: CC 104 - Data Structures and Algorithms
 Date: 2025
 """
 
+import argparse
+import contextlib
+import csv
+import functools
+import hashlib
+import heapq
+import itertools
+import json
 import math
-from typing import List, Dict, Tuple, Union
-from collections import Counter
+import multiprocessing
+import operator
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from typing import (List, Dict, Tuple, Union, Sequence, Optional, Callable,
+                    Hashable, Iterable, Collection, Iterator, Mapping, TextIO, Set,
+                    Deque)
+from array import array
+from collections import Counter, OrderedDict, deque
+from collections.abc import Mapping as MappingABC
+
+try:
+    import numpy as np
+except ImportError:
+    # NumPy is optional; the pure Python implementation is used without it
+    np = None
+
+
+class SparseVector:
+    """
+    A sparse vector stored as sorted index/value arrays.
+
+    Only the non-zero entries are kept, so operations on a term frequency
+    vector cost O(non-zeros) instead of O(vocabulary size). ``len()``
+    returns the full dimension, which keeps sparse vectors interchangeable
+    with dense lists in the length checks of ``CosineSimilarity``.
+
+    Example:
+        >>> vec = SparseVector.from_dense([0.0, 2.0, 0.0, 1.0])
+        >>> vec.indices, vec.values
+        ((1, 3), (2.0, 1.0))
+        >>> vec.to_dense()
+        [0.0, 2.0, 0.0, 1.0]
+    """
+
+    __slots__ = ("indices", "values", "dimension", "_lookup")
+
+    def __init__(self, indices: Sequence[int], values: Sequence[float],
+                 dimension: int):
+        """
+        Create a sparse vector from parallel index and value sequences.
+
+        Args:
+            indices: Positions of the non-zero entries (any order)
+            values: Values matching ``indices``
+            dimension: Full length of the vector
+
+        Raises:
+            ValueError: If the sequences differ in length, an index is out of
+                range or an index is repeated
+        """
+        if len(indices) != len(values):
+            raise ValueError("Indices and values must have the same length")
+
+        # Keep entries sorted by index and drop explicit zeros
+        pairs = sorted((int(i), float(v)) for i, v in zip(indices, values) if v)
+        for position, (index, _) in enumerate(pairs):
+            if index < 0 or index >= dimension:
+                raise ValueError(f"Index {index} out of range for dimension {dimension}")
+            if position and pairs[position - 1][0] == index:
+                raise ValueError(f"Duplicate index {index} in sparse vector")
+
+        self.indices: Tuple[int, ...] = tuple(index for index, _ in pairs)
+        self.values: Tuple[float, ...] = tuple(value for _, value in pairs)
+        self.dimension = dimension
+        self._lookup = None
+
+    @classmethod
+    def from_dict(cls, mapping: Dict[int, float], dimension: int) -> "SparseVector":
+        """
+        Create a sparse vector from an ``{index: value}`` dictionary.
+
+        Args:
+            mapping: Dictionary of non-zero entries
+            dimension: Full length of the vector
+
+        Returns:
+            SparseVector: The sparse vector
+        """
+        return cls(list(mapping.keys()), list(mapping.values()), dimension)
+
+    @classmethod
+    def from_dense(cls, vector: Sequence[float]) -> "SparseVector":
+        """
+        Create a sparse vector from a dense list of numbers.
+
+        Args:
+            vector: Dense vector as a list of numbers
+
+        Returns:
+            SparseVector: The sparse vector
+        """
+        indices = [i for i, value in enumerate(vector) if value]
+        return cls(indices, [vector[i] for i in indices], len(vector))
+
+    def to_dense(self) -> List[float]:
+        """
+        Expand the sparse vector into a dense list of floats.
+
+        Returns:
+            List[float]: Dense representation of the vector
+        """
+        dense = [0.0] * self.dimension
+        for index, value in zip(self.indices, self.values):
+            dense[index] = value
+        return dense
+
+    def as_dict(self) -> Dict[int, float]:
+        """
+        Return the non-zero entries as an ``{index: value}`` dictionary.
+
+        The dictionary is built once and cached, since it is used for
+        lookups in repeated dot products.
+
+        Returns:
+            Dict[int, float]: Mapping of index to value
+        """
+        if self._lookup is None:
+            self._lookup = dict(zip(self.indices, self.values))
+        return self._lookup
+
+    @property
+    def nnz(self) -> int:
+        """Number of stored (non-zero) entries."""
+        return len(self.indices)
+
+    def dot(self, other: Union["SparseVector", Sequence[float]]) -> float:
+        """
+        Calculate the dot product with a sparse or dense vector.
+
+        Products are summed in ascending index order, matching the result of
+        the dense ``CosineSimilarity.dot_product`` bit for bit.
+
+        Args:
+            other: Sparse or dense vector of the same dimension
+
+        Returns:
+            float: The dot product
+        """
+        if not isinstance(other, SparseVector):
+            return sum(value * other[index]
+                       for index, value in zip(self.indices, self.values))
+
+        # Walk the shorter vector and look entries up in the longer one
+        if self.nnz <= other.nnz:
+            shorter, lookup = self, other.as_dict()
+        else:
+            shorter, lookup = other, self.as_dict()
+        return sum(value * lookup[index]
+                   for index, value in zip(shorter.indices, shorter.values)
+                   if index in lookup)
+
+    def squared_norm(self) -> float:
+        """
+        Calculate the sum of squared entries.
+
+        Returns:
+            float: The squared Euclidean norm
+        """
+        return sum(value * value for value in self.values)
+
+    def __len__(self) -> int:
+        return self.dimension
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, SparseVector):
+            return NotImplemented
+        return (self.dimension == other.dimension
+                and self.indices == other.indices
+                and self.values == other.values)
+
+    def __repr__(self) -> str:
+        entries = dict(zip(self.indices, self.values))
+        return f"SparseVector({entries}, dimension={self.dimension})"
+
+
+class CompactVector:
+    """
+    A dense vector stored as contiguous float32 values with a cached norm.
+    
+    A ``List[float]`` costs roughly 32 bytes per element (an 8-byte pointer
+    plus a 24-byte boxed float); a CompactVector stores each element in 4
+    bytes of an ``array.array('f')``. Values are rounded to float32 precision
+    on construction. The magnitude is computed on first use and cached, so
+    ``CosineSimilarity.magnitude`` on a CompactVector is O(1) afterwards.
+    
+    Example:
+        >>> vec = CompactVector([3, 4])
+        >>> vec.norm, vec.nbytes, vec.tolist()
+        (5.0, 8, [3.0, 4.0])
+    """
+    
+    __slots__ = ("values", "_norm")
+    
+    def __init__(self, values: Iterable[float]):
+        """
+        Create a compact vector.
+        
+        Args:
+            values: Elements of the vector (a SparseVector is expanded);
+                they are always copied, so the vector never shares storage
+                with the caller
+        """
+        if isinstance(values, SparseVector):
+            values = values.to_dense()
+        self.values = array("f", values)
+        self._norm: Optional[float] = None
+    
+    @property
+    def norm(self) -> float:
+        """Magnitude of the vector, computed once and cached."""
+        if self._norm is None:
+            self._norm = math.sqrt(sum(value * value for value in self.values))
+        return self._norm
+    
+    @property
+    def nbytes(self) -> int:
+        """Bytes used by the element buffer."""
+        return len(self.values) * self.values.itemsize
+    
+    def dot(self, other: "CompactVector") -> float:
+        """
+        Calculate the dot product with another CompactVector.
+        
+        Args:
+            other: Vector of the same length
+            
+        Returns:
+            float: The dot product
+        """
+        return sum(map(operator.mul, self.values, other.values))
+    
+    def tolist(self) -> List[float]:
+        """
+        Copy the values into a list of floats.
+        
+        Returns:
+            List[float]: The vector as a list
+        """
+        return self.values.tolist()
+    
+    def __len__(self) -> int:
+        return len(self.values)
+    
+    def __getitem__(self, index: int) -> float:
+        return self.values[index]
+    
+    def __iter__(self) -> Iterator[float]:
+        return iter(self.values)
+    
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, CompactVector):
+            return NotImplemented
+        return self.values == other.values
+    
+    def __repr__(self) -> str:
+        return f"CompactVector({self.values.tolist()})"
+
+
+# A vector accepted by CosineSimilarity: a dense list of numbers, a
+# SparseVector or a CompactVector
+Vector = Union[List[float], SparseVector, CompactVector]
+
+
+class Vocabulary(MappingABC):
+    """
+    A growable word-to-index mapping with stable indices.
+    
+    Unlike ``CosineSimilarity.build_vocabulary``, which rebuilds and re-sorts
+    the whole dictionary on every call, a Vocabulary is built once and then
+    extended in place: new words get the next free index and existing words
+    never change index. Adding documents therefore costs work proportional to
+    the new documents only.
+    
+    The indices stored in vectors built earlier stay correct, but those
+    vectors keep the dimension the vocabulary had when they were built, so
+    they cannot be compared with newer, longer vectors directly. Resize
+    them first, e.g. ``SparseVector(old.indices, old.values, len(vocab))``.
+    
+    A Vocabulary is a read-only Mapping, so it can be passed anywhere a
+    ``Dict[str, int]`` vocabulary is accepted.
+    
+    Example:
+        >>> vocab = Vocabulary(["hello world"])
+        >>> dict(vocab)
+        {'hello': 0, 'world': 1}
+        >>> vocab.add_documents(["hello python"])
+        1
+        >>> vocab["python"], len(vocab)
+        (2, 3)
+    """
+    
+    def __init__(self, texts: Iterable[str] = ()):
+        """
+        Create a vocabulary, optionally seeded from texts.
+        
+        Args:
+            texts: Text documents whose words are added in order
+        """
+        self._indices: Dict[str, int] = {}
+        self._words: List[str] = []
+        self.add_documents(texts)
+    
+    def add(self, word: str) -> int:
+        """
+        Add a single word if missing and return its index.
+        
+        Args:
+            word: A token as produced by ``CosineSimilarity.tokenize``
+            
+        Returns:
+            int: The stable index of the word
+        """
+        index = self._indices.get(word)
+        if index is None:
+            index = len(self._words)
+            self._indices[word] = index
+            self._words.append(word)
+        return index
+    
+    def add_documents(self, texts: Iterable[str]) -> int:
+        """
+        Add the words of several documents.
+        
+        Words are numbered in order of first appearance; words already in the
+        vocabulary keep their index.
+        
+        Args:
+            texts: Text documents
+            
+        Returns:
+            int: Number of new words added
+        """
+        size = len(self._words)
+        for text in texts:
+            for word in CosineSimilarity.tokenize(text):
+                self.add(word)
+        return len(self._words) - size
+    
+    def encode(self, text: str, grow: bool = True) -> List[int]:
+        """
+        Tokenize a text straight into word indices.
+        
+        The returned token ids can be reused for both vocabulary building
+        and vectorization (see ``CosineSimilarity.ids_to_vector``), so the
+        text only has to be tokenized once.
+        
+        Args:
+            text: Input text string
+            grow: Add unseen words to the vocabulary; if False, unseen
+                words are dropped
+            
+        Returns:
+            List[int]: Index of every token, in text order
+            
+        Example:
+            >>> vocab = Vocabulary()
+            >>> vocab.encode("to be or not to be")
+            [0, 1, 2, 3, 0, 1]
+        """
+        indices = self._indices
+        lookup = indices.get
+        tokens = CosineSimilarity.tokenize(text)
+        if not grow:
+            return [indices[word] for word in tokens if word in indices]
+        
+        token_ids = []
+        for word in tokens:
+            index = lookup(word)
+            if index is None:
+                index = self.add(word)
+            token_ids.append(index)
+        return token_ids
+    
+    def encode_batch(self, texts: Iterable[str], grow: bool = True) -> List[List[int]]:
+        """
+        Tokenize several texts into word indices in one pass.
+        
+        Args:
+            texts: Text documents
+            grow: Add unseen words to the vocabulary
+            
+        Returns:
+            List[List[int]]: Token ids of every text
+        """
+        return [self.encode(text, grow) for text in texts]
+    
+    def word(self, index: int) -> str:
+        """
+        Return the word stored at an index.
+        
+        Args:
+            index: Word index
+            
+        Returns:
+            str: The word
+        """
+        return self._words[index]
+    
+    def __getitem__(self, word: str) -> int:
+        return self._indices[word]
+    
+    def __contains__(self, word) -> bool:
+        return word in self._indices
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._words)
+    
+    def __len__(self) -> int:
+        return len(self._words)
+    
+    def __repr__(self) -> str:
+        return f"Vocabulary({len(self._words)} words)"
+
+
+class PipelineHook:
+    """
+    Receiver of instrumentation events from the similarity pipeline.
+    
+    Subclass it and override the methods to feed a metrics system, then
+    register the hook with ``Instrumentation.add_hook``. Events are emitted
+    once per batch operation (not per pair), from the thread that ran it.
+    
+    Stages are "tokenize", "vocabulary", "vectorize" and "scoring";
+    counters are "documents", "tokens", "pairs_scored" and
+    "zero_vector_skips".
+    """
+    
+    def on_stage(self, stage: str, seconds: float) -> None:
+        """
+        Called when a pipeline stage finishes.
+        
+        Args:
+            stage: Name of the stage
+            seconds: Wall-clock time spent in the stage
+        """
+    
+    def on_count(self, counter: str, amount: int) -> None:
+        """
+        Called to increase a counter.
+        
+        Args:
+            counter: Name of the counter
+            amount: Amount to add
+        """
+
+
+class PipelineStats(PipelineHook):
+    """
+    A hook accumulating per-stage timings and counters in memory.
+    
+    Safe to share between threads.
+    
+    Example:
+        >>> with Instrumentation.collect() as stats:
+        ...     _ = CosineSimilarity.similarity_matrix(["a b", "b c"], use_numpy=False)
+        >>> stats.counters["documents"], stats.counters["pairs_scored"]
+        (2, 4)
+        >>> sorted(stats.seconds)
+        ['scoring', 'tokenize', 'vectorize', 'vocabulary']
+    """
+    
+    def __init__(self):
+        self.seconds: Dict[str, float] = {}
+        self.calls: Dict[str, int] = {}
+        self.counters: Counter = Counter()
+        self._lock = threading.Lock()
+    
+    def on_stage(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+            self.calls[stage] = self.calls.get(stage, 0) + 1
+    
+    def on_count(self, counter: str, amount: int) -> None:
+        with self._lock:
+            self.counters[counter] += amount
+    
+    def format_report(self) -> str:
+        """
+        Describe where the time went.
+        
+        Returns:
+            str: One line per stage with its share of the total time,
+            followed by the counters
+        """
+        with self._lock:
+            total = sum(self.seconds.values()) or 1.0
+            lines = [f"{stage:12} {self.calls[stage]:6} calls {seconds:10.6f}s "
+                     f"({100.0 * seconds / total:5.1f}%)"
+                     for stage, seconds in self.seconds.items()]
+            lines.extend(f"{counter:18} {amount}"
+                         for counter, amount in sorted(self.counters.items()))
+        return "\n".join(lines)
+    
+    def reset(self) -> None:
+        """Discard all collected timings and counters."""
+        with self._lock:
+            self.seconds.clear()
+            self.calls.clear()
+            self.counters.clear()
+
+
+class Instrumentation:
+    """
+    Registry of pipeline hooks.
+    
+    With no hooks registered (the default), instrumented operations only
+    read a clock and check an empty list once per batch, so the disabled
+    mode costs next to nothing.
+    """
+    
+    # Replaced rather than mutated, so emitters can iterate without locking
+    hooks: Tuple[PipelineHook, ...] = ()
+    _lock = threading.Lock()
+    
+    @staticmethod
+    def add_hook(hook: PipelineHook) -> None:
+        """
+        Start sending pipeline events to a hook.
+        
+        Args:
+            hook: The hook to register
+        """
+        with Instrumentation._lock:
+            Instrumentation.hooks = Instrumentation.hooks + (hook,)
+    
+    @staticmethod
+    def remove_hook(hook: PipelineHook) -> None:
+        """
+        Stop sending pipeline events to a hook.
+        
+        Args:
+            hook: A registered hook
+            
+        Raises:
+            ValueError: If the hook is not registered
+        """
+        with Instrumentation._lock:
+            hooks = list(Instrumentation.hooks)
+            hooks.remove(hook)
+            Instrumentation.hooks = tuple(hooks)
+    
+    @staticmethod
+    @contextlib.contextmanager
+    def collect(hook: Optional[PipelineHook] = None) -> Iterator[PipelineHook]:
+        """
+        Register a hook for the duration of a ``with`` block.
+        
+        Args:
+            hook: Hook to register (defaults to a new PipelineStats)
+            
+        Yields:
+            PipelineHook: The registered hook
+        """
+        hook = PipelineStats() if hook is None else hook
+        Instrumentation.add_hook(hook)
+        try:
+            yield hook
+        finally:
+            Instrumentation.remove_hook(hook)
+    
+    @staticmethod
+    def record(stage: str, started: float, **counters: int) -> None:
+        """
+        Emit a finished stage and its counters to every registered hook.
+        
+        Args:
+            stage: Name of the stage
+            started: ``time.perf_counter()`` value taken when it started
+            **counters: Counter increments to emit along with the stage
+        """
+        hooks = Instrumentation.hooks
+        if not hooks:
+            return
+        seconds = time.perf_counter() - started
+        for hook in hooks:
+            hook.on_stage(stage, seconds)
+            for counter, amount in counters.items():
+                hook.on_count(counter, amount)
 
 
 class CosineSimilarity:
     """
-    A class to compute cosine similarity between vectors or text documents.
+    A class to compute cosine similarity between vectors or text documents.
+    
+    This class provides methods to:
+    1. Calculate cosine similarity between numerical vectors
+    2. Calculate cosine similarity between text documents
+    3. Build term frequency vectors from text
+    4. Handle various input formats
+    """
+    
+    # Documents densified at a time by the tiled NumPy paths
+    NUMPY_TILE = 1024
+    
+    @staticmethod
+    def dot_product(vector_a: Vector, vector_b: Vector) -> float:
+        """
+        Calculate the dot product of two vectors.
+        
+        The dot product is the sum of the products of corresponding elements.
+        
+        Args:
+            vector_a: First vector (list of numbers, SparseVector or
+                CompactVector)
+            vector_b: Second vector (must have same length)
+            
+        Returns:
+            float: The dot product of the two vectors
+            
+        Raises:
+            ValueError: If vectors have different lengths
+            
+        Example:
+            >>> CosineSimilarity.dot_product([1, 2, 3], [4, 5, 6])
+            32.0
+        """
+        # Validate that both vectors have the same length
+        if len(vector_a) != len(vector_b):
+            raise ValueError("Vectors must have the same length for dot product")
+        
+        return CosineSimilarity._unchecked_dot(vector_a, vector_b)
+    
+    @staticmethod
+    def _unchecked_dot(vector_a: Vector, vector_b: Vector) -> float:
+        """
+        Dot product without the length check, for callers that validated already.
+        """
+        # Sparse vectors only touch their non-zero entries
+        if isinstance(vector_a, SparseVector):
+            return vector_a.dot(vector_b)
+        if isinstance(vector_b, SparseVector):
+            return vector_b.dot(vector_a)
+        if isinstance(vector_a, CompactVector) and isinstance(vector_b, CompactVector):
+            return vector_a.dot(vector_b)
+        
+        # Calculate dot product: sum of element-wise products
+        result = sum(a * b for a, b in zip(vector_a, vector_b))
+        return result
+    
+    @staticmethod
+    def magnitude(vector: Vector) -> float:
+        """
+        Calculate the magnitude (Euclidean norm) of a vector.
+        
+        The magnitude is the square root of the sum of squared elements.
+        
+        Args:
+            vector: A vector (list of numbers, SparseVector or CompactVector)
+            
+        Returns:
+            float: The magnitude of the vector
+            
+        Example:
+            >>> CosineSimilarity.magnitude([3, 4])
+            5.0
+        """
+        # Sparse vectors only sum their non-zero entries
+        if isinstance(vector, SparseVector):
+            return math.sqrt(vector.squared_norm())
+        
+        # Compact vectors cache their norm
+        if isinstance(vector, CompactVector):
+            return vector.norm
+        
+        # Calculate magnitude: sqrt(sum of squares)
+        sum_of_squares = sum(x * x for x in vector)
+        return math.sqrt(sum_of_squares)
+    
+    @staticmethod
+    def cosine_similarity(vector_a: Vector, vector_b: Vector) -> float:
+        """
+        Calculate the cosine similarity between two numerical vectors.
+        
+        This is the core algorithm implementation. It computes:
+        cosine_similarity = (A · B) / (||A|| × ||B||)
+        
+        Args:
+            vector_a: First vector (list of numbers, SparseVector or
+                CompactVector)
+            vector_b: Second vector (must have same length)
+            
+        Returns:
+            float: Cosine similarity value between -1 and 1
+            
+        Raises:
+            ValueError: If vectors have different lengths or are zero vectors
+            
+        Example:
+            >>> CosineSimilarity.cosine_similarity([1, 2, 3], [1, 2, 3])
+            1.0
+            >>> CosineSimilarity.cosine_similarity([1, 0], [0, 1])
+            0.0
+        """
+        # Validate vector lengths
+        if len(vector_a) != len(vector_b):
+            raise ValueError("Vectors must have the same length")
+        
+        # Calculate dot product (lengths are already validated)
+        dot_prod = CosineSimilarity._unchecked_dot(vector_a, vector_b)
+        
+        # Calculate magnitudes
+        magnitude_a = CosineSimilarity.magnitude(vector_a)
+        magnitude_b = CosineSimilarity.magnitude(vector_b)
+        
+        # Handle division by zero (when one or both vectors are zero vectors)
+        if magnitude_a == 0 or magnitude_b == 0:
+            raise ValueError("Cannot compute cosine similarity for zero vectors")
+        
+        # Calculate cosine similarity
+        similarity = dot_prod / (magnitude_a * magnitude_b)
+        
+        # Ensure result is within valid range [-1, 1] (handles floating point errors)
+        return max(-1.0, min(1.0, similarity))
+    
+    @staticmethod
+    def one_vs_many(query: Union[Vector, "NormalizedVector"],
+                    vectors: List[Union[Vector, "NormalizedVector"]]) -> List[float]:
+        """
+        Calculate the cosine similarity between one vector and many others.
+        
+        The query's magnitude is computed once, and vectors that are already
+        NormalizedVector instances reuse their cached magnitude, so each
+        comparison costs a single dot product.
+        
+        Args:
+            query: Query vector (plain or NormalizedVector)
+            vectors: Vectors to compare against (plain or NormalizedVector)
+            
+        Returns:
+            List[float]: Similarity of the query to each vector, in order
+            
+        Raises:
+            ValueError: If lengths differ or a zero vector is involved
+            
+        Example:
+            >>> CosineSimilarity.one_vs_many([1, 0], [[1, 0], [0, 1]])
+            [1.0, 0.0]
+        """
+        query = NormalizedVector.wrap(query)
+        return [query.similarity(NormalizedVector.wrap(vector)) for vector in vectors]
+    
+    @staticmethod
+    def tokenize(text: str) -> List[str]:
+        """
+        Tokenize a text string into words.
+        
+        Converts text to lowercase and splits by whitespace.
+        This is a simple tokenizer; for production use, consider using
+        more sophisticated NLP libraries.
+        
+        Args:
+            text: Input text string
+            
+        Returns:
+            List[str]: List of tokens (words)
+            
+        Example:
+            >>> CosineSimilarity.tokenize("Hello World Python")
+            ['hello', 'world', 'python']
+        """
+        # Convert to lowercase and split by whitespace
+        tokens = text.lower().split()
+        return tokens
+    
+    @staticmethod
+    def build_vocabulary(texts: List[str]) -> Dict[str, int]:
+        """
+        Build a vocabulary dictionary from a list of texts.
+        
+        Creates a mapping from each unique word to a unique index.
+        This is used to create consistent vector representations.
+        The dictionary is rebuilt from scratch on every call; use a
+        Vocabulary to grow one incrementally instead.
+        
+        Args:
+            texts: List of text strings
+            
+        Returns:
+            Dict[str, int]: Dictionary mapping words to indices
+            
+        Example:
+            >>> texts = ["hello world", "world python"]
+            >>> vocab = CosineSimilarity.build_vocabulary(texts)
+            >>> sorted(vocab.keys())
+            ['hello', 'python', 'world']
+        """
+        # Collect all unique words from all texts
+        vocabulary = set()
+        for text in texts:
+            tokens = CosineSimilarity.tokenize(text)
+            vocabulary.update(tokens)
+        
+        # Create mapping: word -> index
+        vocab_dict = {word: idx for idx, word in enumerate(sorted(vocabulary))}
+        return vocab_dict
+    
+    @staticmethod
+    def text_to_vector(text: str, vocabulary: Mapping[str, int],
+                       sparse: bool = False) -> Vector:
+        """
+        Convert a text document to a term frequency vector.
+        
+        Creates a vector where each dimension represents a word in the vocabulary,
+        and the value is the frequency of that word in the text.
+        
+        Args:
+            text: Input text string
+            vocabulary: Dictionary (or Vocabulary) mapping words to indices
+            sparse: Return a SparseVector holding only the words present in
+                the text instead of a dense list
+            
+        Returns:
+            Vector: Term frequency vector (dense list or SparseVector)
+            
+        Example:
+            >>> vocab = {'hello': 0, 'world': 1}
+            >>> CosineSimilarity.text_to_vector("hello hello world", vocab)
+            [2.0, 1.0]
+            >>> CosineSimilarity.text_to_vector("hello", vocab, sparse=True)
+            SparseVector({0: 1.0}, dimension=2)
+        """
+        # Tokenize the text
+        tokens = CosineSimilarity.tokenize(text)
+        
+        # Count word frequencies
+        word_counts = Counter(tokens)
+        
+        if sparse:
+            # Only store the words that occur in the text
+            entries = {vocabulary[word]: float(count)
+                       for word, count in word_counts.items()
+                       if word in vocabulary}
+            return SparseVector.from_dict(entries, len(vocabulary))
+        
+        # Initialize vector with zeros (one dimension per word in vocabulary)
+        vector = [0.0] * len(vocabulary)
+        
+        # Fill vector with term frequencies
+        for word, count in word_counts.items():
+            if word in vocabulary:
+                vector[vocabulary[word]] = float(count)
+        
+        return vector
+    
+    @staticmethod
+    def ids_to_vector(token_ids: Iterable[int], dimension: int,
+                      sparse: bool = False) -> Vector:
+        """
+        Convert pre-tokenized word indices to a term frequency vector.
+        
+        This is ``text_to_vector`` for texts already encoded with
+        ``Vocabulary.encode``, so no tokenization happens here.
+        
+        Args:
+            token_ids: Word indices of the text's tokens
+            dimension: Vocabulary size
+            sparse: Return a SparseVector instead of a dense list
+            
+        Returns:
+            Vector: Term frequency vector (dense list or SparseVector)
+            
+        Example:
+            >>> CosineSimilarity.ids_to_vector([0, 1, 0], 3)
+            [2.0, 1.0, 0.0]
+        """
+        counts = Counter(token_ids)
+        if sparse:
+            return SparseVector(list(counts.keys()),
+                                [float(count) for count in counts.values()], dimension)
+        vector = [0.0] * dimension
+        for index, count in counts.items():
+            vector[index] = float(count)
+        return vector
+    
+    @staticmethod
+    def document_similarity(text_a: str, text_b: str,
+                            vocabulary: Optional[Vocabulary] = None) -> float:
+        """
+        Calculate cosine similarity between two text documents.
+        
+        This method handles the complete pipeline:
+        1. Build vocabulary from both texts
+        2. Convert texts to vectors
+        3. Calculate cosine similarity
+        
+        Args:
+            text_a: First text document
+            text_b: Second text document
+            vocabulary: Persistent Vocabulary to reuse; words it is missing
+                are added to it instead of building a new vocabulary
+            
+        Returns:
+            float: Cosine similarity between the two documents (0 to 1)
+            
+        Example:
+            >>> CosineSimilarity.document_similarity("hello world", "hello python")
+            0.4082482904638631
+        """
+        # Tokenize each text once into a new or the shared vocabulary, and
+        # build sparse vectors (cost follows the number of words)
+        vector_a, vector_b = CosineSimilarity._vectorize_all([text_a, text_b], vocabulary)
+        
+        # Calculate and return cosine similarity
+        if not Instrumentation.hooks:
+            return CosineSimilarity.cosine_similarity(vector_a, vector_b)
+        started = time.perf_counter()
+        similarity = CosineSimilarity.cosine_similarity(vector_a, vector_b)
+        Instrumentation.record("scoring", started, pairs_scored=1)
+        return similarity
+    
+    @staticmethod
+    def similarity_matrix(texts: Union[List[str], List[Vector]],
+                          use_numpy: Optional[bool] = None,
+                          vocabulary: Optional[Vocabulary] = None
+                          ) -> List[List[float]]:
+        """
+        Calculate pairwise cosine similarity for a list of documents.
+        
+        Creates a similarity matrix where each entry [i][j] represents
+        the cosine similarity between document i and document j. Vectors
+        (lists, SparseVectors or CompactVectors) can be passed instead of
+        text documents.
+        
+        When NumPy is installed the matrix is computed with a single matrix
+        product over the row-normalized document-term matrix; otherwise the
+        pure Python double loop is used. Both give the same scores (up to
+        floating point rounding), clamped to [-1, 1].
+        
+        Args:
+            texts: List of text documents, or of vectors of the same length
+            use_numpy: True to require the NumPy backend, False to force the
+                pure Python one, None (default) to use NumPy when available
+            vocabulary: Persistent Vocabulary to reuse; words it is missing
+                are added to it instead of building a new vocabulary
+                (ignored for vectors)
+            
+        Returns:
+            List[List[float]]: Square matrix of similarity scores
+            
+        Raises:
+            ValueError: If a document has no words (zero vector) or vector
+                lengths differ
+            ImportError: If use_numpy is True but NumPy is not installed
+            
+        Example:
+            >>> texts = ["hello world", "hello python", "world python"]
+            >>> matrix = CosineSimilarity.similarity_matrix(texts)
+            >>> len(matrix)
+            3
+        """
+        use_numpy = CosineSimilarity._resolve_numpy(use_numpy)
+        vectors = CosineSimilarity._prepare_vectors(texts, vocabulary)
+        started = time.perf_counter()
+        
+        if use_numpy:
+            doc_term = CosineSimilarity._normalized_doc_term(vectors)
+            
+            # All pairwise scores in one product, clamped like cosine_similarity
+            scores = doc_term @ doc_term.T
+            np.clip(scores, -1.0, 1.0, out=scores)
+            matrix = scores.tolist()
+        else:
+            # Compute each magnitude once; every pair then needs only a dot product
+            normalized = [NormalizedVector(vector) for vector in vectors]
+            matrix = CosineSimilarity._similarity_rows(normalized, 0, len(normalized))
+        Instrumentation.record("scoring", started, pairs_scored=len(vectors) ** 2)
+        return matrix
+    
+    @staticmethod
+    def symmetric_similarity_matrix(texts: Union[List[str], List[Vector]],
+                                    use_numpy: Optional[bool] = None,
+                                    vocabulary: Optional[Vocabulary] = None,
+                                    block_size: int = 256) -> "SymmetricMatrix":
+        """
+        Calculate the pairwise similarity matrix, scoring each pair once.
+        
+        Cosine similarity is symmetric and the diagonal of non-zero vectors
+        is 1, so only the pairs i < j are computed (half the work of
+        ``similarity_matrix``) and stored packed as float32. The NumPy
+        backend densifies one tile of ``NUMPY_TILE`` documents at a time
+        instead of the whole document-term matrix.
+        
+        Args:
+            texts: List of text documents, or of vectors of the same length
+            use_numpy: Backend selection, as for ``similarity_matrix``
+            vocabulary: Persistent Vocabulary to reuse
+            block_size: Rows scored per matrix product with the NumPy backend
+            
+        Returns:
+            SymmetricMatrix: The packed matrix
+            
+        Raises:
+            ValueError: If a document has no words (zero vector) or vector
+                lengths differ
+            ImportError: If use_numpy is True but NumPy is not installed
+        """
+        if block_size < 1:
+            raise ValueError("block_size must be at least 1")
+        use_numpy = CosineSimilarity._resolve_numpy(use_numpy)
+        vectors = CosineSimilarity._prepare_vectors(texts, vocabulary)
+        n = len(vectors)
+        started = time.perf_counter()
+        values = array("f")
+        
+        if use_numpy:
+            units = CosineSimilarity._unit_rows(vectors)
+            for start in range(0, n, block_size):
+                # Only the columns from the block's first row onwards are needed
+                scores = CosineSimilarity._numpy_rows(
+                    units, n, start, min(start + block_size, n), column_start=start)
+                scores = scores.astype(np.float32)
+                for offset in range(len(scores)):
+                    values.frombytes(scores[offset, offset + 1:].tobytes())
+        else:
+            normalized = [NormalizedVector(vector) for vector in vectors]
+            if any(vector.is_zero for vector in normalized):
+                raise ValueError("Cannot compute cosine similarity for zero vectors")
+            for i in range(n):
+                vector = normalized[i]
+                values.extend(vector.similarity(other) for other in normalized[i + 1:])
+        Instrumentation.record("scoring", started, pairs_scored=n * (n - 1) // 2)
+        return SymmetricMatrix(n, values)
+    
+    @staticmethod
+    def iter_similarity_matrix(texts: Union[List[str], List[Vector]],
+                               block_size: int = 1,
+                               use_numpy: Optional[bool] = None,
+                               vocabulary: Optional[Vocabulary] = None
+                               ) -> Iterator[Tuple[int, List[List[float]]]]:
+        """
+        Generate the pairwise similarity matrix one block of rows at a time.
+        
+        Produces the same rows as ``similarity_matrix`` but never holds more
+        than ``block_size`` rows of scores, so peak memory for the scores is
+        O(block_size × n) instead of O(n²). The NumPy backend normalizes the
+        corpus once and densifies one tile of ``NUMPY_TILE`` documents at a
+        time instead of the whole document-term matrix. It scores at least
+        ``NUMPY_TILE`` rows per pass and yields them ``block_size`` at a
+        time, so it holds O(max(block_size, NUMPY_TILE) × n) scores.
+        
+        Args:
+            texts: List of text documents, or of vectors of the same length
+            block_size: Number of rows per yielded block
+            use_numpy: Backend selection, as for ``similarity_matrix``
+            vocabulary: Persistent Vocabulary to reuse
+            
+        Yields:
+            Tuple[int, List[List[float]]]: Index of the first row in the
+            block, and the rows of the block
+            
+        Raises:
+            ValueError: If block_size is not positive or a document has no
+                words (zero vector)
+            ImportError: If use_numpy is True but NumPy is not installed
+            
+        Example:
+            >>> texts = ["hello world", "hello python", "world python"]
+            >>> [start for start, rows in
+            ...  CosineSimilarity.iter_similarity_matrix(texts, block_size=2)]
+            [0, 2]
+        """
+        if block_size < 1:
+            raise ValueError("block_size must be at least 1")
+        use_numpy = CosineSimilarity._resolve_numpy(use_numpy)
+        vectors = CosineSimilarity._prepare_vectors(texts, vocabulary)
+        n = len(vectors)
+        
+        if use_numpy:
+            units = CosineSimilarity._unit_rows(vectors)
+            # Whole blocks of at least NUMPY_TILE rows share each pass over
+            # the corpus tiles
+            step = block_size * -(-CosineSimilarity.NUMPY_TILE // block_size)
+            for first in range(0, n, step):
+                started = time.perf_counter()
+                scores = CosineSimilarity._numpy_rows(units, n, first, min(first + step, n))
+                Instrumentation.record("scoring", started, pairs_scored=len(scores) * n)
+                for start in range(0, len(scores), block_size):
+                    yield first + start, scores[start:start + block_size].tolist()
+            return
+        
+        normalized = [NormalizedVector(vector) for vector in vectors]
+        for start in range(0, n, block_size):
+            end = min(start + block_size, n)
+            started = time.perf_counter()
+            rows = CosineSimilarity._similarity_rows(normalized, start, end)
+            Instrumentation.record("scoring", started, pairs_scored=len(rows) * n)
+            yield start, rows
+    
+    @staticmethod
+    def cross_similarity(queries: Union[List[str], List[Vector]],
+                         corpus: Union[List[str], List[Vector]], k: int = 10,
+                         query_tile: int = 256, corpus_tile: int = 4096,
+                         use_numpy: Optional[bool] = None,
+                         vocabulary: Optional[Vocabulary] = None
+                         ) -> List[List[Tuple[int, float]]]:
+        """
+        Find the k most similar corpus documents for every query.
+        
+        Both sides are vectorized once with one shared vocabulary. Scores
+        are computed one tile (``query_tile`` queries × ``corpus_tile``
+        documents) at a time and folded into a bounded heap per query, so
+        the full queries × corpus rectangle is never held in memory.
+        Documents without words (zero vectors) are skipped: such a query
+        gets no results, and such a corpus document is never returned.
+        
+        Args:
+            queries: Query documents, or vectors
+            corpus: Corpus documents, or vectors of the same length as the
+                query vectors
+            k: Number of results per query
+            query_tile: Queries per tile
+            corpus_tile: Corpus documents per tile
+            use_numpy: Backend selection, as for ``similarity_matrix``
+            vocabulary: Persistent Vocabulary to reuse
+            
+        Returns:
+            List[List[Tuple[int, float]]]: For every query, up to k
+            (corpus index, similarity) pairs, best first (ties broken by
+            lower corpus index)
+            
+        Raises:
+            ValueError: If vector lengths differ or a size is not positive
+            ImportError: If use_numpy is True but NumPy is not installed
+            
+        Example:
+            >>> corpus = ["the cat sat", "python code", "the cat ran"]
+            >>> [[index for index, _ in top] for top in CosineSimilarity.cross_similarity(
+            ...     ["cat sat", "code"], corpus, k=2)]
+            [[0, 2], [1, 0]]
+        """
+        if k < 1:
+            raise ValueError("k must be at least 1")
+        queries = list(queries)
+        # One min-heap of (score, -index) per query; the worst kept entry on top
+        heaps: List[List[Tuple[float, int]]] = [[] for _ in queries]
+        use_numpy = CosineSimilarity._resolve_numpy(use_numpy)
+        
+        for rows, columns, scores in CosineSimilarity._cross_tiles(
+                queries, corpus, query_tile, corpus_tile, use_numpy, vocabulary,
+                skip_zero=True):
+            for query, row in zip(rows, scores):
+                heap = heaps[query]
+                if use_numpy and k < len(row):
+                    # Only the tile's own top k can enter the heap; ties with
+                    # its k-th best are kept too, so lower indices win them
+                    chosen = np.argpartition(-row, k - 1)[:k]
+                    candidates = np.flatnonzero(row >= row[chosen].min()).tolist()
+                else:
+                    candidates = range(len(row))
+                for column in candidates:
+                    entry = (float(row[column]), -columns[column])
+                    if len(heap) < k:
+                        heapq.heappush(heap, entry)
+                    elif entry > heap[0]:
+                        heapq.heapreplace(heap, entry)
+        
+        return [[(-negative, score) for score, negative in sorted(heap, reverse=True)]
+                for heap in heaps]
+    
+    @staticmethod
+    def iter_cross_similarity(queries: Union[List[str], List[Vector]],
+                              corpus: Union[List[str], List[Vector]],
+                              query_tile: int = 256, corpus_tile: int = 4096,
+                              use_numpy: Optional[bool] = None,
+                              vocabulary: Optional[Vocabulary] = None
+                              ) -> Iterator[Tuple[int, int, List[List[float]]]]:
+        """
+        Generate the queries × corpus similarity scores one tile at a time.
+        
+        Tiles cover all corpus documents for one block of queries before
+        moving on to the next block.
+        
+        Args:
+            queries: Query documents, or vectors
+            corpus: Corpus documents, or vectors
+            query_tile: Queries per tile
+            corpus_tile: Corpus documents per tile
+            use_numpy: Backend selection, as for ``similarity_matrix``
+            vocabulary: Persistent Vocabulary to reuse
+            
+        Yields:
+            Tuple[int, int, List[List[float]]]: Index of the tile's first
+            query, index of its first corpus document, and its scores (one
+            row per query)
+        """
+        use_numpy = CosineSimilarity._resolve_numpy(use_numpy)
+        for rows, columns, scores in CosineSimilarity._cross_tiles(
+                queries, corpus, query_tile, corpus_tile, use_numpy, vocabulary):
+            yield rows[0], columns[0], scores.tolist() if use_numpy else scores
+    
+    @staticmethod
+    def write_similarity_matrix(texts: List[str],
+                                destination: Union[str, TextIO,
+                                                   Callable[[int, List[float]], None]],
+                                block_size: int = 256, output_format: str = "csv",
+                                use_numpy: Optional[bool] = None,
+                                vocabulary: Optional[Vocabulary] = None) -> int:
+        """
+        Stream the pairwise similarity matrix to a file or callback.
+        
+        Rows are computed block by block with ``iter_similarity_matrix`` and
+        handed off immediately, so the full matrix is never held in memory.
+        
+        Args:
+            texts: List of text documents
+            destination: File path, open text file, or a callback receiving
+                (row index, row) for every row
+            block_size: Number of rows computed at a time
+            output_format: "csv" (comma-separated scores) or "jsonl"
+                (one JSON array per line); ignored for callbacks
+            use_numpy: Backend selection, as for ``similarity_matrix``
+            vocabulary: Persistent Vocabulary to reuse
+            
+        Returns:
+            int: Number of rows written
+            
+        Raises:
+            ValueError: If the output format is unknown
+        """
+        if output_format not in ("csv", "jsonl"):
+            raise ValueError(f"Unknown output format: {output_format!r}")
+        
+        if isinstance(destination, str):
+            with open(destination, "w", encoding="utf-8") as handle:
+                return CosineSimilarity.write_similarity_matrix(
+                    texts, handle, block_size, output_format, use_numpy, vocabulary)
+        
+        if callable(destination):
+            emit = destination
+        elif output_format == "csv":
+            def emit(row_index, row):
+                destination.write(",".join(repr(value) for value in row) + "\n")
+        else:
+            def emit(row_index, row):
+                destination.write(json.dumps(row) + "\n")
+        
+        rows_written = 0
+        for start, rows in CosineSimilarity.iter_similarity_matrix(
+                texts, block_size, use_numpy, vocabulary):
+            for offset, row in enumerate(rows):
+                emit(start + offset, row)
+            rows_written += len(rows)
+        return rows_written
+    
+    @staticmethod
+    def all_pairs(items: Union[List[str], List[Vector]],
+                  threshold: float) -> List[Tuple[int, int, float]]:
+        """
+        Find every pair of documents or vectors with similarity >= threshold.
+        
+        Instead of scoring all n² pairs like ``similarity_matrix``, this uses
+        the AllPairs candidate pruning scheme on sorted sparse vectors:
+        
+        1. Vectors are processed in decreasing order of their largest
+           normalized weight, and each one only indexes the suffix of its
+           features needed to reach the threshold (prefix filtering), so
+           pairs sharing only low-weight, frequent terms are never generated.
+        2. Candidates whose size makes the threshold unreachable are skipped
+           (size filtering).
+        3. A candidate is fully scored only if the partial dot product plus
+           the norm of its unindexed prefix can still reach the threshold.
+        
+        Surviving candidates are scored with the exact cosine similarity,
+        so returned scores equal ``cosine_similarity``. The bounds assume
+        non-negative weights (as in term frequency vectors); vectors with
+        negative entries fall back to checking every pair.
+        
+        Args:
+            items: Text documents, or vectors (lists of numbers or
+                SparseVectors) of the same length
+            threshold: Minimum similarity, in (0, 1]
+            
+        Returns:
+            List[Tuple[int, int, float]]: (i, j, similarity) for every
+            qualifying pair with i < j, sorted by (i, j); zero vectors
+            never qualify
+            
+        Raises:
+            ValueError: If threshold is outside (0, 1] or vector lengths differ
+            
+        Example:
+            >>> texts = ["a b c", "a b c d", "x y z", "x y"]
+            >>> [(i, j) for i, j, _ in CosineSimilarity.all_pairs(texts, 0.8)]
+            [(0, 1), (2, 3)]
+        """
+        if not 0 < threshold <= 1:
+            raise ValueError("threshold must be in (0, 1]")
+        items = list(items)
+        if items and isinstance(items[0], str):
+            vectors = CosineSimilarity._vectorize_all(items, None)
+        else:
+            vectors = [item if isinstance(item, SparseVector)
+                       else SparseVector.from_dense(item) for item in items]
+            if any(len(vector) != len(vectors[0]) for vector in vectors):
+                raise ValueError("Vectors must have the same length")
+        started = time.perf_counter()
+        pairs, scored = CosineSimilarity._all_pairs_candidates(vectors, threshold)
+        if Instrumentation.hooks:
+            zero = sum(1 for vector in vectors if not any(vector.values))
+            Instrumentation.record("scoring", started, pairs_scored=scored,
+                                   zero_vector_skips=zero)
+        return pairs
+    
+    @staticmethod
+    def _all_pairs_candidates(vectors: List[SparseVector], threshold: float
+                              ) -> Tuple[List[Tuple[int, int, float]], int]:
+        """
+        Run the AllPairs join, also returning how many pairs were fully scored.
+        """
+        # Bounds are computed on rounded floats; keep pruning conservative
+        slack = 1e-9
+        normalized = [NormalizedVector(vector) for vector in vectors]
+        pairs: List[Tuple[int, int, float]] = []
+        scored = 0
+        
+        if any(value < 0 for vector in vectors for value in vector.values):
+            # Prefix and size bounds only hold for non-negative weights
+            for i in range(len(normalized)):
+                for j in range(i + 1, len(normalized)):
+                    if normalized[i].is_zero or normalized[j].is_zero:
+                        continue
+                    scored += 1
+                    score = normalized[i].similarity(normalized[j])
+                    if score >= threshold:
+                        pairs.append((i, j, score))
+            return pairs, scored
+        
+        # Unit-length weights of every non-zero vector
+        units = [(position, {index: value / vector.norm for index, value
+                             in zip(vector.vector.indices, vector.vector.values)})
+                 for position, vector in enumerate(normalized) if not vector.is_zero]
+        
+        # Frequent features first, so they end up in the unindexed prefixes
+        frequency = Counter(index for _, weights in units for index in weights)
+        rank = {index: order for order, index in enumerate(
+            sorted(frequency, key=lambda index: (-frequency[index], index)))}
+        max_weight: Dict[int, float] = {}
+        for _, weights in units:
+            for index, weight in weights.items():
+                if weight > max_weight.get(index, 0.0):
+                    max_weight[index] = weight
+        
+        # Process vectors in decreasing order of their largest weight
+        units.sort(key=lambda unit: -max(unit[1].values()))
+        postings: Dict[int, List[Tuple[int, float]]] = {}
+        prefix_norms: List[float] = []
+        
+        for current, (position, weights) in enumerate(units):
+            # Size filter: x·y <= max(x) * sqrt(|y|) for unit vectors
+            min_size = (threshold / max(weights.values())) ** 2 - slack
+            
+            # Partial dot products with the indexed suffixes of earlier vectors
+            accumulators: Dict[int, float] = {}
+            for index, weight in weights.items():
+                for other, other_weight in postings.get(index, ()):
+                    if len(units[other][1]) >= min_size:
+                        accumulators[other] = (accumulators.get(other, 0.0)
+                                               + weight * other_weight)
+            
+            for other, partial in accumulators.items():
+                # The unindexed prefix adds at most its own norm
+                if partial + prefix_norms[other] < threshold - slack:
+                    continue
+                scored += 1
+                other_position = units[other][0]
+                score = normalized[position].similarity(normalized[other_position])
+                if score >= threshold:
+                    first, second = sorted((position, other_position))
+                    pairs.append((first, second, score))
+            
+            # Index only the suffix that could reach the threshold on its own
+            bound = 0.0
+            prefix_squares = 0.0
+            for index in sorted(weights, key=rank.__getitem__):
+                weight = weights[index]
+                bound += weight * max_weight[index]
+                if bound >= threshold - slack:
+                    postings.setdefault(index, []).append((current, weight))
+                else:
+                    prefix_squares += weight * weight
+            prefix_norms.append(math.sqrt(prefix_squares))
+        
+        pairs.sort()
+        return pairs, scored
+    
+    @staticmethod
+    def _cross_tiles(queries: Union[List[str], List[Vector]],
+                     corpus: Union[List[str], List[Vector]], query_tile: int,
+                     corpus_tile: int, use_numpy: bool, vocabulary: Optional[Vocabulary],
+                     skip_zero: bool = False
+                     ) -> Iterator[Tuple[List[int], List[int], object]]:
+        """
+        Vectorize both sides once and yield the score tiles.
+        
+        Each tile comes with the query and corpus indices of its rows and
+        columns. Zero vectors raise ValueError, or with ``skip_zero`` are
+        left out of every tile.
+        """
+        if query_tile < 1 or corpus_tile < 1:
+            raise ValueError("query_tile and corpus_tile must be at least 1")
+        queries = list(queries)
+        
+        # One shared vocabulary (and length check) for both sides
+        vectors = CosineSimilarity._prepare_vectors(queries + list(corpus), vocabulary)
+        split = len(queries)
+        normalized = [NormalizedVector(vector) for vector in vectors]
+        if not skip_zero and any(vector.is_zero for vector in normalized):
+            raise ValueError("Cannot compute cosine similarity for zero vectors")
+        kept = [index for index, vector in enumerate(normalized) if not vector.is_zero]
+        query_indices = [index for index in kept if index < split]
+        corpus_indices = [index - split for index in kept if index >= split]
+        if use_numpy:
+            # Normalized once; each tile is densified from its own vectors
+            units = CosineSimilarity._unit_rows([vectors[index] for index in kept])
+        
+        for query_start in range(0, len(query_indices), query_tile):
+            rows = query_indices[query_start:query_start + query_tile]
+            for corpus_start in range(0, len(corpus_indices), corpus_tile):
+                columns = corpus_indices[corpus_start:corpus_start + corpus_tile]
+                started = time.perf_counter()
+                if use_numpy:
+                    # Kept queries come first in the units, then kept documents
+                    first = len(query_indices) + corpus_start
+                    scores = CosineSimilarity._tile_scores(
+                        CosineSimilarity._unit_slice(units, query_start,
+                                                     query_start + len(rows)),
+                        CosineSimilarity._unit_slice(units, first, first + len(columns)))
+                else:
+                    scores = [[normalized[index].similarity(normalized[split + column])
+                               for column in columns] for index in rows]
+                Instrumentation.record("scoring", started,
+                                       pairs_scored=len(rows) * len(columns))
+                yield rows, columns, scores
+    
+    @staticmethod
+    def _resolve_numpy(use_numpy: Optional[bool]) -> bool:
+        """Decide whether to use the NumPy backend."""
+        if use_numpy and np is None:
+            raise ImportError("NumPy is required for use_numpy=True")
+        if use_numpy is None:
+            return np is not None
+        return use_numpy
+    
+    @staticmethod
+    def _vectorize_all(texts: List[str],
+                       vocabulary: Optional[Vocabulary]) -> List[SparseVector]:
+        """Build (or extend) the vocabulary and vectorize every text sparsely."""
+        # Tokenize every document once, interning words into the vocabulary
+        if vocabulary is None:
+            vocabulary = Vocabulary()
+        if not Instrumentation.hooks:
+            token_ids = vocabulary.encode_batch(texts)
+        else:
+            # Same ids as encode_batch, with tokenization and interning timed apart
+            started = time.perf_counter()
+            tokens = [CosineSimilarity.tokenize(text) for text in texts]
+            Instrumentation.record("tokenize", started, documents=len(tokens),
+                                   tokens=sum(map(len, tokens)))
+            started = time.perf_counter()
+            add = vocabulary.add
+            token_ids = [[add(word) for word in words] for words in tokens]
+            Instrumentation.record("vocabulary", started)
+        
+        # Vectors are sized once the vocabulary covers every document
+        started = time.perf_counter()
+        dimension = len(vocabulary)
+        vectors = [CosineSimilarity.ids_to_vector(ids, dimension, sparse=True)
+                   for ids in token_ids]
+        Instrumentation.record("vectorize", started)
+        return vectors
+    
+    @staticmethod
+    def _prepare_vectors(items: Union[List[str], List[Vector]],
+                         vocabulary: Optional[Vocabulary]) -> List[Vector]:
+        """Vectorize text documents, or validate a list of vectors."""
+        items = list(items)
+        if not items or isinstance(items[0], str):
+            return CosineSimilarity._vectorize_all(items, vocabulary)
+        if any(len(item) != len(items[0]) for item in items):
+            raise ValueError("Vectors must have the same length")
+        return items
+    
+    @staticmethod
+    def _similarity_rows(normalized: List["NormalizedVector"], start: int,
+                         end: int) -> List[List[float]]:
+        """Compute rows [start, end) of the pairwise similarity matrix."""
+        matrix = []
+        for i in range(start, end):
+            row = []
+            for vector in normalized:
+                similarity = normalized[i].similarity(vector)
+                row.append(similarity)
+            matrix.append(row)
+        return matrix
+    
+    @staticmethod
+    def _unit_rows(vectors: List[Vector]):
+        """
+        Normalize every vector once for the tiled NumPy backend.
+        
+        Sparse vectors stay sparse, packed into flat (term indices, unit
+        values, row offsets) arrays; other vectors become the rows of one
+        dense matrix. Take row ranges with ``_unit_slice``.
+        
+        Raises:
+            ValueError: If a vector is a zero vector
+        """
+        if not vectors or not all(isinstance(vector, SparseVector) for vector in vectors):
+            return CosineSimilarity._normalized_doc_term(vectors)
+        lengths = np.fromiter((vector.nnz for vector in vectors), dtype=np.intp,
+                              count=len(vectors))
+        if not lengths.all():
+            raise ValueError("Cannot compute cosine similarity for zero vectors")
+        total = int(lengths.sum())
+        indices = np.fromiter(itertools.chain.from_iterable(
+            vector.indices for vector in vectors), dtype=np.intp, count=total)
+        values = np.fromiter(itertools.chain.from_iterable(
+            vector.values for vector in vectors), dtype=np.float64, count=total)
+        offsets = np.zeros(len(vectors) + 1, dtype=np.intp)
+        np.cumsum(lengths, out=offsets[1:])
+        norms = np.sqrt(np.add.reduceat(values * values, offsets[:-1]))
+        values /= np.repeat(norms, lengths)
+        return indices, values, offsets
+    
+    @staticmethod
+    def _unit_slice(units, start: int, end: int):
+        """Rows [start, end) of vectors normalized by ``_unit_rows``."""
+        if isinstance(units, np.ndarray):
+            return units[start:end]
+        indices, values, offsets = units
+        low, high = offsets[start], offsets[end]
+        return indices[low:high], values[low:high], offsets[start:end + 1] - low
+    
+    @staticmethod
+    def _tile_scores(rows, columns):
+        """
+        Score two groups of normalized vectors against each other with NumPy.
+        
+        For sparse groups only the terms they use get a column, so memory
+        follows the size of the tile, not of the corpus or vocabulary.
+        
+        Args:
+            rows: Vectors normalized by ``_unit_rows``
+            columns: Vectors normalized by the same ``_unit_rows`` call
+            
+        Returns:
+            numpy.ndarray: len(rows) × len(columns) clamped scores
+        """
+        if isinstance(rows, np.ndarray):
+            scores = rows @ columns.T
+        else:
+            row_lengths, column_lengths = np.diff(rows[2]), np.diff(columns[2])
+            terms, positions = np.unique(np.concatenate((rows[0], columns[0])),
+                                         return_inverse=True)
+            owners = np.repeat(np.arange(len(row_lengths) + len(column_lengths)),
+                               np.concatenate((row_lengths, column_lengths)))
+            doc_term = np.zeros((len(row_lengths) + len(column_lengths), len(terms)))
+            doc_term[owners, positions] = np.concatenate((rows[1], columns[1]))
+            scores = doc_term[:len(row_lengths)] @ doc_term[len(row_lengths):].T
+        np.clip(scores, -1.0, 1.0, out=scores)
+        return scores
+    
+    @staticmethod
+    def _numpy_rows(units, count: int, start: int, end: int, column_start: int = 0):
+        """Rows [start, end) of the matrix from column_start on, tile by tile."""
+        rows = CosineSimilarity._unit_slice(units, start, end)
+        if isinstance(units, np.ndarray):
+            scores = rows @ units[column_start:].T
+            np.clip(scores, -1.0, 1.0, out=scores)
+            return scores
+        scores = np.empty((end - start, count - column_start))
+        tile = CosineSimilarity.NUMPY_TILE
+        for column in range(column_start, count, tile):
+            stop = min(column + tile, count)
+            block = CosineSimilarity._unit_slice(units, column, stop)
+            scores[:, column - column_start:stop - column_start] = \
+                CosineSimilarity._tile_scores(rows, block)
+        return scores
+    
+    @staticmethod
+    def _normalized_doc_term(vectors: List[Vector]):
+        """
+        Build the row-normalized NumPy document-term matrix.
+        
+        Each row of the document-term matrix is divided by its norm once,
+        after which cosine scores come out of plain matrix products.
+        
+        Args:
+            vectors: Term frequency vectors (or other vectors of equal length)
+            
+        Returns:
+            numpy.ndarray: Matrix of unit-length rows, one per document
+            
+        Raises:
+            ValueError: If a document is a zero vector
+        """
+        if all(isinstance(vector, SparseVector) for vector in vectors):
+            # Only the terms used by these documents need a column, which keeps
+            # the matrix small when a large persistent vocabulary is reused
+            columns = {term: column for column, term in enumerate(
+                sorted(set().union(*(vector.indices for vector in vectors))))}
+            
+            # Fill the dense document-term matrix from the sparse vectors
+            doc_term = np.zeros((len(vectors), len(columns)))
+            for row, vector in enumerate(vectors):
+                doc_term[row, [columns[term] for term in vector.indices]] = vector.values
+        else:
+            doc_term = np.array([
+                vector.to_dense() if isinstance(vector, SparseVector)
+                else np.frombuffer(vector.values, dtype=np.float32)
+                if isinstance(vector, CompactVector) else vector
+                for vector in vectors], dtype=np.float64)
+        
+        # Row-normalize once instead of recomputing magnitudes per pair
+        norms = np.sqrt(np.einsum("ij,ij->i", doc_term, doc_term))
+        if np.any(norms == 0):
+            raise ValueError("Cannot compute cosine similarity for zero vectors")
+        doc_term /= norms[:, np.newaxis]
+        return doc_term
+
+
+class NormalizedVector:
+    """
+    A vector together with its cached magnitude.
+    
+    The magnitude is computed once when the object is created. Comparing two
+    NormalizedVector instances then costs a single dot product instead of a
+    dot product plus two magnitude computations, which is what makes the
+    batch paths (similarity matrices, one-vs-many scoring) cheaper.
+    
+    Zero vectors are allowed but flagged through ``is_zero``; comparing a
+    zero vector raises ValueError just like ``cosine_similarity``.
+    
+    Example:
+        >>> a = NormalizedVector([3, 4])
+        >>> a.norm
+        5.0
+        >>> a.similarity(NormalizedVector([6, 8]))
+        1.0
+    """
+    
+    __slots__ = ("vector", "norm")
+    
+    def __init__(self, vector: Vector):
+        """
+        Wrap a vector and compute its magnitude.
+        
+        Args:
+            vector: A vector as a list of numbers or a SparseVector
+        """
+        self.vector = vector
+        self.norm = CosineSimilarity.magnitude(vector)
+    
+    @staticmethod
+    def wrap(vector: Union[Vector, "NormalizedVector"]) -> "NormalizedVector":
+        """
+        Return ``vector`` unchanged if already normalized, otherwise wrap it.
+        
+        Args:
+            vector: A plain vector or a NormalizedVector
+            
+        Returns:
+            NormalizedVector: The wrapped vector
+        """
+        if isinstance(vector, NormalizedVector):
+            return vector
+        return NormalizedVector(vector)
+    
+    @property
+    def is_zero(self) -> bool:
+        """True if every element of the vector is zero."""
+        return self.norm == 0
+    
+    def similarity(self, other: "NormalizedVector") -> float:
+        """
+        Calculate the cosine similarity with another NormalizedVector.
+        
+        Gives exactly the same result as ``CosineSimilarity.cosine_similarity``
+        on the underlying vectors.
+        
+        Args:
+            other: Vector to compare with (must have same length)
+            
+        Returns:
+            float: Cosine similarity value between -1 and 1
+            
+        Raises:
+            ValueError: If vectors have different lengths or are zero vectors
+        """
+        if len(self.vector) != len(other.vector):
+            raise ValueError("Vectors must have the same length")
+        if self.norm == 0 or other.norm == 0:
+            raise ValueError("Cannot compute cosine similarity for zero vectors")
+        
+        dot_prod = CosineSimilarity._unchecked_dot(self.vector, other.vector)
+        similarity = dot_prod / (self.norm * other.norm)
+        return max(-1.0, min(1.0, similarity))
+    
+    def __len__(self) -> int:
+        return len(self.vector)
+    
+    def __repr__(self) -> str:
+        return f"NormalizedVector({self.vector!r}, norm={self.norm})"
+
+
+class SymmetricMatrix:
+    """
+    A symmetric similarity matrix storing only its upper triangle.
+    
+    The scores above the diagonal are packed row by row into one contiguous
+    float32 array of n(n-1)/2 values, and the diagonal is implicitly 1. That
+    is 2 bytes per matrix entry instead of about 32 for a list of lists of
+    Python floats. Scores keep float32 precision (about 7 digits).
+    
+    Entries are read with ``matrix[i][j]`` or ``matrix[i, j]``; ``matrix[i]``
+    is a lightweight row view and iterating yields full rows as lists.
+    
+    Example:
+        >>> matrix = CosineSimilarity.symmetric_similarity_matrix(
+        ...     [[1, 0], [1, 1], [0, 1]])
+        >>> round(matrix[0][1], 4), matrix[1, 0] == matrix[0, 1], matrix[2][2]
+        (0.7071, True, 1.0)
+        >>> len(matrix), matrix.nbytes
+        (3, 12)
+    """
+    
+    __slots__ = ("size", "values")
+    
+    def __init__(self, size: int, values: array):
+        """
+        Wrap packed upper-triangle scores.
+        
+        Args:
+            size: Number of rows (and columns)
+            values: Scores of every pair i < j, ordered by i then j
+            
+        Raises:
+            ValueError: If the number of values does not match the size
+        """
+        if len(values) != size * (size - 1) // 2:
+            raise ValueError("values must hold size * (size - 1) / 2 scores")
+        self.size = size
+        self.values = values
+    
+    def _offset(self, i: int, j: int) -> int:
+        """Position of the pair i < j in the packed array."""
+        return i * (2 * self.size - i - 1) // 2 + j - i - 1
+    
+    def get(self, i: int, j: int) -> float:
+        """
+        Return the score of a pair.
+        
+        Args:
+            i: Row index
+            j: Column index
+            
+        Returns:
+            float: The similarity of documents i and j
+        """
+        if not (0 <= i < self.size and 0 <= j < self.size):
+            raise IndexError("matrix index out of range")
+        if i == j:
+            return 1.0
+        if i > j:
+            i, j = j, i
+        return self.values[self._offset(i, j)]
+    
+    def row(self, i: int) -> List[float]:
+        """
+        Return a full row of the matrix.
+        
+        Args:
+            i: Row index
+            
+        Returns:
+            List[float]: Scores of document i against every document
+        """
+        if not 0 <= i < self.size:
+            raise IndexError("matrix index out of range")
+        # Column i of the rows above, then the packed run of row i itself
+        before = [self.values[self._offset(k, i)] for k in range(i)]
+        start = self._offset(i, i + 1)
+        return before + [1.0] + self.values[start:start + self.size - i - 1].tolist()
+    
+    def tolist(self) -> List[List[float]]:
+        """
+        Convert to the list-of-lists form returned by ``similarity_matrix``.
+        
+        Returns:
+            List[List[float]]: Square matrix of similarity scores
+        """
+        return [self.row(i) for i in range(self.size)]
+    
+    @property
+    def nbytes(self) -> int:
+        """Bytes used by the packed scores."""
+        return len(self.values) * self.values.itemsize
+    
+    def __getitem__(self, key: Union[int, Tuple[int, int]]):
+        if isinstance(key, tuple):
+            return self.get(*key)
+        if not -self.size <= key < self.size:
+            raise IndexError("matrix index out of range")
+        return _SymmetricRow(self, key % self.size)
+    
+    def __iter__(self) -> Iterator[List[float]]:
+        return (self.row(i) for i in range(self.size))
+    
+    def __len__(self) -> int:
+        return self.size
+    
+    def __repr__(self) -> str:
+        return f"SymmetricMatrix(size={self.size})"
+
+
+class _SymmetricRow:
+    """Row view returned by ``SymmetricMatrix[i]``, so ``matrix[i][j]`` works."""
+    
+    __slots__ = ("matrix", "index")
+    
+    def __init__(self, matrix: SymmetricMatrix, index: int):
+        self.matrix = matrix
+        self.index = index
+    
+    def __getitem__(self, column: int) -> float:
+        if column < 0:
+            column += self.matrix.size
+        return self.matrix.get(self.index, column)
+    
+    def __iter__(self) -> Iterator[float]:
+        return iter(self.matrix.row(self.index))
+    
+    def __len__(self) -> int:
+        return self.matrix.size
+
+
+class CosineIndex:
+    """
+    A collection of vectors or documents answering top-k similarity queries.
+    
+    Each stored vector keeps its cached magnitude (see NormalizedVector), and
+    a query keeps only the k best scores in a bounded heap, so finding the
+    top 10 out of a million items never builds or sorts a million-entry list.
+    
+    Stored zero vectors (e.g. empty documents) have no defined similarity and
+    are skipped by queries.
+    
+    Example:
+        >>> index = CosineIndex.from_texts(
+        ...     ["hello world", "hello python", "world of python"],
+        ...     ids=["a", "b", "c"])
+        >>> [item_id for item_id, _ in index.query("hello world", k=2)]
+        ['a', 'b']
+        >>> [item_id for item_id, _ in index.query_item("a", k=1)]
+        ['b']
+    """
+    
+    def __init__(self, vocabulary: Optional[Mapping[str, int]] = None):
+        """
+        Create an empty index.
+        
+        Args:
+            vocabulary: Dictionary (or Vocabulary) mapping words to indices,
+                required for adding or querying with text
+        """
+        self.vocabulary = vocabulary
+        self._ids: List[Hashable] = []
+        self._vectors: List[NormalizedVector] = []
+        self._positions: Dict[Hashable, int] = {}
+    
+    @classmethod
+    def from_vectors(cls, vectors: Iterable[Vector],
+                     ids: Optional[Iterable[Hashable]] = None) -> "CosineIndex":
+        """
+        Build an index over numerical vectors.
+        
+        Args:
+            vectors: Vectors as lists of numbers or SparseVectors
+            ids: Item ids, one per vector (defaults to 0, 1, 2, ...)
+            
+        Returns:
+            CosineIndex: The populated index
+        """
+        index = cls()
+        index.add_all(vectors, ids)
+        return index
+    
+    @classmethod
+    def from_texts(cls, texts: List[str],
+                   ids: Optional[Iterable[Hashable]] = None) -> "CosineIndex":
+        """
+        Build an index over text documents with a shared vocabulary.
+        
+        Args:
+            texts: List of text documents
+            ids: Item ids, one per document (defaults to 0, 1, 2, ...)
+            
+        Returns:
+            CosineIndex: The populated index
+        """
+        index = cls(CosineSimilarity.build_vocabulary(texts))
+        index.add_all(texts, ids)
+        return index
+    
+    def add(self, item: Union[Vector, str],
+            item_id: Optional[Hashable] = None) -> Hashable:
+        """
+        Add a vector or text document to the index.
+        
+        Args:
+            item: Vector, or text if the index has a vocabulary
+            item_id: Id of the item (defaults to its insertion position)
+            
+        Returns:
+            Hashable: The id of the added item
+            
+        Raises:
+            ValueError: If the id is already used or the dimension differs
+                from the stored vectors
+        """
+        vector = NormalizedVector(self._to_vector(item))
+        if self._vectors and len(vector) != len(self._vectors[0]):
+            raise ValueError("Vectors must have the same length")
+        
+        if item_id is None:
+            item_id = len(self._ids)
+        if item_id in self._positions:
+            raise ValueError(f"Duplicate item id: {item_id!r}")
+        
+        self._positions[item_id] = len(self._ids)
+        self._ids.append(item_id)
+        self._vectors.append(vector)
+        return item_id
+    
+    def add_all(self, items: Iterable[Union[Vector, str]],
+                ids: Optional[Iterable[Hashable]] = None) -> None:
+        """
+        Add several vectors or text documents to the index.
+        
+        Args:
+            items: Vectors or texts
+            ids: Item ids, one per item (defaults to insertion positions)
+            
+        Raises:
+            ValueError: If ids are given but their count differs from the
+                number of items
+        """
+        if ids is None:
+            for item in items:
+                self.add(item)
+            return
+        items, ids = list(items), list(ids)
+        if len(items) != len(ids):
+            raise ValueError("items and ids must have the same length")
+        for item, item_id in zip(items, ids):
+            self.add(item, item_id)
+    
+    def query(self, item: Union[Vector, str], k: int = 10,
+              exclude: Optional[Collection[Hashable]] = None,
+              include: Optional[Callable[[Hashable], bool]] = None
+              ) -> List[Tuple[Hashable, float]]:
+        """
+        Find the k stored items most similar to a vector or text.
+        
+        Args:
+            item: Query vector, or text if the index has a vocabulary
+            k: Number of results to return
+            exclude: Item ids that must not appear in the results
+            include: Optional predicate on item ids; items for which it
+                returns False are skipped
+            
+        Returns:
+            List[Tuple[Hashable, float]]: Up to k (item id, similarity)
+            pairs, best first; ties keep insertion order
+            
+        Raises:
+            ValueError: If the query is a zero vector or has the wrong length
+        """
+        query = NormalizedVector(self._to_vector(item))
+        if query.is_zero:
+            raise ValueError("Cannot compute cosine similarity for zero vectors")
+        return self._top_k(query, k, exclude, include)
+    
+    def query_item(self, item_id: Hashable, k: int = 10,
+                   include: Optional[Callable[[Hashable], bool]] = None
+                   ) -> List[Tuple[Hashable, float]]:
+        """
+        Find the k items most similar to a stored item, excluding itself.
+        
+        Args:
+            item_id: Id of the stored item to use as the query
+            k: Number of results to return
+            include: Optional predicate on item ids
+            
+        Returns:
+            List[Tuple[Hashable, float]]: Up to k (item id, similarity) pairs
+            
+        Raises:
+            KeyError: If the item id is unknown
+            ValueError: If the stored item is a zero vector
+        """
+        query = self._vectors[self._positions[item_id]]
+        if query.is_zero:
+            raise ValueError("Cannot compute cosine similarity for zero vectors")
+        return self._top_k(query, k, (item_id,), include)
+    
+    def stored(self, position: int) -> Tuple[Hashable, NormalizedVector]:
+        """
+        Return the item stored at an insertion position.
+        
+        Args:
+            position: Insertion position (0 for the first item added)
+            
+        Returns:
+            Tuple[Hashable, NormalizedVector]: The item id and its vector
+            
+        Raises:
+            IndexError: If the position is out of range
+        """
+        return self._ids[position], self._vectors[position]
+    
+    def items(self) -> Iterator[Tuple[Hashable, NormalizedVector]]:
+        """
+        Iterate over the stored items in insertion order.
+        
+        Yields:
+            Tuple[Hashable, NormalizedVector]: Item id and vector
+        """
+        return zip(self._ids, self._vectors)
+    
+    def _top_k(self, query: NormalizedVector, k: int,
+               exclude: Optional[Collection[Hashable]],
+               include: Optional[Callable[[Hashable], bool]]
+               ) -> List[Tuple[Hashable, float]]:
+        """Score every eligible item, keeping only the k best in a heap."""
+        if k <= 0:
+            return []
+        exclude = set(exclude) if exclude else ()
+        ids = self._ids
+        if not Instrumentation.hooks:
+            # Nothing would be recorded, so skip the counters and timing
+            scored_items = ((query.similarity(vector), position)
+                            for position, vector in enumerate(self._vectors)
+                            if not vector.is_zero and ids[position] not in exclude
+                            and (include is None or include(ids[position])))
+            best = heapq.nlargest(k, scored_items, key=lambda entry: entry[0])
+            return [(ids[position], score) for score, position in best]
+        started = time.perf_counter()
+        scored = skipped = 0
+        
+        def candidates():
+            nonlocal scored, skipped
+            for position, vector in enumerate(self._vectors):
+                item_id = ids[position]
+                if vector.is_zero:
+                    skipped += 1
+                    continue
+                if item_id in exclude:
+                    continue
+                if include is not None and not include(item_id):
+                    continue
+                scored += 1
+                yield query.similarity(vector), position
+        
+        # nlargest maintains a heap of at most k entries while scanning
+        best = heapq.nlargest(k, candidates(), key=lambda entry: entry[0])
+        Instrumentation.record("scoring", started, pairs_scored=scored,
+                               zero_vector_skips=skipped)
+        return [(ids[position], score) for score, position in best]
+    
+    def _to_vector(self, item: Union[Vector, str]) -> Vector:
+        """Convert text to a sparse vector; pass vectors through unchanged."""
+        if isinstance(item, str):
+            if self.vocabulary is None:
+                raise ValueError("Index has no vocabulary for text items")
+            return CosineSimilarity.text_to_vector(item, self.vocabulary, sparse=True)
+        return item
+    
+    def __len__(self) -> int:
+        return len(self._ids)
+    
+    def __contains__(self, item_id: Hashable) -> bool:
+        return item_id in self._positions
+
+
+class InvertedIndex:
+    """
+    An inverted index over text documents for sparse cosine queries.
+    
+    Each vocabulary term maps to a posting list of (document, term frequency)
+    entries. A query only walks the posting lists of its own terms and
+    accumulates dot products term-at-a-time, so documents sharing no words
+    with the query are never touched and the work follows the size of the
+    posting lists involved rather than the size of the corpus.
+    
+    Scores are identical to ``cosine_similarity`` on the term frequency
+    vectors built with ``text_to_vector`` over the index vocabulary.
+    
+    Example:
+        >>> index = InvertedIndex.from_texts(
+        ...     ["hello world", "hello python", "python code"])
+        >>> [(item_id, round(score, 4)) for item_id, score in index.query("python code", k=2)]
+        [(2, 1.0), (1, 0.5)]
+    """
+    
+    def __init__(self, vocabulary: Optional[Vocabulary] = None):
+        """
+        Create an empty index.
+        
+        Args:
+            vocabulary: Vocabulary to share; words first seen in added
+                documents are added to it
+        """
+        self.vocabulary = vocabulary if vocabulary is not None else Vocabulary()
+        self._postings: Dict[int, List[Tuple[int, float]]] = {}
+        self._ids: List[Hashable] = []
+        self._norms: List[float] = []
+        self._positions: Dict[Hashable, int] = {}
+    
+    @classmethod
+    def from_texts(cls, texts: List[str],
+                   ids: Optional[Iterable[Hashable]] = None) -> "InvertedIndex":
+        """
+        Build an index over text documents.
+        
+        Args:
+            texts: List of text documents
+            ids: Document ids, one per text (defaults to 0, 1, 2, ...)
+            
+        Returns:
+            InvertedIndex: The populated index
+            
+        Raises:
+            ValueError: If ids are given but their count differs from the
+                number of texts
+        """
+        ids = range(len(texts)) if ids is None else list(ids)
+        if len(ids) != len(texts):
+            raise ValueError("texts and ids must have the same length")
+        index = cls(Vocabulary(texts))
+        for text, item_id in zip(texts, ids):
+            index.add(text, item_id)
+        return index
+    
+    def add(self, text: str, item_id: Optional[Hashable] = None) -> Hashable:
+        """
+        Add a text document to the index.
+        
+        Args:
+            text: Text document
+            item_id: Id of the document (defaults to its insertion position)
+            
+        Returns:
+            Hashable: The id of the added document
+            
+        Raises:
+            ValueError: If the id is already used
+        """
+        if item_id is None:
+            item_id = len(self._ids)
+        if item_id in self._positions:
+            raise ValueError(f"Duplicate item id: {item_id!r}")
+        
+        position = len(self._ids)
+        weights = Counter(CosineSimilarity.tokenize(text))
+        for word, count in weights.items():
+            term = self.vocabulary.add(word)
+            self._postings.setdefault(term, []).append((position, float(count)))
+        
+        self._positions[item_id] = position
+        self._ids.append(item_id)
+        self._norms.append(math.sqrt(sum(float(c) * c for c in weights.values())))
+        return item_id
+    
+    def scores(self, text: str) -> Dict[Hashable, float]:
+        """
+        Score every document sharing at least one word with the text.
+        
+        Args:
+            text: Query text
+            
+        Returns:
+            Dict[Hashable, float]: Cosine similarity per matching document id;
+            documents that share no words (score 0) are left out
+            
+        Raises:
+            ValueError: If no query word is in the vocabulary (zero vector)
+        """
+        return {self._ids[position]: score
+                for position, score in self._accumulate(text).items()}
+    
+    def query(self, text: str, k: int = 10,
+              exclude: Optional[Collection[Hashable]] = None,
+              include: Optional[Callable[[Hashable], bool]] = None
+              ) -> List[Tuple[Hashable, float]]:
+        """
+        Find the k documents most similar to a text.
+        
+        Only documents sharing a word with the query are candidates, so
+        fewer than k results may be returned.
+        
+        Args:
+            text: Query text
+            k: Number of results to return
+            exclude: Document ids that must not appear in the results
+            include: Optional predicate on document ids
+            
+        Returns:
+            List[Tuple[Hashable, float]]: Up to k (document id, similarity)
+            pairs, best first; ties keep insertion order
+            
+        Raises:
+            ValueError: If no query word is in the vocabulary (zero vector)
+        """
+        if k <= 0:
+            return []
+        exclude = set(exclude) if exclude else ()
+        ids = self._ids
+        candidates = (
+            (score, position)
+            for position, score in self._accumulate(text).items()
+            if ids[position] not in exclude
+            and (include is None or include(ids[position]))
+        )
+        best = heapq.nsmallest(k, candidates, key=lambda entry: (-entry[0], entry[1]))
+        return [(ids[position], score) for score, position in best]
+    
+    def _accumulate(self, text: str) -> Dict[int, float]:
+        """Term-at-a-time score accumulation over the query's posting lists."""
+        query = Counter(CosineSimilarity.tokenize(text))
+        terms = sorted((self.vocabulary[word], float(count))
+                       for word, count in query.items() if word in self.vocabulary)
+        query_norm = math.sqrt(sum(weight * weight for _, weight in terms))
+        if query_norm == 0:
+            raise ValueError("Cannot compute cosine similarity for zero vectors")
+        
+        # Accumulate partial dot products one posting list at a time
+        accumulators: Dict[int, float] = {}
+        for term, query_weight in terms:
+            for position, weight in self._postings.get(term, ()):
+                accumulators[position] = (accumulators.get(position, 0.0)
+                                          + query_weight * weight)
+        
+        norms = self._norms
+        return {position: max(-1.0, min(1.0, dot / (query_norm * norms[position])))
+                for position, dot in accumulators.items()}
+    
+    def __len__(self) -> int:
+        return len(self._ids)
+    
+    def __contains__(self, item_id: Hashable) -> bool:
+        return item_id in self._positions
+
+
+class DocumentProfile:
+    """
+    The term counts of a document together with their precomputed norm.
+    
+    A profile is keyed by word rather than by vocabulary index, so it needs
+    no shared vocabulary and can be compared with any other profile.
+    Similarities equal ``CosineSimilarity.document_similarity`` exactly.
+    
+    Example:
+        >>> a = DocumentProfile.from_text("hello world")
+        >>> b = DocumentProfile.from_text("hello hello python")
+        >>> round(a.similarity(b), 4)
+        0.6325
+    """
+    
+    __slots__ = ("counts", "norm", "size_bytes")
+    
+    def __init__(self, counts: Dict[str, int]):
+        """
+        Create a profile from word counts.
+        
+        Args:
+            counts: Number of occurrences of every word
+        """
+        self.counts = counts
+        self.norm = math.sqrt(sum(float(count) * count for count in counts.values()))
+        # Rough memory footprint, used for memory-bounded caching
+        self.size_bytes = (sys.getsizeof(counts)
+                           + sum(sys.getsizeof(word) for word in counts))
+    
+    @classmethod
+    def from_text(cls, text: str) -> "DocumentProfile":
+        """
+        Tokenize a text and build its profile.
+        
+        Args:
+            text: Input text string
+            
+        Returns:
+            DocumentProfile: The profile
+        """
+        return cls(Counter(CosineSimilarity.tokenize(text)))
+    
+    def similarity(self, other: "DocumentProfile") -> float:
+        """
+        Calculate the cosine similarity with another profile.
+        
+        Args:
+            other: Profile to compare with
+            
+        Returns:
+            float: Cosine similarity value between -1 and 1
+            
+        Raises:
+            ValueError: If either document has no words (zero vector)
+        """
+        if self.norm == 0 or other.norm == 0:
+            raise ValueError("Cannot compute cosine similarity for zero vectors")
+        
+        # Walk the smaller profile and look words up in the larger one
+        smaller, larger = (self, other) if len(self.counts) <= len(other.counts) \
+            else (other, self)
+        lookup = larger.counts
+        dot_prod = sum(float(count) * lookup[word]
+                       for word, count in smaller.counts.items() if word in lookup)
+        return max(-1.0, min(1.0, dot_prod / (self.norm * other.norm)))
+
+
+class ProfileCache:
+    """
+    A bounded, thread-safe LRU cache of document profiles.
+    
+    Profiles are keyed by a hash of the document text, so a document seen
+    before costs a hash and a dictionary lookup instead of tokenization and
+    vectorization. The least recently used profiles are evicted when the
+    cache exceeds its entry limit or its (approximate) memory limit.
+    
+    Example:
+        >>> cache = ProfileCache(max_entries=100)
+        >>> score = cache.document_similarity("hello world", "hello python")
+        >>> score = cache.document_similarity("hello world", "world")
+        >>> cache.stats()["hits"], cache.stats()["misses"]
+        (1, 3)
+    """
+    
+    def __init__(self, max_entries: Optional[int] = 10000,
+                 max_bytes: Optional[int] = None):
+        """
+        Create an empty cache.
+        
+        Args:
+            max_entries: Maximum number of cached profiles (None for no limit)
+            max_bytes: Maximum approximate memory used by cached profiles
+                (None for no limit)
+                
+        Raises:
+            ValueError: If a limit is not positive
+        """
+        if (max_entries is not None and max_entries < 1) or \
+                (max_bytes is not None and max_bytes < 1):
+            raise ValueError("Cache limits must be positive")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._profiles: "OrderedDict[bytes, DocumentProfile]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+    
+    @staticmethod
+    def _key(text: str) -> bytes:
+        """Hash the text so the cache does not keep whole documents alive."""
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+    
+    def get(self, text: str) -> DocumentProfile:
+        """
+        Return the profile of a text, building and caching it on a miss.
+        
+        Args:
+            text: Input text string
+            
+        Returns:
+            DocumentProfile: The profile of the text
+        """
+        key = self._key(text)
+        with self._lock:
+            profile = self._profiles.get(key)
+            if profile is not None:
+                self._profiles.move_to_end(key)
+                self._hits += 1
+                return profile
+            self._misses += 1
+        
+        # Build outside the lock so other threads are not blocked meanwhile
+        profile = DocumentProfile.from_text(text)
+        with self._lock:
+            if key not in self._profiles:
+                self._profiles[key] = profile
+                self._bytes += profile.size_bytes
+                self._evict()
+        return profile
+    
+    def _evict(self) -> None:
+        """Drop least recently used profiles until within limits (lock held)."""
+        while self._profiles and (
+                (self.max_entries is not None and len(self._profiles) > self.max_entries)
+                or (self.max_bytes is not None and self._bytes > self.max_bytes)):
+            _, profile = self._profiles.popitem(last=False)
+            self._bytes -= profile.size_bytes
+            self._evictions += 1
+    
+    def document_similarity(self, text_a: str, text_b: str) -> float:
+        """
+        Calculate the cosine similarity between two documents via the cache.
+        
+        Args:
+            text_a: First text document
+            text_b: Second text document
+            
+        Returns:
+            float: Same value as ``CosineSimilarity.document_similarity``
+            
+        Raises:
+            ValueError: If either document has no words (zero vector)
+        """
+        return self.get(text_a).similarity(self.get(text_b))
+    
+    def stats(self) -> Dict[str, int]:
+        """
+        Return cache statistics.
+        
+        Returns:
+            Dict[str, int]: hits, misses, evictions, entries and bytes
+        """
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "entries": len(self._profiles),
+                "bytes": self._bytes,
+            }
+    
+    def clear(self) -> None:
+        """Remove every cached profile (statistics are kept)."""
+        with self._lock:
+            self._profiles.clear()
+            self._bytes = 0
+    
+    def __len__(self) -> int:
+        return len(self._profiles)
+    
+    def __contains__(self, text: str) -> bool:
+        return self._key(text) in self._profiles
+
+
+class TfidfWeighting:
+    """
+    Incrementally maintained TF-IDF (or BM25) weighting over a Vocabulary.
     
-    This class provides methods to:
-    1. Calculate cosine similarity between numerical vectors
-    2. Calculate cosine similarity between text documents
-    3. Build term frequency vectors from text
-    4. Handle various input formats
+    Document frequencies are updated as documents are added or removed, so
+    weighted vectors never require rescanning the corpus. IDF values are
+    "published" for use in vectors and norms, and a term's published IDF is
+    only updated once it drifts from the exact value by more than
+    ``tolerance``; only the cached norms of documents containing such terms
+    are then recomputed, and only when next used. With ``tolerance=0`` every
+    vector uses the exact current IDF.
+    
+    Weighting schemes:
+        tfidf: weight = tf × (ln((1 + N) / (1 + df)) + 1)
+        bm25:  weight = tf × (k1 + 1) / (tf + k1 × (1 - b + b × len / avg_len))
+               × ln(1 + (N - df + 0.5) / (df + 0.5)) for documents, and
+               tf × idf for queries
+    
+    Example:
+        >>> weighting = TfidfWeighting()
+        >>> for text in ["cat sat", "cat ran", "dog sat"]:
+        ...     doc_id = weighting.add_document(text)
+        >>> weighting.idf("cat") < weighting.idf("dog")
+        True
+        >>> round(weighting.similarity("cat", 0), 4)
+        0.7071
     """
     
-    @staticmethod
-    def dot_product(vector_a: List[float], vector_b: List[float]) -> float:
+    SCHEMES = ("tfidf", "bm25")
+    
+    def __init__(self, vocabulary: Optional[Vocabulary] = None, scheme: str = "tfidf",
+                 tolerance: float = 0.01, k1: float = 1.2, b: float = 0.75):
         """
-        Calculate the dot product of two vectors.
+        Create an empty weighting.
         
-        The dot product is the sum of the products of corresponding elements.
+        Args:
+            vocabulary: Vocabulary to share (a new one is created by default)
+            scheme: "tfidf" or "bm25"
+            tolerance: Maximum drift of a published IDF (and, for BM25, of
+                the relative average document length) before it is updated
+            k1: BM25 term frequency saturation
+            b: BM25 document length normalization
+            
+        Raises:
+            ValueError: If the scheme is unknown or tolerance is negative
+        """
+        if scheme not in self.SCHEMES:
+            raise ValueError(f"Unknown weighting scheme: {scheme!r}")
+        if tolerance < 0:
+            raise ValueError("tolerance must not be negative")
+        self.vocabulary = vocabulary if vocabulary is not None else Vocabulary()
+        self.scheme = scheme
+        self.tolerance = tolerance
+        self.k1 = k1
+        self.b = b
+        
+        self._documents: Dict[Hashable, Counter] = {}
+        self._lengths: Dict[Hashable, int] = {}
+        self._total_length = 0
+        self._df: Dict[int, int] = {}
+        self._postings: Dict[int, Set[Hashable]] = {}
+        self._next_id = 0
+        
+        # Published values used for weights and cached norms. Terms are
+        # grouped by the corpus size they were published at; terms whose
+        # document frequency changed since are kept in _touched until
+        # republished
+        self._idf: Dict[int, float] = {}
+        self._published_at: Dict[int, int] = {}
+        self._groups: Dict[int, Set[int]] = {}
+        self._published_avg_length = 0.0
+        self._touched: Set[int] = set()
+        self._norms: Dict[Hashable, float] = {}
+        
+        # Number of document norms recomputed, to observe lazy refreshing
+        self.norm_refreshes = 0
+    
+    def add_document(self, text: str, doc_id: Optional[Hashable] = None) -> Hashable:
+        """
+        Add a document, updating document frequencies incrementally.
         
         Args:
-            vector_a: First vector as a list of numbers
-            vector_b: Second vector as a list of numbers (must have same length)
+            text: Text document
+            doc_id: Id of the document (defaults to a running counter)
             
         Returns:
-            float: The dot product of the two vectors
+            Hashable: The id of the added document
             
         Raises:
-            ValueError: If vectors have different lengths
+            ValueError: If the id is already used
+        """
+        if doc_id is None:
+            while self._next_id in self._documents:
+                self._next_id += 1
+            doc_id = self._next_id
+        if doc_id in self._documents:
+            raise ValueError(f"Duplicate document id: {doc_id!r}")
+        
+        counts = Counter(self.vocabulary.encode(text))
+        self._documents[doc_id] = counts
+        self._lengths[doc_id] = sum(counts.values())
+        self._total_length += self._lengths[doc_id]
+        for term in counts:
+            self._df[term] = self._df.get(term, 0) + 1
+            self._postings.setdefault(term, set()).add(doc_id)
+            self._touched.add(term)
+        return doc_id
+    
+    def remove_document(self, doc_id: Hashable) -> None:
+        """
+        Remove a document, updating document frequencies incrementally.
+        
+        Args:
+            doc_id: Id of the document
             
-        Example:
-            >>> CosineSimilarity.dot_product([1, 2, 3], [4, 5, 6])
-            32.0
+        Raises:
+            KeyError: If the id is unknown
         """
-        # Validate that both vectors have the same length
-        if len(vector_a) != len(vector_b):
-            raise ValueError("Vectors must have the same length for dot product")
+        counts = self._documents.pop(doc_id)
+        self._total_length -= self._lengths.pop(doc_id)
+        self._norms.pop(doc_id, None)
+        for term in counts:
+            self._df[term] -= 1
+            self._postings[term].discard(doc_id)
+            self._touched.add(term)
+    
+    def idf(self, word: str) -> float:
+        """
+        Return the published IDF of a word (0 for unknown words).
         
-        # Calculate dot product: sum of element-wise products
-        result = sum(a * b for a, b in zip(vector_a, vector_b))
-        return result
+        Args:
+            word: A token
+            
+        Returns:
+            float: The IDF in use for weighting
+        """
+        self._refresh()
+        if word not in self.vocabulary:
+            return 0.0
+        return self._idf.get(self.vocabulary[word], 0.0)
     
-    @staticmethod
-    def magnitude(vector: List[float]) -> float:
+    def transform(self, text: str) -> SparseVector:
         """
-        Calculate the magnitude (Euclidean norm) of a vector.
+        Build the weighted vector of a query text without adding it.
         
-        The magnitude is the square root of the sum of squared elements.
+        Words missing from the vocabulary are ignored.
         
         Args:
-            vector: A vector as a list of numbers
+            text: Query text
             
         Returns:
-            float: The magnitude of the vector
+            SparseVector: TF-IDF weighted vector
+        """
+        self._refresh()
+        counts = Counter(self.vocabulary.encode(text, grow=False))
+        weights = {term: count * self._idf.get(term, 0.0) for term, count in counts.items()}
+        return SparseVector.from_dict(weights, len(self.vocabulary))
+    
+    def document_vector(self, doc_id: Hashable) -> SparseVector:
+        """
+        Build the weighted vector of a stored document.
+        
+        Args:
+            doc_id: Id of the document
             
-        Example:
-            >>> CosineSimilarity.magnitude([3, 4])
-            5.0
+        Returns:
+            SparseVector: Weighted document vector
         """
-        # Calculate magnitude: sqrt(sum of squares)
-        sum_of_squares = sum(x * x for x in vector)
-        return math.sqrt(sum_of_squares)
+        self._refresh()
+        return SparseVector.from_dict(self._document_weights(doc_id),
+                                      len(self.vocabulary))
     
-    @staticmethod
-    def cosine_similarity(vector_a: List[float], vector_b: List[float]) -> float:
+    def document_norm(self, doc_id: Hashable) -> float:
         """
-        Calculate the cosine similarity between two numerical vectors.
+        Return the cached norm of a stored document's weighted vector.
         
-        This is the core algorithm implementation. It computes:
-        cosine_similarity = (A · B) / (||A|| × ||B||)
+        The norm is recomputed only if the published weights of the
+        document changed since it was last computed.
+        
+        Args:
+            doc_id: Id of the document
+            
+        Returns:
+            float: Magnitude of the document vector
+        """
+        self._refresh()
+        norm = self._norms.get(doc_id)
+        if norm is None:
+            weights = self._document_weights(doc_id)
+            norm = math.sqrt(sum(weight * weight for weight in weights.values()))
+            self._norms[doc_id] = norm
+            self.norm_refreshes += 1
+        return norm
+    
+    def similarity(self, text: str, doc_id: Hashable) -> float:
+        """
+        Calculate the weighted cosine similarity between a query and a document.
         
         Args:
-            vector_a: First vector as a list of numbers
-            vector_b: Second vector as a list of numbers (must have same length)
+            text: Query text
+            doc_id: Id of a stored document
             
         Returns:
             float: Cosine similarity value between -1 and 1
             
         Raises:
-            ValueError: If vectors have different lengths or are zero vectors
-            
-        Example:
-            >>> CosineSimilarity.cosine_similarity([1, 2, 3], [1, 2, 3])
-            1.0
-            >>> CosineSimilarity.cosine_similarity([1, 0], [0, 1])
-            0.0
+            ValueError: If the query or the document is a zero vector
         """
-        # Validate vector lengths
-        if len(vector_a) != len(vector_b):
-            raise ValueError("Vectors must have the same length")
-        
-        # Calculate dot product
-        dot_prod = CosineSimilarity.dot_product(vector_a, vector_b)
+        query = self.transform(text)
+        query_norm = CosineSimilarity.magnitude(query)
+        doc_norm = self.document_norm(doc_id)
+        if query_norm == 0 or doc_norm == 0:
+            raise ValueError("Cannot compute cosine similarity for zero vectors")
+        weights = self._document_weights(doc_id)
+        dot_prod = sum(value * weights.get(index, 0.0)
+                       for index, value in zip(query.indices, query.values))
+        return max(-1.0, min(1.0, dot_prod / (query_norm * doc_norm)))
+    
+    def _exact_idf(self, term: int) -> float:
+        """IDF of a term from the current document frequencies."""
+        count = len(self._documents)
+        df = self._df.get(term, 0)
+        if self.scheme == "bm25":
+            return math.log(1.0 + (count - df + 0.5) / (df + 0.5))
+        return math.log((1.0 + count) / (1.0 + df)) + 1.0
+    
+    def _document_weights(self, doc_id: Hashable) -> Dict[int, float]:
+        """Weights of a stored document under the published values."""
+        counts = self._documents[doc_id]
+        idf = self._idf
+        if self.scheme == "tfidf":
+            return {term: count * idf[term] for term, count in counts.items()}
         
-        # Calculate magnitudes
-        magnitude_a = CosineSimilarity.magnitude(vector_a)
-        magnitude_b = CosineSimilarity.magnitude(vector_b)
+        k1, b = self.k1, self.b
+        avg_length = self._published_avg_length or 1.0
+        length_factor = k1 * (1.0 - b + b * self._lengths[doc_id] / avg_length)
+        return {term: count * (k1 + 1.0) / (count + length_factor) * idf[term]
+                for term, count in counts.items()}
+    
+    def _refresh(self) -> None:
+        """Publish IDF values that drifted past the tolerance."""
+        count = len(self._documents)
+        avg_length = self._total_length / count if count else 0.0
         
-        # Handle division by zero (when one or both vectors are zero vectors)
-        if magnitude_a == 0 or magnitude_b == 0:
-            raise ValueError("Cannot compute cosine similarity for zero vectors")
+        republish_all = False
+        if self.scheme == "bm25" and self._published_avg_length != avg_length:
+            previous = self._published_avg_length or 1.0
+            if abs(avg_length - previous) / previous > self.tolerance:
+                republish_all = True
         
-        # Calculate cosine similarity
-        similarity = dot_prod / (magnitude_a * magnitude_b)
+        if republish_all:
+            stale = set(self._df)
+        else:
+            # Both IDF formulas shift by ln((1 + N) / (1 + N_published)) when
+            # only the corpus size changes, whatever the document frequency,
+            # so one comparison per publication size covers its unchanged terms
+            stale = set()
+            for published_count, terms in self._groups.items():
+                if abs(math.log((1.0 + count) / (1.0 + published_count))) > self.tolerance:
+                    stale.update(terms)
+            # Terms whose document frequency changed are compared exactly
+            for term in self._touched:
+                published = self._idf.get(term)
+                if published is None or abs(self._exact_idf(term) - published) > self.tolerance:
+                    stale.add(term)
         
-        # Ensure result is within valid range [-1, 1] (handles floating point errors)
-        return max(-1.0, min(1.0, similarity))
+        if len(stale) == len(self._df):
+            self._norms.clear()
+            self._published_avg_length = avg_length
+        for term in stale:
+            self._idf[term] = self._exact_idf(term)
+            previous = self._published_at.get(term)
+            if previous is not None:
+                group = self._groups[previous]
+                group.discard(term)
+                if not group:
+                    del self._groups[previous]
+            self._published_at[term] = count
+            self._groups.setdefault(count, set()).add(term)
+            if self._norms:
+                for doc_id in self._postings.get(term, ()):
+                    self._norms.pop(doc_id, None)
+        self._touched -= stale
     
-    @staticmethod
-    def tokenize(text: str) -> List[str]:
+    def __len__(self) -> int:
+        return len(self._documents)
+    
+    def __contains__(self, doc_id: Hashable) -> bool:
+        return doc_id in self._documents
+
+
+@functools.lru_cache(maxsize=65536)
+def _token_hash(token: str, seed: int) -> int:
+    """64-bit hash of a token that is identical in every process."""
+    # The salt holds 8 bytes, so seeds are taken modulo 2 ** 64
+    salt = (seed & 0xFFFFFFFFFFFFFFFF).to_bytes(8, "little")
+    digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8, salt=salt).digest()
+    return int.from_bytes(digest, "little")
+
+
+class HashingVectorizer:
+    """
+    A vocabulary-free vectorizer using the hashing trick.
+    
+    Each token is hashed straight to one of ``dimension`` vector positions,
+    so no dictionary has to be built or shared: memory is fixed, and
+    separate processes or machines produce identical vectors as long as
+    they use the same dimension and seed. With ``signed=True`` one hash bit
+    decides whether a token adds +1 or -1, so colliding tokens cancel out
+    on average instead of always inflating the dot product.
+    
+    ``collision_rate`` and ``compare_with_exact`` measure how much the
+    hashing changes results compared with the exact vocabulary.
+    
+    Example:
+        >>> vectorizer = HashingVectorizer(dimension=2 ** 10)
+        >>> vector = vectorizer.transform("hello hello world")
+        >>> len(vector), vector.nnz, sorted(abs(v) for v in vector.values)
+        (1024, 2, [1.0, 2.0])
+    """
+    
+    def __init__(self, dimension: int = 2 ** 20, signed: bool = True, seed: int = 0):
         """
-        Tokenize a text string into words.
-        
-        Converts text to lowercase and splits by whitespace.
-        This is a simple tokenizer; for production use, consider using
-        more sophisticated NLP libraries.
+        Create a vectorizer.
         
         Args:
-            text: Input text string
-            
-        Returns:
-            List[str]: List of tokens (words)
+            dimension: Length of the produced vectors
+            signed: Use the sign bit of the hash to reduce collision bias
+            seed: Hash seed; vectors are only comparable for equal seeds.
+                Any integer is accepted and taken modulo 2 ** 64
             
-        Example:
-            >>> CosineSimilarity.tokenize("Hello World Python")
-            ['hello', 'world', 'python']
+        Raises:
+            ValueError: If dimension is not positive
         """
-        # Convert to lowercase and split by whitespace
-        tokens = text.lower().split()
-        return tokens
+        if dimension < 1:
+            raise ValueError("dimension must be at least 1")
+        self.dimension = dimension
+        self.signed = signed
+        self.seed = seed
     
-    @staticmethod
-    def build_vocabulary(texts: List[str]) -> Dict[str, int]:
+    def bucket(self, token: str) -> Tuple[int, float]:
         """
-        Build a vocabulary dictionary from a list of texts.
-        
-        Creates a mapping from each unique word to a unique index.
-        This is used to create consistent vector representations.
+        Return the vector position and sign of a token.
         
         Args:
-            texts: List of text strings
+            token: A token as produced by ``CosineSimilarity.tokenize``
             
         Returns:
-            Dict[str, int]: Dictionary mapping words to indices
-            
-        Example:
-            >>> texts = ["hello world", "world python"]
-            >>> vocab = CosineSimilarity.build_vocabulary(texts)
-            >>> sorted(vocab.keys())
-            ['hello', 'python', 'world']
+            Tuple[int, float]: (position, +1.0 or -1.0)
         """
-        # Collect all unique words from all texts
-        vocabulary = set()
-        for text in texts:
-            tokens = CosineSimilarity.tokenize(text)
-            vocabulary.update(tokens)
-        
-        # Create mapping: word -> index
-        vocab_dict = {word: idx for idx, word in enumerate(sorted(vocabulary))}
-        return vocab_dict
+        hashed = _token_hash(token, self.seed)
+        sign = -1.0 if self.signed and hashed >> 63 else 1.0
+        return hashed % self.dimension, sign
     
-    @staticmethod
-    def text_to_vector(text: str, vocabulary: Dict[str, int]) -> List[float]:
+    def transform(self, text: str, sparse: bool = True) -> Vector:
         """
-        Convert a text document to a term frequency vector.
-        
-        Creates a vector where each dimension represents a word in the vocabulary,
-        and the value is the frequency of that word in the text.
+        Convert a text document to a hashed term frequency vector.
         
         Args:
             text: Input text string
-            vocabulary: Dictionary mapping words to indices
+            sparse: Return a SparseVector (default) or a dense list
             
         Returns:
-            List[float]: Term frequency vector
-            
-        Example:
-            >>> vocab = {'hello': 0, 'world': 1}
-            >>> CosineSimilarity.text_to_vector("hello hello world", vocab)
-            [2.0, 1.0]
+            Vector: Hashed term frequency vector
         """
-        # Initialize vector with zeros (one dimension per word in vocabulary)
-        vector = [0.0] * len(vocabulary)
-        
-        # Tokenize the text
-        tokens = CosineSimilarity.tokenize(text)
-        
-        # Count word frequencies
-        word_counts = Counter(tokens)
-        
-        # Fill vector with term frequencies
-        for word, count in word_counts.items():
-            if word in vocabulary:
-                vector[vocabulary[word]] = float(count)
-        
-        return vector
+        entries: Dict[int, float] = {}
+        for word, count in Counter(CosineSimilarity.tokenize(text)).items():
+            position, sign = self.bucket(word)
+            entries[position] = entries.get(position, 0.0) + sign * count
+        vector = SparseVector.from_dict(entries, self.dimension)
+        return vector if sparse else vector.to_dense()
     
-    @staticmethod
-    def document_similarity(text_a: str, text_b: str) -> float:
+    def document_similarity(self, text_a: str, text_b: str) -> float:
         """
-        Calculate cosine similarity between two text documents.
-        
-        This method handles the complete pipeline:
-        1. Build vocabulary from both texts
-        2. Convert texts to vectors
-        3. Calculate cosine similarity
+        Calculate the cosine similarity of two documents' hashed vectors.
         
         Args:
             text_a: First text document
             text_b: Second text document
             
         Returns:
-            float: Cosine similarity between the two documents (0 to 1)
-            
-        Example:
-            >>> CosineSimilarity.document_similarity("hello world", "hello python")
-            0.4082482904638631
+            float: Approximation of ``CosineSimilarity.document_similarity``
         """
-        # Build vocabulary from both documents
-        vocabulary = CosineSimilarity.build_vocabulary([text_a, text_b])
-        
-        # Convert texts to vectors
-        vector_a = CosineSimilarity.text_to_vector(text_a, vocabulary)
-        vector_b = CosineSimilarity.text_to_vector(text_b, vocabulary)
+        return CosineSimilarity.cosine_similarity(self.transform(text_a),
+                                                  self.transform(text_b))
+    
+    def collision_rate(self, texts: Iterable[str]) -> float:
+        """
+        Measure the fraction of distinct words sharing a position with another.
         
-        # Calculate and return cosine similarity
-        return CosineSimilarity.cosine_similarity(vector_a, vector_b)
+        Args:
+            texts: Text documents
+            
+        Returns:
+            float: Colliding distinct words divided by all distinct words
+        """
+        words = set()
+        for text in texts:
+            words.update(CosineSimilarity.tokenize(text))
+        if not words:
+            return 0.0
+        occupancy = Counter(self.bucket(word)[0] for word in words)
+        colliding = sum(count for count in occupancy.values() if count > 1)
+        return colliding / len(words)
     
-    @staticmethod
-    def similarity_matrix(texts: List[str]) -> List[List[float]]:
+    def compare_with_exact(self, texts: List[str]) -> Dict[str, float]:
         """
-        Calculate pairwise cosine similarity for a list of documents.
+        Compare hashed pairwise similarities with the exact vocabulary ones.
         
-        Creates a similarity matrix where each entry [i][j] represents
-        the cosine similarity between document i and document j.
+        Scores every pair of the given documents both ways, so use a sample
+        of the corpus. Pairs involving a document without words are skipped.
         
         Args:
-            texts: List of text documents
+            texts: Sample of text documents
             
         Returns:
-            List[List[float]]: Square matrix of similarity scores
-            
-        Example:
-            >>> texts = ["hello world", "hello python", "world python"]
-            >>> matrix = CosineSimilarity.similarity_matrix(texts)
-            >>> len(matrix)
-            3
+            Dict[str, float]: collision_rate, mean_abs_error, max_abs_error
+            and the number of pairs compared
         """
-        # Build vocabulary from all documents
-        vocabulary = CosineSimilarity.build_vocabulary(texts)
+        exact = [NormalizedVector(vector)
+                 for vector in CosineSimilarity._vectorize_all(texts, None)]
+        hashed = [NormalizedVector(self.transform(text)) for text in texts]
+        errors = []
+        for i in range(len(texts)):
+            for j in range(i + 1, len(texts)):
+                if exact[i].is_zero or exact[j].is_zero:
+                    continue
+                if hashed[i].is_zero or hashed[j].is_zero:
+                    # Every word cancelled out; the hashed score is undefined
+                    errors.append(abs(exact[i].similarity(exact[j])))
+                    continue
+                errors.append(abs(exact[i].similarity(exact[j])
+                                  - hashed[i].similarity(hashed[j])))
+        return {
+            "collision_rate": self.collision_rate(texts),
+            "mean_abs_error": sum(errors) / len(errors) if errors else 0.0,
+            "max_abs_error": max(errors, default=0.0),
+            "pairs": float(len(errors)),
+        }
+
+
+def read_records(source: TextIO, input_format: str = "jsonl", text_field: str = "text",
+                 id_field: str = "id") -> Iterator[Tuple[Hashable, str]]:
+    """
+    Read (id, text) records from a JSONL or CSV stream, one at a time.
+    
+    JSONL lines are either JSON strings or objects holding the text and
+    optionally an id; CSV files need a header row naming the columns.
+    Records without an id are numbered from 0 in input order. Either every
+    JSONL record has an id or none has, so numbers never collide with
+    explicit ids.
+    
+    Args:
+        source: Open text stream (or any iterable of lines)
+        input_format: "jsonl" or "csv"
+        text_field: Name of the field or column holding the text
+        id_field: Name of the field or column holding the id
         
-        # Convert all texts to vectors
-        vectors = [CosineSimilarity.text_to_vector(text, vocabulary) 
-                  for text in texts]
+    Yields:
+        Tuple[Hashable, str]: The id and text of each record
         
-        # Calculate pairwise similarities
-        n = len(texts)
-        matrix = []
+    Raises:
+        ValueError: If the format is unknown, a record has no text, or
+            records with and without an id are mixed
         
-        for i in range(n):
-            row = []
-            for j in range(n):
-                similarity = CosineSimilarity.cosine_similarity(vectors[i], vectors[j])
-                row.append(similarity)
-            matrix.append(row)
+    Example:
+        >>> list(read_records(['{"id": "a", "text": "hello"}', '{"id": "b", "text": "world"}']))
+        [('a', 'hello'), ('b', 'world')]
+        >>> list(read_records(['"hello"', '{"text": "world"}']))
+        [(0, 'hello'), (1, 'world')]
+    """
+    if input_format == "csv":
+        for number, row in enumerate(csv.DictReader(source)):
+            if row.get(text_field) is None:
+                raise ValueError(f"Row {number + 1} has no {text_field!r} column")
+            yield row.get(id_field, number), row[text_field]
+        return
+    if input_format != "jsonl":
+        raise ValueError(f"Unknown input format: {input_format!r}")
+    
+    number = 0
+    with_ids = None
+    for line in source:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        if isinstance(record, str):
+            has_id, text = False, record
+        elif isinstance(record, dict) and isinstance(record.get(text_field), str):
+            has_id, text = id_field in record, record[text_field]
+        else:
+            raise ValueError(f"Record {number + 1} has no {text_field!r} field")
+        if with_ids is None:
+            with_ids = has_id
+        elif has_id != with_ids:
+            raise ValueError(f"Record {number + 1}: records with and without an "
+                             f"{id_field!r} field cannot be mixed")
+        yield (record[id_field] if has_id else number), text
+        number += 1
+
+
+def _batched(items: Iterable, size: int) -> Iterator[List]:
+    """Group an iterable into lists of at most ``size`` items."""
+    iterator = iter(items)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _score_query_batch(job: Tuple) -> List[Tuple[Hashable, List[Tuple[Hashable, float]]]]:
+    """Stream the corpus once and keep the top k documents of every query."""
+    queries, corpus_path, input_format, text_field, id_field, k, chunk_size = job
+    # Queries are tokenized once; every chunk's vocabulary starts with their
+    # words, so only the corpus documents are tokenized per chunk
+    query_vocabulary = Vocabulary()
+    query_ids = query_vocabulary.encode_batch(text for _, text in queries)
+    query_vectors = [CosineSimilarity.ids_to_vector(ids, len(query_vocabulary), sparse=True)
+                     for ids in query_ids]
+    # One min-heap of (score, -position, id) per query; (score, -position)
+    # is unique, so ids are never compared
+    heaps: List[List[Tuple[float, int, Hashable]]] = [[] for _ in queries]
+    
+    with open(corpus_path, encoding="utf-8", newline="") as handle:
+        position = 0
+        for chunk in _batched(read_records(handle, input_format, text_field, id_field),
+                              chunk_size):
+            # Vocabulary and vectors only live for one chunk of the corpus
+            vocabulary = Vocabulary()
+            for word in query_vocabulary:
+                vocabulary.add(word)
+            documents = [NormalizedVector(vector) for vector in CosineSimilarity._vectorize_all(
+                [text for _, text in chunk], vocabulary)]
+            dimension = len(vocabulary)
+            chunk_queries = [NormalizedVector(SparseVector(vector.indices, vector.values, dimension))
+                             for vector in query_vectors]
+            for heap, query in zip(heaps, chunk_queries):
+                if query.is_zero:
+                    continue
+                for offset, document in enumerate(documents):
+                    if document.is_zero:
+                        continue
+                    entry = (query.similarity(document), -(position + offset), chunk[offset][0])
+                    if len(heap) < k:
+                        heapq.heappush(heap, entry)
+                    elif entry > heap[0]:
+                        heapq.heapreplace(heap, entry)
+            position += len(chunk)
+    
+    return [(query_id, [(doc_id, score) for score, _, doc_id in sorted(heap, reverse=True)])
+            for (query_id, _), heap in zip(queries, heaps)]
+
+
+def stream_top_k(corpus_path: str, queries: Iterable[Tuple[Hashable, str]], k: int = 10,
+                 batch_size: int = 64, chunk_size: int = 1000, workers: int = 1,
+                 input_format: str = "jsonl", text_field: str = "text",
+                 id_field: str = "id"
+                 ) -> Iterator[Tuple[Hashable, List[Tuple[Hashable, float]]]]:
+    """
+    Find the top k corpus documents for every query of a stream.
+    
+    Queries are read ``batch_size`` at a time; for each batch the corpus
+    file is streamed ``chunk_size`` documents at a time, so memory depends
+    on those sizes and k, not on the size of the corpus or query stream.
+    With several workers, query batches are scored in a process pool with
+    a bounded number of batches in flight. Results come out in query order
+    as soon as their batch is done.
+    
+    Scores equal ``CosineSimilarity.document_similarity``; documents and
+    queries without words (zero vectors) never match.
+    
+    Args:
+        corpus_path: Path of the corpus file (read once per query batch)
+        queries: (id, text) query records, e.g. from ``read_records``
+        k: Number of results per query
+        batch_size: Queries scored together against each corpus chunk
+        chunk_size: Corpus documents vectorized at a time
+        workers: Number of worker processes
+        input_format: Format of the corpus file, "jsonl" or "csv"
+        text_field: Corpus field or column holding the text
+        id_field: Corpus field or column holding the id
         
-        return matrix
+    Yields:
+        Tuple[Hashable, List[Tuple[Hashable, float]]]: Query id and its
+        (document id, similarity) results, best first
+        
+    Raises:
+        ValueError: If k, batch_size, chunk_size or workers is not positive
+    """
+    if min(k, batch_size, chunk_size, workers) < 1:
+        raise ValueError("k, batch_size, chunk_size and workers must be at least 1")
+    jobs = ((batch, corpus_path, input_format, text_field, id_field, k, chunk_size)
+            for batch in _batched(queries, batch_size))
+    
+    if workers == 1:
+        for job in jobs:
+            yield from _score_query_batch(job)
+        return
+    
+    with multiprocessing.Pool(workers) as pool:
+        # Submit lazily so a long query stream is never queued up in memory
+        in_flight: Deque = deque()
+        for job in jobs:
+            in_flight.append(pool.apply_async(_score_query_batch, (job,)))
+            if len(in_flight) >= 2 * workers:
+                yield from in_flight.popleft().get()
+        while in_flight:
+            yield from in_flight.popleft().get()
+
+
+def _detect_format(path: str, input_format: str) -> str:
+    """Resolve the "auto" input format from a file extension."""
+    if input_format != "auto":
+        return input_format
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+
+def run_batch(args: argparse.Namespace, output: TextIO) -> int:
+    """
+    Score a query stream against a corpus for the command-line batch mode.
+    
+    Args:
+        args: Parsed command-line arguments (see ``main``)
+        output: Stream the results are written to
+        
+    Returns:
+        int: Number of queries answered
+        
+    Raises:
+        ValueError: If both the corpus and the queries come from stdin
+    """
+    if args.corpus == "-" and args.queries == "-":
+        raise ValueError("The corpus and the queries cannot both be read from stdin")
+    
+    corpus_path = args.corpus
+    corpus_format = _detect_format(args.corpus, args.input_format)
+    query_format = _detect_format(args.queries, args.input_format)
+    answered = 0
+    # Everything opened or spooled below is cleaned up however the run ends
+    with contextlib.ExitStack() as cleanup:
+        if corpus_path == "-":
+            # The corpus is read once per query batch, so stdin is spooled to disk
+            spooled = tempfile.NamedTemporaryFile("w", encoding="utf-8", suffix=".corpus",
+                                                  delete=False)
+            cleanup.callback(os.unlink, spooled.name)
+            with spooled:
+                shutil.copyfileobj(sys.stdin, spooled)
+            corpus_path = spooled.name
+        query_source = (sys.stdin if args.queries == "-" else cleanup.enter_context(
+            open(args.queries, encoding="utf-8", newline="")))
+        if args.output_format == "csv":
+            writer = csv.writer(output, lineterminator="\n")
+            writer.writerow(["query", "rank", "id", "score"])
+        queries = read_records(query_source, query_format, args.text_field, args.id_field)
+        for query_id, results in stream_top_k(
+                corpus_path, queries, args.k, args.batch_size, args.chunk_size,
+                args.workers, corpus_format, args.text_field, args.id_field):
+            if args.output_format == "csv":
+                writer.writerows([query_id, rank, doc_id, score]
+                                 for rank, (doc_id, score) in enumerate(results, 1))
+            else:
+                output.write(json.dumps({"query": query_id, "results": [
+                    {"id": doc_id, "score": score} for doc_id, score in results]}) + "\n")
+            answered += 1
+            if answered % args.batch_size == 0:
+                output.flush()
+    output.flush()
+    return answered
 
 
 def demonstrate_numerical_vectors():
@@ -439,15 +3303,10 @@ def demonstrate_recommendation_example():
     target_ratings = users[target_user]
     
     print(f"\nFinding users similar to {target_user}:")
-    similarities = []
-    
-    for user, ratings in users.items():
-        if user != target_user:
-            similarity = CosineSimilarity.cosine_similarity(target_ratings, ratings)
-            similarities.append((user, similarity))
+    index = CosineIndex.from_vectors(users.values(), ids=users.keys())
     
-    # Sort by similarity (descending)
-    similarities.sort(key=lambda x: x[1], reverse=True)
+    # Top-k query excluding the target user (already sorted, best first)
+    similarities = index.query_item(target_user, k=len(users) - 1)
     
     print(f"\nSimilarity scores with {target_user}:")
     for user, similarity in similarities:
@@ -467,13 +3326,51 @@ def demonstrate_recommendation_example():
                 print(f"  - {item}: {similar_rating}/5 (rated by {most_similar_user})")
 
 
-def main():
+def main(argv: Optional[List[str]] = None):
     """
-    Main function to run all demonstrations.
+    Main function to run all demonstrations, or the batch mode.
     
-    This function orchestrates the execution of various examples
-    showing different applications of cosine similarity.
+    Without arguments this orchestrates the execution of various examples
+    showing different applications of cosine similarity. With ``--corpus``
+    it scores a stream of queries against a corpus instead and writes the
+    top-k results of every query to stdout as they are computed:
+    
+        python cosine_similarity.py --corpus docs.jsonl --queries queries.jsonl -k 5
+        cat queries.csv | python cosine_similarity.py --corpus docs.csv --output-format csv
+    
+    Args:
+        argv: Command-line arguments (defaults to ``sys.argv[1:]``)
     """
+    parser = argparse.ArgumentParser(
+        description="Cosine similarity demonstrations and batch scoring")
+    parser.add_argument("--corpus", help="corpus file, or - for stdin "
+                                         "(runs the demonstrations if omitted)")
+    parser.add_argument("--queries", default="-",
+                        help="query file, or - for stdin (default: -)")
+    parser.add_argument("--input-format", choices=["auto", "jsonl", "csv"], default="auto",
+                        help="input format (default: from the file extension, "
+                             "JSONL for stdin)")
+    parser.add_argument("--text-field", default="text",
+                        help="JSON field or CSV column holding the text")
+    parser.add_argument("--id-field", default="id",
+                        help="JSON field or CSV column holding the id")
+    parser.add_argument("-k", type=int, default=10, help="results per query (default: 10)")
+    parser.add_argument("--batch-size", type=int, default=64,
+                        help="queries scored together (default: 64)")
+    parser.add_argument("--chunk-size", type=int, default=1000,
+                        help="corpus documents vectorized at a time (default: 1000)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="worker processes (default: 1)")
+    parser.add_argument("--output-format", choices=["jsonl", "csv"], default="jsonl")
+    args = parser.parse_args(argv)
+    
+    if args.corpus is not None:
+        try:
+            run_batch(args, sys.stdout)
+        except (ValueError, OSError) as e:
+            parser.exit(1, f"Error: {e}\n")
+        return
+    
     print("\n" + "=" * 60)
     print("COSINE SIMILARITY ALGORITHM - DEMONSTRATION")
     print("=" * 60)
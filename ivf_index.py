@@ -0,0 +1,359 @@
+"""
+Approximate Nearest Neighbours with an Inverted File (IVF) Index
+================================================================
+
+This module partitions vectors into clusters for coarse-to-fine search.
+
+Training runs spherical k-means: centroids are unit vectors, and each
+vector belongs to the centroid with the highest cosine similarity. Training
+uses mini-batches drawn from a sample of the vectors, so its cost does not
+grow with the corpus. Each centroid moves towards the mean direction of
+its batch members with a per-centroid learning rate of 1/count, then is
+re-normalized.
+
+Every stored vector is listed under its nearest centroid. A query ranks
+the centroids, scans only the ``nprobe`` closest lists, and re-ranks those
+candidates exactly with ``cosine_similarity``. Larger ``nprobe`` values
+raise recall at the cost of latency; ``tradeoff_report`` measures both.
+"""
+
+import heapq
+import random
+import time
+from typing import List, Dict, Tuple, Optional, Iterable, Hashable, Collection, Sequence
+
+from cosine_similarity import (CosineIndex, CosineSimilarity, NormalizedVector,
+                               SparseVector, Vector)
+
+
+class IVFIndex:
+    """
+    Approximate cosine top-k index based on cluster-partitioned lists.
+
+    Stored vectors live in an exact CosineIndex, which is also used for
+    re-ranking and for measuring recall. Vectors added before ``train``
+    are listed once training finishes; vectors added afterwards are listed
+    straight away.
+
+    Example:
+        >>> index = IVFIndex(dimension=2, lists=2, nprobe=1, seed=0)
+        >>> index.add_all([[1, 0], [0.9, 0.1], [0, 1], [0.1, 0.9]], ids="abcd")
+        >>> index.train()
+        >>> [item_id for item_id, _ in index.query([1, 0.05], k=2)]
+        ['a', 'b']
+    """
+
+    def __init__(self, dimension: int, lists: int = 16, nprobe: int = 1,
+                 seed: Optional[int] = None):
+        """
+        Create an empty, untrained index.
+
+        Args:
+            dimension: Length of every vector
+            lists: Number of clusters (inverted lists)
+            nprobe: Default number of lists scanned per query
+            seed: Seed for sampling and initialization, for reproducible
+                indexes
+
+        Raises:
+            ValueError: If a parameter is out of range
+        """
+        if dimension < 1 or lists < 1:
+            raise ValueError("dimension and lists must be at least 1")
+        if not 1 <= nprobe <= lists:
+            raise ValueError("nprobe must be between 1 and lists")
+        self.dimension = dimension
+        self.lists = lists
+        self.nprobe = nprobe
+        self._rng = random.Random(seed)
+        self._centroids: List[List[float]] = []
+        self._lists: List[List[int]] = []
+        self._index = CosineIndex()
+
+    @property
+    def is_trained(self) -> bool:
+        """True once centroids have been trained."""
+        return bool(self._centroids)
+
+    def train(self, vectors: Optional[Sequence[Vector]] = None,
+              sample_size: Optional[int] = 10000, batch_size: int = 256,
+              iterations: int = 50) -> None:
+        """
+        Train the centroids with mini-batch spherical k-means.
+
+        Retraining is allowed; every stored vector is then listed again.
+
+        Args:
+            vectors: Training vectors (defaults to the stored vectors)
+            sample_size: Vectors sampled for training (None uses all)
+            batch_size: Vectors per mini-batch
+            iterations: Number of mini-batches
+
+        Raises:
+            ValueError: If a training vector has the wrong length, or there
+                are fewer non-zero training vectors than lists
+        """
+        if vectors is None:
+            vectors = [stored.vector for _, stored in self._index.items()]
+        if any(len(vector) != self.dimension for vector in vectors):
+            raise ValueError("Vectors must have the same length")
+        if sample_size is not None and len(vectors) > sample_size:
+            # Sample before normalizing, so only the sample is made dense
+            vectors = [vectors[position] for position in
+                       self._rng.sample(range(len(vectors)), sample_size)]
+        units = [unit for unit in (self._unit(vector) for vector in vectors)
+                 if unit is not None]
+        if len(units) < self.lists:
+            raise ValueError("Need at least as many non-zero training vectors as lists")
+
+        centroids = [list(unit) for unit in self._rng.sample(units, self.lists)]
+        counts = [0] * self.lists
+        for _ in range(iterations):
+            batch = self._rng.sample(units, min(batch_size, len(units)))
+            assignments = [self._nearest(centroids, unit) for unit in batch]
+            for unit, cluster in zip(batch, assignments):
+                counts[cluster] += 1
+                rate = 1.0 / counts[cluster]
+                centroid = centroids[cluster]
+                for index, value in enumerate(unit):
+                    centroid[index] += rate * (value - centroid[index])
+            for cluster, centroid in enumerate(centroids):
+                norm = CosineSimilarity.magnitude(centroid)
+                if norm == 0:
+                    # Members cancelled out; restart from a random vector
+                    centroids[cluster] = list(self._rng.choice(units))
+                else:
+                    centroids[cluster] = [value / norm for value in centroid]
+
+        self._centroids = centroids
+        self._lists = [[] for _ in range(self.lists)]
+        for position, (_, vector) in enumerate(self._index.items()):
+            self._assign(position, vector)
+
+    def add(self, vector: Vector, item_id: Optional[Hashable] = None) -> Hashable:
+        """
+        Add a vector to the index.
+
+        Zero vectors are stored but never listed, since they have no
+        defined similarity.
+
+        Args:
+            vector: Vector as a list of numbers or a SparseVector
+            item_id: Id of the item (defaults to its insertion position)
+
+        Returns:
+            Hashable: The id of the added item
+        """
+        if len(vector) != self.dimension:
+            raise ValueError("Vectors must have the same length")
+        position = len(self._index)
+        item_id = self._index.add(vector, item_id)
+        if self.is_trained:
+            self._assign(position, self._index.stored(position)[1])
+        return item_id
+
+    def add_all(self, vectors: Iterable[Vector],
+                ids: Optional[Iterable[Hashable]] = None) -> None:
+        """
+        Add several vectors to the index.
+
+        Args:
+            vectors: Vectors as lists of numbers or SparseVectors
+            ids: Item ids, one per vector (defaults to insertion positions)
+
+        Raises:
+            ValueError: If ids are given but their count differs from the
+                number of vectors
+        """
+        if ids is None:
+            for vector in vectors:
+                self.add(vector)
+            return
+        vectors, ids = list(vectors), list(ids)
+        if len(vectors) != len(ids):
+            raise ValueError("vectors and ids must have the same length")
+        for vector, item_id in zip(vectors, ids):
+            self.add(vector, item_id)
+
+    def probe(self, vector: Vector, nprobe: Optional[int] = None) -> List[int]:
+        """
+        Rank the lists by centroid similarity and return the closest ones.
+
+        Args:
+            vector: Query vector
+            nprobe: Number of lists (defaults to the index's nprobe)
+
+        Returns:
+            List[int]: List numbers, closest first
+
+        Raises:
+            ValueError: If the index is not trained or nprobe is out of range
+        """
+        if not self.is_trained:
+            raise ValueError("The index must be trained before querying")
+        nprobe = self.nprobe if nprobe is None else nprobe
+        if not 1 <= nprobe <= self.lists:
+            raise ValueError("nprobe must be between 1 and lists")
+        scores = ((self._dot(vector, centroid), cluster)
+                  for cluster, centroid in enumerate(self._centroids))
+        return [cluster for _, cluster in heapq.nlargest(nprobe, scores)]
+
+    def query(self, vector: Vector, k: int = 10, nprobe: Optional[int] = None,
+              exclude: Optional[Collection[Hashable]] = None
+              ) -> List[Tuple[Hashable, float]]:
+        """
+        Find approximately the k stored vectors most similar to a query.
+
+        Candidates from the probed lists are re-ranked with exact cosine
+        similarity, so returned scores are exact; only neighbours listed
+        under unprobed centroids can be missed.
+
+        Args:
+            vector: Query vector
+            k: Number of results to return
+            nprobe: Number of lists to scan (defaults to the index's nprobe)
+            exclude: Item ids that must not appear in the results
+
+        Returns:
+            List[Tuple[Hashable, float]]: Up to k (item id, similarity)
+            pairs, best first
+
+        Raises:
+            ValueError: If the query is a zero vector, has the wrong length,
+                the index is not trained, or nprobe is out of range
+        """
+        query = NormalizedVector(vector)
+        if query.is_zero:
+            raise ValueError("Cannot compute cosine similarity for zero vectors")
+        if len(vector) != self.dimension:
+            raise ValueError("Vectors must have the same length")
+        clusters = self.probe(vector, nprobe)
+        if k <= 0:
+            return []
+        exclude = set(exclude) if exclude else ()
+        stored = self._index.stored
+        scored = ((query.similarity(stored(position)[1]), position)
+                  for cluster in clusters for position in self._lists[cluster]
+                  if stored(position)[0] not in exclude)
+        best = heapq.nsmallest(k, scored, key=lambda entry: (-entry[0], entry[1]))
+        return [(stored(position)[0], score) for score, position in best]
+
+    def exact_query(self, vector: Vector, k: int = 10,
+                    exclude: Optional[Collection[Hashable]] = None
+                    ) -> List[Tuple[Hashable, float]]:
+        """
+        Find the exact k nearest neighbours by scanning every stored vector.
+
+        Args:
+            vector: Query vector
+            k: Number of results to return
+            exclude: Item ids that must not appear in the results
+
+        Returns:
+            List[Tuple[Hashable, float]]: Up to k (item id, similarity) pairs
+        """
+        return self._index.query(vector, k, exclude)
+
+    def recall_at_k(self, queries: Iterable[Vector], k: int = 10,
+                    nprobe: Optional[int] = None) -> float:
+        """
+        Measure the fraction of exact top-k neighbours the index returns.
+
+        Args:
+            queries: Query vectors
+            k: Number of neighbours per query
+            nprobe: Number of lists to scan
+
+        Returns:
+            float: Mean recall@k over the queries (1.0 means every exact
+            neighbour was found)
+        """
+        total = found = 0
+        for vector in queries:
+            exact = {item_id for item_id, _ in self.exact_query(vector, k)}
+            approximate = {item_id for item_id, _ in self.query(vector, k, nprobe)}
+            total += len(exact)
+            found += len(exact & approximate)
+        return found / total if total else 1.0
+
+    def tradeoff_report(self, queries: Sequence[Vector], k: int = 10,
+                        nprobes: Optional[Iterable[int]] = None) -> List[Dict[str, float]]:
+        """
+        Measure recall and latency for several nprobe values.
+
+        Args:
+            queries: Query vectors
+            k: Number of neighbours per query
+            nprobes: nprobe values to try (defaults to powers of two up to
+                the number of lists)
+
+        Returns:
+            List[Dict[str, float]]: Per nprobe value: nprobe, recall_at_k,
+            mean query latency in milliseconds (latency_ms) and the mean
+            fraction of stored vectors scanned (scanned)
+        """
+        if nprobes is None:
+            nprobes = sorted({min(2 ** power, self.lists)
+                              for power in range(self.lists.bit_length() + 1)})
+        exact = [{item_id for item_id, _ in self.exact_query(vector, k)} for vector in queries]
+        report = []
+        for nprobe in nprobes:
+            found = total = scanned = 0
+            seconds = 0.0
+            for vector, expected in zip(queries, exact):
+                started = time.perf_counter()
+                results = self.query(vector, k, nprobe)
+                seconds += time.perf_counter() - started
+                scanned += sum(len(self._lists[cluster])
+                               for cluster in self.probe(vector, nprobe))
+                total += len(expected)
+                found += len(expected & {item_id for item_id, _ in results})
+            count = max(1, len(queries))
+            report.append({
+                "nprobe": nprobe,
+                "recall_at_k": found / total if total else 1.0,
+                "latency_ms": 1000.0 * seconds / count,
+                "scanned": scanned / count / max(1, len(self)),
+            })
+        return report
+
+    def list_sizes(self) -> List[int]:
+        """
+        Return the number of vectors in every list.
+
+        Returns:
+            List[int]: List sizes, useful for tuning ``lists``
+        """
+        return [len(members) for members in self._lists]
+
+    def _assign(self, position: int, vector: NormalizedVector) -> None:
+        """List a stored vector under its nearest centroid."""
+        if not vector.is_zero:
+            self._lists[self._nearest(self._centroids, vector.vector)].append(position)
+
+    def _nearest(self, centroids: List[List[float]], vector: Vector) -> int:
+        """Number of the centroid with the highest dot product."""
+        return max(range(len(centroids)),
+                   key=lambda cluster: self._dot(vector, centroids[cluster]))
+
+    @staticmethod
+    def _dot(vector: Vector, centroid: List[float]) -> float:
+        """Dot product of any vector with a dense centroid."""
+        if isinstance(vector, SparseVector):
+            return vector.dot(centroid)
+        return sum(a * b for a, b in zip(vector, centroid))
+
+    @staticmethod
+    def _unit(vector: Vector) -> Optional[List[float]]:
+        """Dense unit-length copy of a vector, or None for a zero vector."""
+        norm = CosineSimilarity.magnitude(vector)
+        if norm == 0:
+            return None
+        values = vector.to_dense() if isinstance(vector, SparseVector) else vector
+        return [value / norm for value in values]
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, item_id: Hashable) -> bool:
+        return item_id in self._index
@@ -0,0 +1,245 @@
+"""
+Approximate Nearest Neighbours with Random-Hyperplane LSH
+=========================================================
+
+This module implements locality-sensitive hashing for cosine similarity
+(SimHash). Each vector gets a bit signature: bit i is 1 when the vector lies
+on the positive side of random hyperplane i. Two vectors at angle θ agree on
+a bit with probability 1 - θ/π, so similar vectors tend to share signatures.
+
+The index keeps several hash tables, each keyed by a signature of ``bits``
+hyperplanes. A query only looks at the buckets its own signatures fall into
+(and, optionally, the buckets one bit away), then re-ranks that candidate set
+exactly with ``cosine_similarity``. More bits make buckets smaller and faster
+to scan; more tables recover the neighbours a single table misses.
+``recall_at_k`` measures the trade-off against exact search.
+"""
+
+import heapq
+import random
+from typing import List, Dict, Tuple, Optional, Iterable, Hashable, Collection, Set
+
+from cosine_similarity import CosineIndex, NormalizedVector, SparseVector, Vector
+
+
+class LSHIndex:
+    """
+    Approximate cosine top-k index based on random-hyperplane signatures.
+
+    Stored vectors live in an exact CosineIndex, which is also used for
+    re-ranking and for measuring recall. The hyperplanes take
+    ``bits × tables × dimension`` floats of memory.
+
+    Example:
+        >>> index = LSHIndex(dimension=3, bits=4, tables=4, seed=1)
+        >>> index.add_all([[1, 0, 0], [0.9, 0.1, 0], [0, 0, 1]], ids=["a", "b", "c"])
+        >>> [item_id for item_id, _ in index.query([1, 0.05, 0], k=2)]
+        ['a', 'b']
+    """
+
+    def __init__(self, dimension: int, bits: int = 16, tables: int = 8,
+                 probe_radius: int = 0, seed: Optional[int] = None):
+        """
+        Create an empty index.
+
+        Args:
+            dimension: Length of every vector
+            bits: Hyperplanes per table (signature length)
+            tables: Number of independent hash tables
+            probe_radius: 0 to probe only the query's own bucket in each
+                table, 1 to also probe the buckets one bit flip away
+            seed: Seed for the random hyperplanes, for reproducible indexes
+
+        Raises:
+            ValueError: If a parameter is out of range
+        """
+        if dimension < 1 or bits < 1 or tables < 1:
+            raise ValueError("dimension, bits and tables must be at least 1")
+        if probe_radius not in (0, 1):
+            raise ValueError("probe_radius must be 0 or 1")
+        self.dimension = dimension
+        self.bits = bits
+        self.tables = tables
+        self.probe_radius = probe_radius
+
+        rng = random.Random(seed)
+        self._planes = [[[rng.gauss(0.0, 1.0) for _ in range(dimension)]
+                         for _ in range(bits)] for _ in range(tables)]
+        self._buckets: List[Dict[int, List[int]]] = [{} for _ in range(tables)]
+        self._index = CosineIndex()
+
+    def signatures(self, vector: Vector) -> List[int]:
+        """
+        Compute the bit signature of a vector in every table.
+
+        Args:
+            vector: Vector as a list of numbers or a SparseVector
+
+        Returns:
+            List[int]: One ``bits``-bit signature per table
+        """
+        if len(vector) != self.dimension:
+            raise ValueError("Vectors must have the same length")
+        if isinstance(vector, SparseVector):
+            def side(plane):
+                return vector.dot(plane)
+        else:
+            def side(plane):
+                return sum(a * b for a, b in zip(vector, plane))
+
+        signatures = []
+        for planes in self._planes:
+            signature = 0
+            for plane in planes:
+                signature = (signature << 1) | (side(plane) >= 0)
+            signatures.append(signature)
+        return signatures
+
+    def add(self, vector: Vector, item_id: Optional[Hashable] = None) -> Hashable:
+        """
+        Add a vector to the index.
+
+        Zero vectors are stored but never hashed, since they have no
+        defined similarity.
+
+        Args:
+            vector: Vector as a list of numbers or a SparseVector
+            item_id: Id of the item (defaults to its insertion position)
+
+        Returns:
+            Hashable: The id of the added item
+        """
+        signatures = self.signatures(vector)
+        position = len(self._index)
+        item_id = self._index.add(vector, item_id)
+        if not self._index.stored(position)[1].is_zero:
+            for buckets, signature in zip(self._buckets, signatures):
+                buckets.setdefault(signature, []).append(position)
+        return item_id
+
+    def add_all(self, vectors: Iterable[Vector],
+                ids: Optional[Iterable[Hashable]] = None) -> None:
+        """
+        Add several vectors to the index.
+
+        Args:
+            vectors: Vectors as lists of numbers or SparseVectors
+            ids: Item ids, one per vector (defaults to insertion positions)
+
+        Raises:
+            ValueError: If ids are given but their count differs from the
+                number of vectors
+        """
+        if ids is None:
+            for vector in vectors:
+                self.add(vector)
+            return
+        vectors, ids = list(vectors), list(ids)
+        if len(vectors) != len(ids):
+            raise ValueError("vectors and ids must have the same length")
+        for vector, item_id in zip(vectors, ids):
+            self.add(vector, item_id)
+
+    def candidates(self, vector: Vector) -> Set[int]:
+        """
+        Collect the positions of stored vectors sharing a probed bucket.
+
+        Args:
+            vector: Query vector
+
+        Returns:
+            Set[int]: Candidate positions, without duplicates
+        """
+        found: Set[int] = set()
+        for buckets, signature in zip(self._buckets, self.signatures(vector)):
+            found.update(buckets.get(signature, ()))
+            if self.probe_radius:
+                for bit in range(self.bits):
+                    found.update(buckets.get(signature ^ (1 << bit), ()))
+        return found
+
+    def query(self, vector: Vector, k: int = 10,
+              exclude: Optional[Collection[Hashable]] = None
+              ) -> List[Tuple[Hashable, float]]:
+        """
+        Find approximately the k stored vectors most similar to a query.
+
+        Candidates come from the hash buckets and are re-ranked with exact
+        cosine similarity, so returned scores are exact; only neighbours
+        that share no bucket with the query can be missed.
+
+        Args:
+            vector: Query vector
+            k: Number of results to return
+            exclude: Item ids that must not appear in the results
+
+        Returns:
+            List[Tuple[Hashable, float]]: Up to k (item id, similarity)
+            pairs, best first
+
+        Raises:
+            ValueError: If the query is a zero vector or has the wrong length
+        """
+        query = NormalizedVector(vector)
+        if query.is_zero:
+            raise ValueError("Cannot compute cosine similarity for zero vectors")
+        if k <= 0:
+            return []
+        exclude = set(exclude) if exclude else ()
+        stored = self._index.stored
+        scored = ((query.similarity(stored(position)[1]), position)
+                  for position in self.candidates(vector)
+                  if stored(position)[0] not in exclude)
+        best = heapq.nsmallest(k, scored, key=lambda entry: (-entry[0], entry[1]))
+        return [(stored(position)[0], score) for score, position in best]
+
+    def exact_query(self, vector: Vector, k: int = 10,
+                    exclude: Optional[Collection[Hashable]] = None
+                    ) -> List[Tuple[Hashable, float]]:
+        """
+        Find the exact k nearest neighbours by scanning every stored vector.
+
+        Args:
+            vector: Query vector
+            k: Number of results to return
+            exclude: Item ids that must not appear in the results
+
+        Returns:
+            List[Tuple[Hashable, float]]: Up to k (item id, similarity) pairs
+        """
+        return self._index.query(vector, k, exclude)
+
+    def recall_at_k(self, queries: Iterable[Vector], k: int = 10) -> float:
+        """
+        Measure the fraction of exact top-k neighbours the index returns.
+
+        Args:
+            queries: Query vectors
+            k: Number of neighbours per query
+
+        Returns:
+            float: Mean recall@k over the queries (1.0 means every exact
+            neighbour was found)
+        """
+        total = found = 0
+        for vector in queries:
+            exact = {item_id for item_id, _ in self.exact_query(vector, k)}
+            approximate = {item_id for item_id, _ in self.query(vector, k)}
+            total += len(exact)
+            found += len(exact & approximate)
+        return found / total if total else 1.0
+
+    def bucket_sizes(self) -> List[int]:
+        """
+        Return the size of every non-empty bucket across all tables.
+
+        Returns:
+            List[int]: Bucket sizes, useful for tuning ``bits``
+        """
+        return [len(bucket) for buckets in self._buckets for bucket in buckets.values()]
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, item_id: Hashable) -> bool:
+        return item_id in self._index
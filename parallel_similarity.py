@@ -0,0 +1,192 @@
+"""
+Parallel Pairwise Cosine Similarity
+===================================
+
+This module splits the pairwise similarity matrix into row blocks and scores
+the blocks in a process pool, so all cores are used instead of one.
+
+The document vectors are flattened once into CSR arrays (row pointers,
+term indices, values) held in ``multiprocessing.RawArray`` shared memory.
+Workers attach to those arrays when they start instead of receiving pickled
+vectors with every task; a task is just a (start, end) row range.
+
+Each worker rebuilds the same SparseVector/NormalizedVector objects and uses
+the same row routine as ``CosineSimilarity.similarity_matrix``, so the
+parallel result is identical to the serial one, value for value.
+"""
+
+import multiprocessing
+import os
+import time
+from typing import List, Dict, Optional, Tuple
+
+from cosine_similarity import (CosineSimilarity, SparseVector, NormalizedVector,
+                               Vocabulary)
+
+
+# Normalized vectors rebuilt from shared memory, one copy per worker process
+_worker_vectors: List[NormalizedVector] = []
+
+
+class WorkerStats:
+    """
+    Work done by one worker process during a parallel run.
+
+    Attributes:
+        worker: Process id of the worker
+        blocks: Number of row blocks scored
+        rows: Number of matrix rows scored
+        pairs: Number of document pairs scored
+        seconds: Time spent scoring (excluding start-up)
+    """
+
+    __slots__ = ("worker", "blocks", "rows", "pairs", "seconds")
+
+    def __init__(self, worker: int):
+        self.worker = worker
+        self.blocks = 0
+        self.rows = 0
+        self.pairs = 0
+        self.seconds = 0.0
+
+    def __repr__(self) -> str:
+        return (f"WorkerStats(worker={self.worker}, blocks={self.blocks}, "
+                f"rows={self.rows}, pairs={self.pairs}, seconds={self.seconds:.3f})")
+
+
+class ParallelResult:
+    """
+    Result of ``parallel_similarity_matrix``.
+
+    Attributes:
+        matrix: Square matrix of similarity scores
+        workers: Per-worker statistics, in order of first completed block
+        seconds: Wall-clock time of the whole run
+    """
+
+    def __init__(self, matrix: List[List[float]], workers: List[WorkerStats],
+                 seconds: float):
+        self.matrix = matrix
+        self.workers = workers
+        self.seconds = seconds
+
+    def format_report(self) -> str:
+        """
+        Describe how the work was spread across the workers.
+
+        Returns:
+            str: One line per worker with its share of the scored pairs
+        """
+        total_pairs = sum(stats.pairs for stats in self.workers) or 1
+        lines = [f"{len(self.workers)} worker(s), {self.seconds:.3f}s wall time"]
+        for stats in self.workers:
+            share = 100.0 * stats.pairs / total_pairs
+            lines.append(f"  worker {stats.worker}: {stats.blocks} blocks, "
+                         f"{stats.rows} rows, {stats.pairs} pairs ({share:.1f}%), "
+                         f"{stats.seconds:.3f}s")
+        return "\n".join(lines)
+
+
+def _share_vectors(vectors: List[SparseVector]) -> Tuple:
+    """Flatten sparse vectors into CSR arrays in shared memory."""
+    indptr = [0]
+    for vector in vectors:
+        indptr.append(indptr[-1] + vector.nnz)
+    shared_indptr = multiprocessing.RawArray("q", indptr)
+    shared_indices = multiprocessing.RawArray("q", indptr[-1])
+    shared_values = multiprocessing.RawArray("d", indptr[-1])
+    for vector, start in zip(vectors, indptr):
+        end = start + vector.nnz
+        shared_indices[start:end] = vector.indices
+        shared_values[start:end] = vector.values
+    dimension = len(vectors[0]) if vectors else 0
+    return shared_indptr, shared_indices, shared_values, dimension
+
+
+def _init_worker(indptr, indices, values, dimension: int) -> None:
+    """Attach a worker to the shared CSR arrays and rebuild its vectors."""
+    global _worker_vectors
+    _worker_vectors = [
+        NormalizedVector(SparseVector(indices[start:end], values[start:end], dimension))
+        for start, end in zip(indptr[:-1], indptr[1:])
+    ]
+
+
+def _score_block(block: Tuple[int, int]) -> Tuple[int, List[List[float]], int, float]:
+    """Score one row block in a worker process."""
+    start, end = block
+    started = time.perf_counter()
+    rows = CosineSimilarity._similarity_rows(_worker_vectors, start, end)
+    return start, rows, os.getpid(), time.perf_counter() - started
+
+
+def parallel_similarity_matrix(texts: List[str], workers: Optional[int] = None,
+                               block_size: Optional[int] = None,
+                               vocabulary: Optional[Vocabulary] = None
+                               ) -> ParallelResult:
+    """
+    Calculate the pairwise similarity matrix with a pool of worker processes.
+
+    Args:
+        texts: List of text documents
+        workers: Number of worker processes (defaults to the CPU count);
+            1 runs in the calling process
+        block_size: Rows per task (defaults to spreading the rows over about
+            four tasks per worker, which balances uneven row costs)
+        vocabulary: Persistent Vocabulary to reuse
+
+    Returns:
+        ParallelResult: The matrix, identical to
+        ``CosineSimilarity.similarity_matrix(texts, use_numpy=False)``,
+        and per-worker statistics
+
+    Raises:
+        ValueError: If workers or block_size is not positive, or a document
+            has no words (zero vector)
+
+    Example:
+        >>> texts = ["hello world", "hello python", "world python"]
+        >>> result = parallel_similarity_matrix(texts, workers=2)
+        >>> result.matrix == CosineSimilarity.similarity_matrix(texts, use_numpy=False)
+        True
+    """
+    global _worker_vectors
+    started = time.perf_counter()
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers < 1:
+        raise ValueError("workers must be at least 1")
+    vectors = CosineSimilarity._vectorize_all(texts, vocabulary)
+    n = len(vectors)
+    if block_size is None:
+        block_size = max(1, -(-n // (workers * 4)))
+    if block_size < 1:
+        raise ValueError("block_size must be at least 1")
+    blocks = [(start, min(start + block_size, n)) for start in range(0, n, block_size)]
+
+    shared = _share_vectors(vectors)
+    matrix: List[List[float]] = [[] for _ in range(n)]
+    stats: Dict[int, WorkerStats] = {}
+
+    def collect(results):
+        for start, rows, worker, seconds in results:
+            matrix[start:start + len(rows)] = rows
+            worker_stats = stats.setdefault(worker, WorkerStats(worker))
+            worker_stats.blocks += 1
+            worker_stats.rows += len(rows)
+            worker_stats.pairs += len(rows) * n
+            worker_stats.seconds += seconds
+
+    if workers == 1 or len(blocks) <= 1:
+        # Go through the shared arrays anyway so both modes run the same code
+        _init_worker(*shared)
+        try:
+            collect(_score_block(block) for block in blocks)
+        finally:
+            _worker_vectors = []
+    else:
+        with multiprocessing.Pool(min(workers, len(blocks)), initializer=_init_worker,
+                                  initargs=shared) as pool:
+            collect(pool.imap_unordered(_score_block, blocks))
+
+    return ParallelResult(matrix, list(stats.values()), time.perf_counter() - started)
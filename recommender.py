@@ -0,0 +1,190 @@
+"""
+Item-Item Collaborative Filtering
+=================================
+
+This module recommends items from a sparse user-item rating matrix using
+item-item cosine similarity.
+
+Offline, ``fit`` compares every item's rating column (a SparseVector over
+users) with the items that share at least one rater. Items without a common
+rater have similarity 0 and are never compared. Only the ``neighbours``
+most similar items of each item are kept.
+
+Online, ``recommend(user, n)`` only visits the neighbour lists of the items
+the user rated. A candidate item j is scored with the similarity-weighted
+average of the user's ratings of its neighbours:
+
+    score(u, j) = Σ sim(i, j) × r(u, i) / Σ |sim(i, j)|
+
+The sums run over the items i the user rated that have j as a neighbour.
+Serving cost is O(rated items × neighbours), independent of the number of
+users and items.
+"""
+
+import heapq
+from typing import List, Dict, Tuple, Hashable, Iterable, Set
+
+from cosine_similarity import NormalizedVector, SparseVector
+
+
+class ItemItemRecommender:
+    """
+    Item-based recommender with precomputed, truncated neighbour lists.
+
+    Ratings added after ``fit`` are used by ``recommend`` straight away, but
+    the neighbour lists only change at the next ``fit``.
+
+    Example:
+        >>> engine = ItemItemRecommender(neighbours=2)
+        >>> engine.add_ratings([("ann", "A", 5), ("ann", "B", 4), ("bob", "A", 4),
+        ...                     ("bob", "B", 5), ("bob", "C", 5), ("cat", "C", 4)])
+        >>> engine.fit()
+        >>> [item for item, _ in engine.recommend("ann")]
+        ['C']
+    """
+
+    def __init__(self, neighbours: int = 20, min_similarity: float = 0.0):
+        """
+        Create an empty recommender.
+
+        Args:
+            neighbours: Neighbours kept per item (N of the top-N lists)
+            min_similarity: Neighbours scoring at or below this are dropped
+
+        Raises:
+            ValueError: If neighbours is not positive
+        """
+        if neighbours < 1:
+            raise ValueError("neighbours must be at least 1")
+        self.neighbours = neighbours
+        self.min_similarity = min_similarity
+        self._users: Dict[Hashable, int] = {}
+        self._items: List[Hashable] = []
+        self._item_positions: Dict[Hashable, int] = {}
+        # Sparse matrix, kept row-wise (per user) and column-wise (per item)
+        self._user_ratings: List[Dict[int, float]] = []
+        self._item_ratings: List[Dict[int, float]] = []
+        self._neighbours: List[List[Tuple[int, float]]] = []
+
+    def add_rating(self, user: Hashable, item: Hashable, rating: float) -> None:
+        """
+        Add or replace a rating.
+
+        Args:
+            user: User id
+            item: Item id
+            rating: Rating value; 0 removes the rating
+        """
+        user_position = self._users.setdefault(user, len(self._users))
+        if user_position == len(self._user_ratings):
+            self._user_ratings.append({})
+        item_position = self._item_positions.get(item)
+        if item_position is None:
+            item_position = self._item_positions[item] = len(self._items)
+            self._items.append(item)
+            self._item_ratings.append({})
+
+        if rating:
+            self._user_ratings[user_position][item_position] = float(rating)
+            self._item_ratings[item_position][user_position] = float(rating)
+        else:
+            self._user_ratings[user_position].pop(item_position, None)
+            self._item_ratings[item_position].pop(user_position, None)
+
+    def add_ratings(self, ratings: Iterable[Tuple[Hashable, Hashable, float]]) -> None:
+        """
+        Add several ratings.
+
+        Args:
+            ratings: (user, item, rating) triples
+        """
+        for user, item, rating in ratings:
+            self.add_rating(user, item, rating)
+
+    def fit(self) -> None:
+        """
+        Precompute the top-N neighbour list of every item.
+
+        Only items sharing a rater are scored, with the exact
+        ``cosine_similarity`` of their rating columns.
+        """
+        dimension = len(self._users)
+        columns = [NormalizedVector(SparseVector.from_dict(ratings, dimension))
+                   for ratings in self._item_ratings]
+        self._neighbours = []
+        for item, ratings in enumerate(self._item_ratings):
+            # Items co-rated with this one, found through its raters' rows
+            candidates: Set[int] = set()
+            for user in ratings:
+                candidates.update(self._user_ratings[user])
+            candidates.discard(item)
+
+            scored = ((columns[item].similarity(columns[other]), other)
+                      for other in candidates)
+            best = heapq.nsmallest(
+                self.neighbours,
+                (entry for entry in scored if entry[0] > self.min_similarity),
+                key=lambda entry: (-entry[0], entry[1]))
+            self._neighbours.append([(other, score) for score, other in best])
+
+    def similar_items(self, item: Hashable) -> List[Tuple[Hashable, float]]:
+        """
+        Return the precomputed neighbours of an item.
+
+        Args:
+            item: Item id
+
+        Returns:
+            List[Tuple[Hashable, float]]: (item id, similarity) pairs, best
+            first (empty for items added since the last ``fit``)
+
+        Raises:
+            KeyError: If the item is unknown
+        """
+        position = self._item_positions[item]
+        if position >= len(self._neighbours):
+            return []
+        return [(self._items[other], score) for other, score in self._neighbours[position]]
+
+    def recommend(self, user: Hashable, n: int = 10) -> List[Tuple[Hashable, float]]:
+        """
+        Recommend items the user has not rated.
+
+        Args:
+            user: User id
+            n: Number of recommendations
+
+        Returns:
+            List[Tuple[Hashable, float]]: Up to n (item id, predicted
+            rating) pairs, best first
+
+        Raises:
+            KeyError: If the user is unknown
+        """
+        rated = self._user_ratings[self._users[user]]
+        weighted: Dict[int, float] = {}
+        weights: Dict[int, float] = {}
+        for item, rating in rated.items():
+            if item >= len(self._neighbours):
+                continue
+            for other, similarity in self._neighbours[item]:
+                if other in rated:
+                    continue
+                weighted[other] = weighted.get(other, 0.0) + similarity * rating
+                weights[other] = weights.get(other, 0.0) + abs(similarity)
+
+        best = heapq.nsmallest(
+            n, ((weighted[item] / weights[item], item) for item in weighted if weights[item]),
+            key=lambda entry: (-entry[0], entry[1]))
+        return [(self._items[item], score) for score, item in best]
+
+    @property
+    def users(self) -> int:
+        """Number of users."""
+        return len(self._users)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, item: Hashable) -> bool:
+        return item in self._item_positions
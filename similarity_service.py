@@ -0,0 +1,380 @@
+"""
+Asyncio Similarity Service with Micro-Batching
+==============================================
+
+This module serves ``document_similarity`` over a local TCP socket.
+
+Requests and responses are JSON objects, one per line:
+
+    -> {"id": 1, "a": "hello world", "b": "hello python"}
+    <- {"id": 1, "similarity": 0.4999999999999999}
+    <- {"id": 2, "error": "Cannot compute cosine similarity for zero vectors"}
+
+Concurrent requests, from one connection or many, are gathered into
+micro-batches. A batch is scored as soon as it holds ``max_batch_size``
+requests, or ``max_delay`` seconds after its first request arrived,
+whichever comes first. Each batch tokenizes every distinct text once into
+a shared vocabulary and computes each norm once, so the per-request
+overhead is amortized. The delay bounds the extra latency a request can
+pick up by waiting for its batch.
+
+Scores are identical to ``CosineSimilarity.document_similarity``.
+
+Run it directly:
+    python similarity_service.py serve --port 8765
+    python similarity_service.py load --port 8765 --requests 5000 --concurrency 64
+    python similarity_service.py load --requests 5000   # against an in-process server
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import List, Dict, Tuple, Optional, Sequence
+
+from cosine_similarity import CosineSimilarity, NormalizedVector
+
+
+class MicroBatcher:
+    """
+    Collects similarity requests and scores them in batches.
+
+    Example:
+        >>> async def demo():
+        ...     batcher = MicroBatcher(max_batch_size=8, max_delay=0.01)
+        ...     return await asyncio.gather(
+        ...         batcher.submit("hello world", "hello python"),
+        ...         batcher.submit("hello world", "hello world"))
+        >>> [round(score, 6) for score in asyncio.run(demo())]
+        [0.5, 1.0]
+    """
+
+    def __init__(self, max_batch_size: int = 64, max_delay: float = 0.002):
+        """
+        Create a batcher.
+
+        Args:
+            max_batch_size: Requests that trigger scoring immediately
+            max_delay: Longest time in seconds a request waits for its
+                batch to fill up
+
+        Raises:
+            ValueError: If a parameter is out of range
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        if max_delay < 0:
+            raise ValueError("max_delay must not be negative")
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.batches = 0
+        self.requests = 0
+        self._pending: List[Tuple[str, str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    async def submit(self, text_a: str, text_b: str) -> float:
+        """
+        Queue a pair of documents and wait for their similarity.
+
+        Args:
+            text_a: First text document
+            text_b: Second text document
+
+        Returns:
+            float: Cosine similarity of the documents
+
+        Raises:
+            TypeError: If a document is not a string
+            ValueError: If a document has no words (zero vector)
+        """
+        if not isinstance(text_a, str) or not isinstance(text_b, str):
+            raise TypeError("Documents must be strings")
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text_a, text_b, future))
+        if len(self._pending) >= self.max_batch_size:
+            self.flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, self.flush)
+        return await future
+
+    def flush(self) -> None:
+        """Score every pending request now."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        self.batches += 1
+        self.requests += len(batch)
+
+        try:
+            results = self.score_batch([(text_a, text_b) for text_a, text_b, _ in batch])
+        except Exception as error:
+            # Fail the whole batch rather than leave its requests waiting
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        for (_, _, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    @staticmethod
+    def score_batch(pairs: Sequence[Tuple[str, str]]) -> List[object]:
+        """
+        Score a batch of document pairs in one pass.
+
+        Every distinct text is tokenized and vectorized once, into a
+        vocabulary shared by the batch, and its norm is computed once.
+
+        Args:
+            pairs: (text_a, text_b) pairs
+
+        Returns:
+            List[object]: Similarity of each pair, or the ValueError it
+            raised, in input order
+        """
+        positions: Dict[str, int] = {}
+        for pair in pairs:
+            for text in pair:
+                positions.setdefault(text, len(positions))
+        vectors = [NormalizedVector(vector) for vector in
+                   CosineSimilarity._vectorize_all(list(positions), None)]
+
+        results: List[object] = []
+        for text_a, text_b in pairs:
+            try:
+                results.append(vectors[positions[text_a]].similarity(
+                    vectors[positions[text_b]]))
+            except ValueError as error:
+                results.append(error)
+        return results
+
+
+class SimilarityServer:
+    """
+    JSON-lines TCP server answering similarity requests through a MicroBatcher.
+
+    Requests on one connection are handled concurrently, so responses may
+    arrive out of order; the ``id`` field of a request is echoed back.
+    """
+
+    def __init__(self, batcher: Optional[MicroBatcher] = None):
+        """
+        Create a server.
+
+        Args:
+            batcher: Batcher to score requests with (defaults to a new one)
+        """
+        self.batcher = MicroBatcher() if batcher is None else batcher
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        """
+        Start listening.
+
+        Args:
+            host: Interface to bind
+            port: Port to bind (0 picks a free one)
+
+        Returns:
+            int: The bound port
+        """
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def close(self) -> None:
+        """Stop listening and wait for the server to close."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader,
+                      writer: asyncio.StreamWriter) -> None:
+        """Serve one connection until the client closes it."""
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                task = asyncio.ensure_future(self._respond(line, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def _respond(self, line: bytes, writer: asyncio.StreamWriter) -> None:
+        """Answer one request line."""
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get("id")
+            response = {"id": request_id,
+                        "similarity": await self.batcher.submit(request["a"], request["b"])}
+        except (ValueError, KeyError, TypeError, AttributeError) as error:
+            message = f"Missing field: {error}" if isinstance(error, KeyError) else str(error)
+            response = {"id": request_id, "error": message}
+        writer.write(json.dumps(response).encode("utf-8") + b"\n")
+        await writer.drain()
+
+
+class LoadReport:
+    """
+    Result of ``generate_load``.
+
+    Attributes:
+        latencies: Seconds from sending to receiving each response, sorted
+        errors: Number of error responses
+        seconds: Wall-clock time of the whole run
+    """
+
+    def __init__(self, latencies: List[float], errors: int, seconds: float):
+        self.latencies = sorted(latencies)
+        self.errors = errors
+        self.seconds = seconds
+
+    def percentile(self, percent: float) -> float:
+        """
+        Return a latency percentile in seconds.
+
+        Args:
+            percent: Percentile between 0 and 100
+
+        Returns:
+            float: Latency at that percentile (nearest rank)
+        """
+        if not self.latencies:
+            return 0.0
+        rank = max(1, -(-len(self.latencies) * percent // 100))
+        return self.latencies[int(rank) - 1]
+
+    def format_report(self) -> str:
+        """
+        Summarize throughput and latency.
+
+        Returns:
+            str: A one-line summary
+        """
+        throughput = len(self.latencies) / self.seconds if self.seconds else 0.0
+        return (f"{len(self.latencies)} requests ({self.errors} errors) in "
+                f"{self.seconds:.3f}s, {throughput:.0f} req/s, "
+                f"p50 {self.percentile(50) * 1000:.2f}ms, "
+                f"p99 {self.percentile(99) * 1000:.2f}ms")
+
+
+async def generate_load(host: str, port: int, requests: int = 1000,
+                        concurrency: int = 32, texts: Optional[List[str]] = None,
+                        seed: int = 0) -> LoadReport:
+    """
+    Send random document pairs to a server and measure latencies.
+
+    Each of ``concurrency`` connections keeps one request in flight at a
+    time, so at most ``concurrency`` requests wait on the server at once.
+
+    Args:
+        host: Server host
+        port: Server port
+        requests: Total number of requests
+        concurrency: Number of concurrent connections
+        texts: Documents to draw pairs from (defaults to a synthetic set)
+        seed: Random seed, for reproducible pairs
+
+    Returns:
+        LoadReport: Latencies and error count
+    """
+    rng = random.Random(seed)
+    if texts is None:
+        words = [f"w{index}" for index in range(500)]
+        texts = [" ".join(rng.choice(words) for _ in range(20)) for _ in range(200)]
+    pairs = [(rng.choice(texts), rng.choice(texts)) for _ in range(requests)]
+    latencies: List[float] = []
+    errors = 0
+
+    async def client(worker: int) -> None:
+        nonlocal errors
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            for request_id in range(worker, requests, concurrency):
+                text_a, text_b = pairs[request_id]
+                message = {"id": request_id, "a": text_a, "b": text_b}
+                sent = time.perf_counter()
+                writer.write(json.dumps(message).encode("utf-8") + b"\n")
+                response = json.loads(await reader.readline())
+                latencies.append(time.perf_counter() - sent)
+                errors += "error" in response
+        finally:
+            writer.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(worker) for worker in range(min(concurrency, requests))))
+    return LoadReport(latencies, errors, time.perf_counter() - started)
+
+
+async def _serve_forever(host: str, port: int, batcher: MicroBatcher) -> None:
+    """Run a server until cancelled."""
+    server = SimilarityServer(batcher)
+    bound = await server.start(host, port)
+    print(f"Serving on {host}:{bound} (batch size {batcher.max_batch_size}, "
+          f"delay {batcher.max_delay * 1000:.1f}ms)")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+
+
+async def _run_load(args: argparse.Namespace) -> LoadReport:
+    """Run the load generator, starting a local server if no port is given."""
+    if args.port:
+        return await generate_load(args.host, args.port, args.requests, args.concurrency)
+    server = SimilarityServer(MicroBatcher(args.batch_size, args.delay / 1000))
+    port = await server.start(args.host)
+    try:
+        report = await generate_load(args.host, port, args.requests, args.concurrency)
+    finally:
+        await server.close()
+    batcher = server.batcher
+    print(f"{batcher.batches} batches, "
+          f"{batcher.requests / max(1, batcher.batches):.1f} requests per batch")
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Run the server or the load generator from the command line."""
+    parser = argparse.ArgumentParser(description="Micro-batching similarity service")
+    parser.add_argument("mode", choices=["serve", "load"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0,
+                        help="port to serve on, or to send load to "
+                             "(load: 0 starts an in-process server)")
+    parser.add_argument("--batch-size", type=int, default=64,
+                        help="requests per batch (default: 64)")
+    parser.add_argument("--delay", type=float, default=2.0,
+                        help="longest batching delay in milliseconds (default: 2)")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args(argv)
+
+    if args.mode == "serve":
+        batcher = MicroBatcher(args.batch_size, args.delay / 1000)
+        try:
+            asyncio.run(_serve_forever(args.host, args.port or 8765, batcher))
+        except KeyboardInterrupt:
+            pass
+    else:
+        print(asyncio.run(_run_load(args)).format_report())
+
+
+if __name__ == "__main__":
+    main()
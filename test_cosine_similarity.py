@@ -5,7 +5,21 @@ This script contains unit tests and examples to verify the correctness
 of the cosine similarity algorithm implementation.
 """
 
-from cosine_similarity import CosineSimilarity
+import contextlib
+import io
+import json
+import math
+import os
+import sys
+import tempfile
+import threading
+from array import array
+
+from cosine_similarity import (CosineSimilarity, SparseVector, NormalizedVector,
+                               CosineIndex, InvertedIndex, Vocabulary,
+                               ProfileCache, TfidfWeighting, HashingVectorizer,
+                               CompactVector, Instrumentation, PipelineHook,
+                               read_records, stream_top_k, main, SymmetricMatrix, np)
 
 
 def test_basic_operations():
@@ -75,6 +89,739 @@ def test_text_similarity():
     print("✓ Similar documents test passed")
 
 
+def test_sparse_vectors():
+    """Test sparse vector representation and operations."""
+    print("\nTesting sparse vectors...")
+    
+    # Test conversion round trip
+    sparse = SparseVector.from_dense([0, 3, 0, 4])
+    assert sparse.indices == (1, 3)
+    assert sparse.nnz == 2
+    assert len(sparse) == 4
+    assert sparse.to_dense() == [0.0, 3.0, 0.0, 4.0]
+    print("✓ Sparse conversion tests passed")
+    
+    # Test operations agree with the dense implementation
+    dense_a = [1, 0, 2, 0, 3]
+    dense_b = [0, 4, 5, 0, 6]
+    sparse_a = SparseVector.from_dense(dense_a)
+    sparse_b = SparseVector.from_dict({1: 4, 2: 5, 4: 6}, 5)
+    assert CosineSimilarity.dot_product(sparse_a, sparse_b) == 28
+    assert CosineSimilarity.dot_product(sparse_a, dense_b) == 28
+    assert CosineSimilarity.magnitude(sparse) == 5.0
+    assert (CosineSimilarity.cosine_similarity(sparse_a, sparse_b)
+            == CosineSimilarity.cosine_similarity(dense_a, dense_b))
+    print("✓ Sparse operation tests passed")
+    
+    # Test sparse text vectors
+    vocab = {'hello': 0, 'python': 1, 'world': 2}
+    vector = CosineSimilarity.text_to_vector("hello hello world", vocab, sparse=True)
+    assert vector == SparseVector([0, 2], [2.0, 1.0], 3)
+    assert vector.to_dense() == CosineSimilarity.text_to_vector("hello hello world", vocab)
+    print("✓ Sparse text vector tests passed")
+    
+    # Test invalid input
+    try:
+        SparseVector([5], [1.0], 3)
+        assert False, "Out of range index should raise ValueError"
+    except ValueError:
+        pass
+    print("✓ Sparse validation tests passed")
+
+
+def test_numpy_similarity_matrix():
+    """Test the NumPy similarity matrix backend against pure Python."""
+    print("\nTesting NumPy similarity matrix...")
+    
+    texts = ["hello world", "hello python", "world python", "python python code"]
+    expected = CosineSimilarity.similarity_matrix(texts, use_numpy=False)
+    
+    if np is None:
+        try:
+            CosineSimilarity.similarity_matrix(texts, use_numpy=True)
+            assert False, "use_numpy=True without NumPy should raise ImportError"
+        except ImportError:
+            pass
+        print("✓ NumPy not installed, fallback tests passed")
+        return
+    
+    matrix = CosineSimilarity.similarity_matrix(texts, use_numpy=True)
+    for expected_row, row in zip(expected, matrix):
+        for expected_value, value in zip(expected_row, row):
+            assert abs(expected_value - value) < 1e-12
+            assert -1.0 <= value <= 1.0
+    print("✓ NumPy backend matches pure Python")
+
+
+def test_normalized_vectors():
+    """Test cached-norm vectors and one-vs-many scoring."""
+    print("\nTesting normalized vectors...")
+    
+    # Test cached norm and exact agreement with cosine_similarity
+    vec_a = NormalizedVector([1, 2, 3])
+    vec_b = NormalizedVector(SparseVector.from_dense([4, 0, 6]))
+    assert abs(vec_a.norm - 3.7416573867739413) < 1e-12
+    assert vec_a.similarity(vec_b) == CosineSimilarity.cosine_similarity(
+        [1, 2, 3], [4, 0, 6])
+    print("✓ Cached norm tests passed")
+    
+    # Test one-vs-many scoring with mixed inputs
+    scores = CosineSimilarity.one_vs_many([1, 0], [[1, 0], NormalizedVector([0, 2])])
+    assert scores == [1.0, 0.0]
+    print("✓ One-vs-many tests passed")
+    
+    # Test explicit zero vector handling
+    zero = NormalizedVector([0, 0])
+    assert zero.is_zero
+    try:
+        zero.similarity(NormalizedVector([1, 1]))
+        assert False, "Zero vector should raise ValueError"
+    except ValueError:
+        pass
+    print("✓ Zero vector tests passed")
+
+
+def test_cosine_index():
+    """Test top-k queries on a CosineIndex."""
+    print("\nTesting cosine index...")
+    
+    vectors = [[1, 0, 0], [1, 1, 0], [0, 1, 0], [0, 0, 1], [1, 1, 1]]
+    index = CosineIndex.from_vectors(vectors)
+    
+    # Test top-k agrees with a full sort
+    query = [1, 0.5, 0]
+    expected = sorted(
+        ((i, CosineSimilarity.cosine_similarity(query, v)) for i, v in enumerate(vectors)),
+        key=lambda x: x[1], reverse=True)
+    assert index.query(query, k=3) == expected[:3]
+    assert len(index.query(query, k=100)) == len(vectors)
+    print("✓ Top-k query tests passed")
+    
+    # Test exclusion filters
+    results = index.query_item(0, k=2)
+    assert 0 not in [item_id for item_id, _ in results]
+    results = index.query(query, k=5, exclude={1}, include=lambda i: i != 4)
+    assert [item_id for item_id, _ in results] == [0, 2, 3]
+    print("✓ Exclusion filter tests passed")
+    
+    # Test text index
+    texts = ["hello world", "hello python", "python code", ""]
+    text_index = CosineIndex.from_texts(texts, ids=["a", "b", "c", "d"])
+    results = text_index.query("python code", k=2)
+    assert [item_id for item_id, _ in results] == ["c", "b"]
+    assert "d" in text_index and len(text_index) == 4
+    assert text_index.stored(3)[0] == "d" and text_index.stored(3)[1].is_zero
+    assert [item_id for item_id, _ in text_index.items()] == ["a", "b", "c", "d"]
+    try:
+        text_index.query_item("d")
+        assert False, "Should raise ValueError"
+    except ValueError:
+        pass
+    print("✓ Text index tests passed")
+    
+    # Test ids must match the items one for one
+    try:
+        CosineIndex.from_vectors(vectors, ids=["only", "two"])
+        assert False, "Should raise ValueError"
+    except ValueError:
+        pass
+    print("✓ Id count tests passed")
+
+
+def test_inverted_index():
+    """Test inverted-index candidate generation for text queries."""
+    print("\nTesting inverted index...")
+    
+    texts = [
+        "machine learning is fun",
+        "deep learning and machine learning",
+        "python programming language",
+        "cooking recipes",
+    ]
+    index = InvertedIndex.from_texts(texts)
+    try:
+        InvertedIndex.from_texts(texts, ids=["a", "b"])
+        assert False, "Should raise ValueError"
+    except ValueError:
+        pass
+    
+    # Test scores match the exact vector pipeline and skip unrelated documents
+    query = "machine learning with python"
+    scores = index.scores(query)
+    assert set(scores) == {0, 1, 2}
+    for doc_id, score in scores.items():
+        vector_query = CosineSimilarity.text_to_vector(query, index.vocabulary)
+        vector_doc = CosineSimilarity.text_to_vector(texts[doc_id], index.vocabulary)
+        assert score == CosineSimilarity.cosine_similarity(vector_query, vector_doc)
+    print("✓ Candidate scoring tests passed")
+    
+    # Test top-k and incremental additions
+    assert [doc_id for doc_id, _ in index.query(query, k=2)] == [1, 0]
+    index.add("python machine learning", item_id="new")
+    assert index.query(query, k=1)[0][0] == "new"
+    assert index.query(query, k=10, exclude={"new"})[0][0] == 1
+    print("✓ Inverted index query tests passed")
+
+
+def test_vocabulary():
+    """Test the persistent, growable vocabulary."""
+    print("\nTesting vocabulary...")
+    
+    # Test stable indices when growing
+    vocab = Vocabulary(["hello world"])
+    assert vocab["hello"] == 0 and vocab["world"] == 1
+    assert vocab.add_documents(["world python", "hello"]) == 1
+    assert vocab["hello"] == 0 and vocab["python"] == 2
+    assert vocab.word(2) == "python" and list(vocab) == ["hello", "world", "python"]
+    print("✓ Stable index tests passed")
+    
+    # Test reuse across the document pipeline
+    vector = CosineSimilarity.text_to_vector("python hello hello", vocab)
+    assert vector == [2.0, 0.0, 1.0]
+    similarity = CosineSimilarity.document_similarity("hello world", "hello code", vocab)
+    assert similarity == CosineSimilarity.document_similarity("hello world", "hello code")
+    assert vocab["code"] == 3
+    texts = ["hello world", "hello python", "code python"]
+    assert (CosineSimilarity.similarity_matrix(texts, vocabulary=vocab)
+            == CosineSimilarity.similarity_matrix(texts))
+    assert len(vocab) == 4
+    print("✓ Vocabulary reuse tests passed")
+
+
+def test_streaming_similarity_matrix():
+    """Test block-wise streaming of the similarity matrix."""
+    print("\nTesting streaming similarity matrix...")
+    
+    texts = ["hello world", "hello python", "world python", "python code", "code"]
+    expected = CosineSimilarity.similarity_matrix(texts, use_numpy=False)
+    
+    # Test blocks reassemble the full matrix
+    blocks = list(CosineSimilarity.iter_similarity_matrix(
+        texts, block_size=2, use_numpy=False))
+    assert [start for start, _ in blocks] == [0, 2, 4]
+    assert max(len(rows) for _, rows in blocks) == 2
+    assert [row for _, rows in blocks for row in rows] == expected
+    print("✓ Row block tests passed")
+    
+    # Test file and callback destinations
+    buffer = io.StringIO()
+    rows = CosineSimilarity.write_similarity_matrix(
+        texts, buffer, block_size=3, output_format="jsonl", use_numpy=False)
+    assert rows == len(texts)
+    assert [json.loads(line) for line in buffer.getvalue().splitlines()] == expected
+    
+    received = {}
+    CosineSimilarity.write_similarity_matrix(
+        texts, lambda i, row: received.__setitem__(i, row), use_numpy=False)
+    assert [received[i] for i in range(len(texts))] == expected
+    print("✓ Streaming output tests passed")
+    
+    if np is None:
+        print("✓ NumPy not installed, tiled NumPy tests skipped")
+        return
+    
+    # The NumPy backend densifies tiles of NUMPY_TILE documents at a time,
+    # and scores NUMPY_TILE rows per pass even for single-row blocks
+    tile, tile_scores = CosineSimilarity.NUMPY_TILE, CosineSimilarity._tile_scores
+    tiles = []
+    CosineSimilarity.NUMPY_TILE = 2
+    CosineSimilarity._tile_scores = staticmethod(
+        lambda rows, columns: tiles.append(1) or tile_scores(rows, columns))
+    try:
+        blocks = list(CosineSimilarity.iter_similarity_matrix(
+            texts, block_size=2, use_numpy=True))
+        single = list(CosineSimilarity.iter_similarity_matrix(
+            texts, block_size=1, use_numpy=True))
+        try:
+            list(CosineSimilarity.iter_similarity_matrix(texts + [""], use_numpy=True))
+            assert False, "Should raise ValueError"
+        except ValueError:
+            pass
+    finally:
+        CosineSimilarity.NUMPY_TILE = tile
+        CosineSimilarity._tile_scores = tile_scores
+    # 3 passes of 3 column tiles for each of the two calls
+    assert len(tiles) == 2 * 3 * 3
+    assert [start for start, _ in single] == [0, 1, 2, 3, 4]
+    for blocks in (blocks, single):
+        rows = [row for _, rows in blocks for row in rows]
+        assert len(rows) == len(expected)
+        assert all(abs(value - expected_value) < 1e-12
+                   for row, expected_row in zip(rows, expected)
+                   for value, expected_value in zip(row, expected_row))
+    print("✓ Tiled NumPy streaming tests passed")
+
+
+def test_all_pairs():
+    """Test the thresholded all-pairs similarity join."""
+    print("\nTesting all-pairs similarity join...")
+    
+    words = ["alpha", "beta", "gamma", "delta", "epsilon", "zeta", "eta",
+             "theta", "iota", "kappa", "lambda", "mu"]
+    texts = [" ".join(words[(i * 7 + k * 3) % len(words)] for k in range(i % 5 + 2))
+             for i in range(40)]
+    texts += [text + " alpha" for text in texts[:10]]
+    
+    # Test results equal a filtered full similarity matrix
+    matrix = CosineSimilarity.similarity_matrix(texts, use_numpy=False)
+    for threshold in (0.5, 0.9):
+        expected = [(i, j, matrix[i][j]) for i in range(len(texts))
+                    for j in range(i + 1, len(texts)) if matrix[i][j] >= threshold]
+        assert CosineSimilarity.all_pairs(texts, threshold) == expected
+    print("✓ All-pairs results match full matrix")
+    
+    # Test that most pairs are pruned without being fully scored
+    vocab = CosineSimilarity.build_vocabulary(texts)
+    vectors = [CosineSimilarity.text_to_vector(text, vocab, sparse=True) for text in texts]
+    _, scored = CosineSimilarity._all_pairs_candidates(vectors, 0.9)
+    assert scored < len(texts) * (len(texts) - 1) // 2
+    print("✓ Candidate pruning tests passed")
+    
+    # Test numerical vectors, including the negative-weight fallback
+    pairs = CosineSimilarity.all_pairs([[1, 0], [2, 0.1], [0, 0], [-1, 0]], 0.99)
+    assert [(i, j) for i, j, _ in pairs] == [(0, 1)]
+    print("✓ Numerical vector tests passed")
+
+
+def test_token_id_interning():
+    """Test batch tokenization into interned token ids."""
+    print("\nTesting token id interning...")
+    
+    vocab = Vocabulary()
+    token_ids = vocab.encode_batch(["Hello world hello", "world python"])
+    assert token_ids == [[0, 1, 0], [1, 2]]
+    assert vocab.encode("python java", grow=False) == [2]
+    assert "java" not in vocab
+    print("✓ Interning tests passed")
+    
+    # Test vectors from token ids match text_to_vector
+    vector = CosineSimilarity.ids_to_vector(token_ids[0], len(vocab))
+    assert vector == CosineSimilarity.text_to_vector("Hello world hello", vocab)
+    sparse = CosineSimilarity.ids_to_vector(token_ids[1], len(vocab), sparse=True)
+    assert sparse == CosineSimilarity.text_to_vector("world python", vocab, sparse=True)
+    print("✓ Token id vector tests passed")
+
+
+def test_profile_cache():
+    """Test the LRU document profile cache."""
+    print("\nTesting profile cache...")
+    
+    texts = ["the cat sat on the mat", "a cat and a dog", "dogs chase cats",
+             "the mat is red"]
+    cache = ProfileCache(max_entries=3)
+    
+    # Test scores equal document_similarity exactly
+    for text_a in texts:
+        for text_b in texts:
+            assert (cache.document_similarity(text_a, text_b)
+                    == CosineSimilarity.document_similarity(text_a, text_b))
+    print("✓ Cached similarity tests passed")
+    
+    # Test LRU eviction and statistics
+    stats = cache.stats()
+    assert stats["entries"] == 3 and stats["evictions"] > 0
+    assert stats["hits"] + stats["misses"] == 2 * len(texts) ** 2
+    cache.get(texts[-1])
+    assert texts[-1] in cache and cache.stats()["hits"] == stats["hits"] + 1
+    
+    small = ProfileCache(max_entries=None, max_bytes=1)
+    small.get("hello world")
+    assert len(small) == 0 and small.stats()["evictions"] == 1
+    print("✓ Eviction and statistics tests passed")
+    
+    # Test concurrent use from several threads
+    shared = ProfileCache(max_entries=2)
+    threads = [threading.Thread(target=lambda: [shared.get(text) for text in texts * 50])
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = shared.stats()
+    assert stats["hits"] + stats["misses"] == 4 * 50 * len(texts)
+    assert stats["entries"] <= 2
+    print("✓ Thread safety tests passed")
+
+
+def test_tfidf_weighting():
+    """Test incrementally maintained TF-IDF and BM25 weighting."""
+    print("\nTesting TF-IDF weighting...")
+    
+    texts = ["the cat sat", "the cat ran home", "the dog sat", "a bird sang"]
+    weighting = TfidfWeighting(tolerance=0.0)
+    for text in texts:
+        weighting.add_document(text)
+    
+    # Test IDF values against the formula computed from scratch
+    assert abs(weighting.idf("the") - (math.log(5 / 4) + 1)) < 1e-12
+    assert abs(weighting.idf("bird") - (math.log(5 / 2) + 1)) < 1e-12
+    assert weighting.idf("unknown") == 0.0
+    print("✓ IDF tests passed")
+    
+    # Test similarity equals cosine_similarity on the weighted vectors
+    for doc_id in range(len(texts)):
+        expected = CosineSimilarity.cosine_similarity(
+            weighting.transform("cat sat"), weighting.document_vector(doc_id))
+        assert abs(weighting.similarity("cat sat", doc_id) - expected) < 1e-12
+    print("✓ Weighted similarity tests passed")
+    
+    # Test removal restores the previous document frequencies
+    doc_id = weighting.add_document("cat cat cat")
+    weighting.remove_document(doc_id)
+    assert abs(weighting.idf("cat") - (math.log(5 / 3) + 1)) < 1e-12
+    print("✓ Incremental add/remove tests passed")
+    
+    # Test norms are only refreshed when IDF drifts past the tolerance
+    lazy = TfidfWeighting(tolerance=0.5)
+    for text in texts:
+        lazy.add_document(text)
+    for doc_id in range(len(texts)):
+        lazy.document_norm(doc_id)
+    refreshes = lazy.norm_refreshes
+    lazy.add_document("a fish swam")
+    for doc_id in range(len(texts)):
+        lazy.document_norm(doc_id)
+    assert lazy.norm_refreshes == refreshes
+    print("✓ Lazy norm refresh tests passed")
+    
+    # Test the tolerance holds for terms published at different corpus sizes
+    drifting = TfidfWeighting(tolerance=0.01)
+    stored = {drifting.add_document(f"common word{i % 10}"): f"common word{i % 10}"
+              for i in range(100)}
+    drifting.idf("common")
+    stored[drifting.add_document("rare x")] = "rare x"
+    drifting.idf("rare")
+    for doc_id in (0, 1):
+        drifting.remove_document(doc_id)
+        del stored[doc_id]
+    for word in ["common", "word0", "word5", "rare", "x"]:
+        df = sum(word in text.split() for text in stored.values())
+        exact = math.log((1 + len(stored)) / (1 + df)) + 1
+        assert abs(drifting.idf(word) - exact) <= 0.01
+    print("✓ IDF tolerance tests passed")
+    
+    # Test BM25 weighting ranks the matching document first
+    bm25 = TfidfWeighting(scheme="bm25", tolerance=0.0)
+    for text in texts:
+        bm25.add_document(text)
+    scores = [bm25.similarity("dog", doc_id) for doc_id in range(len(texts))]
+    assert scores.index(max(scores)) == 2
+    print("✓ BM25 tests passed")
+
+
+def test_hashing_vectorizer():
+    """Test the vocabulary-free hashing vectorizer."""
+    print("\nTesting hashing vectorizer...")
+    
+    texts = ["machine learning is fun", "deep learning and machine learning",
+             "python programming language", "learning python is fun"]
+    
+    # Test determinism and independence from any shared state
+    vectorizer = HashingVectorizer(dimension=2 ** 18)
+    again = HashingVectorizer(dimension=2 ** 18)
+    assert vectorizer.transform(texts[1]) == again.transform(texts[1])
+    assert len(vectorizer.transform(texts[0], sparse=False)) == 2 ** 18
+    assert vectorizer.transform(texts[0]) != HashingVectorizer(2 ** 18, seed=1).transform(texts[0])
+    negative = HashingVectorizer(2 ** 18, seed=-1).transform(texts[0])
+    assert negative == HashingVectorizer(2 ** 18, seed=2 ** 64 - 1).transform(texts[0])
+    assert HashingVectorizer(2 ** 18, seed=2 ** 64).transform(texts[0]) == vectorizer.transform(texts[0])
+    print("✓ Deterministic hashing tests passed")
+    
+    # Test accuracy: with a large dimension there are no collisions here
+    report = vectorizer.compare_with_exact(texts)
+    assert report["collision_rate"] == 0.0
+    assert report["max_abs_error"] < 1e-12 and report["pairs"] == 6
+    print("✓ Exact agreement tests passed")
+    
+    # Test collisions are reported for a tiny dimension
+    tiny = HashingVectorizer(dimension=4, signed=False)
+    assert tiny.collision_rate(texts) > 0.5
+    assert tiny.compare_with_exact(texts)["max_abs_error"] > 0
+    print("✓ Collision measurement tests passed")
+
+
+def test_compact_vectors():
+    """Test the array-backed float32 vector type."""
+    print("\nTesting compact vectors...")
+    
+    # Test storage and cached norm
+    vec = CompactVector([3, 4, 0])
+    assert vec.nbytes == 12 and len(vec) == 3 and vec.tolist() == [3.0, 4.0, 0.0]
+    assert CosineSimilarity.magnitude(vec) == 5.0 and vec.norm == 5.0
+    assert CompactVector([0.1])[0] != 0.1  # rounded to float32
+    source = array("f", [3, 4])
+    copied = CompactVector(source)
+    source[0] = 0.0
+    assert copied.tolist() == [3.0, 4.0] and copied.norm == 5.0
+    print("✓ Compact storage tests passed")
+    
+    # Test it is accepted wherever lists are, with matching results
+    lists = [[1, 2, 3], [4, 5, 6], [0, 1, 0.5], [2, 0, 1]]
+    compact = [CompactVector(values) for values in lists]
+    assert CosineSimilarity.dot_product(compact[0], compact[1]) == 32.0
+    assert CosineSimilarity.dot_product(compact[0], lists[1]) == 32.0
+    assert (CosineSimilarity.cosine_similarity(compact[0], compact[1])
+            == CosineSimilarity.cosine_similarity(lists[0], lists[1]))
+    assert (CosineSimilarity.similarity_matrix(compact, use_numpy=False)
+            == CosineSimilarity.similarity_matrix(lists, use_numpy=False))
+    assert (CosineSimilarity.cosine_similarity(compact[2], SparseVector.from_dense(lists[3]))
+            == CosineSimilarity.cosine_similarity(lists[2], lists[3]))
+    print("✓ Compact vector interoperability tests passed")
+
+
+def test_instrumentation():
+    """Test per-stage timers, counters and pipeline hooks."""
+    print("\nTesting instrumentation...")
+    
+    texts = ["the cat sat", "the dog sat down", "a cat"]
+    expected = CosineSimilarity.similarity_matrix(texts, use_numpy=False)
+    assert Instrumentation.hooks == ()
+    
+    # Stage timings and counters, with unchanged results
+    with Instrumentation.collect() as stats:
+        assert CosineSimilarity.similarity_matrix(texts, use_numpy=False) == expected
+    assert Instrumentation.hooks == ()
+    assert set(stats.seconds) == {"tokenize", "vocabulary", "vectorize", "scoring"}
+    assert all(seconds >= 0 for seconds in stats.seconds.values())
+    assert stats.counters["documents"] == 3
+    assert stats.counters["tokens"] == 9
+    assert stats.counters["pairs_scored"] == 9
+    assert "scoring" in stats.format_report()
+    stats.reset()
+    assert not stats.counters and not stats.seconds
+    print("✓ Stage timer and counter tests passed")
+    
+    # Zero vectors skipped by all_pairs and index queries are counted
+    vectors = [[1, 0], [0, 0], [1, 1]]
+    index = CosineIndex.from_vectors(vectors)
+    with Instrumentation.collect() as stats:
+        CosineSimilarity.all_pairs(vectors, 0.5)
+        instrumented = index.query([1, 0], k=2)
+    assert stats.counters["zero_vector_skips"] == 2
+    assert stats.counters["pairs_scored"] == 1 + 2
+    # Without hooks the uncounted path returns the same results
+    assert not Instrumentation.hooks
+    assert index.query([1, 0], k=2) == instrumented
+    assert index.query([1, 0], k=3, exclude=[0]) == [(2, instrumented[1][1])]
+    print("✓ Zero-vector skip tests passed")
+    
+    # Custom hooks receive the raw events
+    class Recorder(PipelineHook):
+        def __init__(self):
+            self.events = []
+        
+        def on_stage(self, stage, seconds):
+            self.events.append(stage)
+        
+        def on_count(self, counter, amount):
+            self.events.append((counter, amount))
+    
+    recorder = Recorder()
+    Instrumentation.add_hook(recorder)
+    try:
+        CosineSimilarity.document_similarity("hello world", "hello python")
+    finally:
+        Instrumentation.remove_hook(recorder)
+    assert recorder.events[-2:] == ["scoring", ("pairs_scored", 1)]
+    assert ("documents", 2) in recorder.events
+    CosineSimilarity.document_similarity("hello world", "hello python")
+    assert len(recorder.events) == 7
+    print("✓ Pipeline hook tests passed")
+
+
+def test_batch_mode():
+    """Test streaming corpus-vs-queries scoring and the command line."""
+    print("\nTesting batch mode...")
+    
+    corpus = ["the cat sat on the mat", "the dog sat on the log", "python code",
+              "", "cats and dogs", "the cat and the dog"]
+    queries = ["cat on a mat", "python", "the dog", ""]
+    
+    # Readers
+    lines = ['{"id": "x", "text": "a b"}\n', '\n', '{"id": 0, "text": "c d"}\n']
+    assert list(read_records(lines)) == [("x", "a b"), (0, "c d")]
+    assert list(read_records(['"a b"\n', '\n', '{"text": "c d"}\n'])) == [
+        (0, "a b"), (1, "c d")]
+    try:
+        # Numbering "c d" could collide with the explicit id 1
+        list(read_records(['{"id": 1, "text": "a b"}', '"c d"']))
+        assert False, "Should raise ValueError"
+    except ValueError:
+        pass
+    assert list(read_records(io.StringIO("text,id\nhello,h\nworld,w\n"), "csv")) == [
+        ("h", "hello"), ("w", "world")]
+    try:
+        list(read_records(['{"body": "a"}']))
+        assert False, "Should raise ValueError"
+    except ValueError:
+        pass
+    print("✓ Record reader tests passed")
+    
+    with tempfile.TemporaryDirectory() as directory:
+        corpus_path = os.path.join(directory, "corpus.jsonl")
+        with open(corpus_path, "w", encoding="utf-8") as handle:
+            for text in corpus:
+                handle.write(json.dumps(text) + "\n")
+        
+        # Same top-k as brute force, whatever the batch and chunk sizes
+        expected = []
+        for query in queries[:3]:
+            scored = [(CosineSimilarity.document_similarity(query, text), -position)
+                      for position, text in enumerate(corpus) if text]
+            expected.append([(-negative, score) for score, negative
+                             in sorted(scored, reverse=True)[:2]])
+        expected.append([])
+        for batch_size, chunk_size, workers in [(1, 1, 1), (3, 2, 1), (64, 1000, 1), (1, 2, 2)]:
+            results = list(stream_top_k(corpus_path, enumerate(queries), k=2,
+                                        batch_size=batch_size, chunk_size=chunk_size,
+                                        workers=workers))
+            assert [query_id for query_id, _ in results] == [0, 1, 2, 3]
+            assert [top for _, top in results] == expected
+        print("✓ Streaming top-k tests passed")
+        
+        # Command line, with CSV queries and CSV output
+        queries_path = os.path.join(directory, "queries.csv")
+        with open(queries_path, "w", encoding="utf-8") as handle:
+            handle.write("id,text\nq1,cat on a mat\n")
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            main(["--corpus", corpus_path, "--queries", queries_path, "-k", "1",
+                  "--output-format", "csv"])
+        assert output.getvalue().splitlines() == [
+            "query,rank,id,score", f"q1,1,0,{expected[0][0][1]!r}"]
+        
+        # A corpus spooled from stdin is removed even when the queries cannot be opened
+        spool_directory = os.path.join(directory, "spool")
+        os.mkdir(spool_directory)
+        saved_stdin, saved_tempdir = sys.stdin, tempfile.tempdir
+        sys.stdin, tempfile.tempdir = io.StringIO("the cat sat\n"), spool_directory
+        try:
+            with contextlib.redirect_stderr(io.StringIO()):
+                main(["--corpus", "-", "--queries", os.path.join(directory, "missing.txt")])
+            assert False, "Should exit with an error"
+        except SystemExit as e:
+            assert e.code == 1
+        finally:
+            sys.stdin, tempfile.tempdir = saved_stdin, saved_tempdir
+        assert os.listdir(spool_directory) == []
+    print("✓ Command line tests passed")
+
+
+def test_symmetric_matrix():
+    """Test the packed upper-triangular similarity matrix."""
+    print("\nTesting symmetric similarity matrix...")
+    
+    texts = ["the cat sat", "the dog sat", "cats and dogs", "the cat and the dog",
+             "python code"]
+    full = CosineSimilarity.similarity_matrix(texts, use_numpy=False)
+    packed = CosineSimilarity.symmetric_similarity_matrix(texts, use_numpy=False)
+    
+    # Only i < j is stored, as float32
+    assert isinstance(packed, SymmetricMatrix) and len(packed) == 5
+    assert len(packed.values) == 10 and packed.nbytes == 40
+    for i in range(5):
+        for j in range(5):
+            expected = 1.0 if i == j else full[i][j]
+            assert abs(packed[i][j] - expected) < 1e-6
+            assert packed[i][j] == packed[j][i] == packed[i, j]
+    print("✓ Packed storage tests passed")
+    
+    # Row access, iteration and conversion agree
+    assert packed.tolist() == list(packed) == [packed.row(i) for i in range(5)]
+    assert list(packed[3]) == packed.row(3) and packed[-1][-1] == 1.0
+    assert len(packed[0]) == 5
+    assert CosineSimilarity.symmetric_similarity_matrix([]).tolist() == []
+    try:
+        packed[5]
+        assert False, "Should raise IndexError"
+    except IndexError:
+        pass
+    print("✓ Row access tests passed")
+    
+    if np is not None:
+        with_numpy = CosineSimilarity.symmetric_similarity_matrix(
+            texts, use_numpy=True, block_size=2)
+        assert all(abs(a - b) < 1e-6 for a, b in zip(with_numpy.values, packed.values))
+        # Tiles narrower than a block still fill every row
+        tile = CosineSimilarity.NUMPY_TILE
+        CosineSimilarity.NUMPY_TILE = 2
+        try:
+            tiled = CosineSimilarity.symmetric_similarity_matrix(
+                texts, use_numpy=True, block_size=3)
+        finally:
+            CosineSimilarity.NUMPY_TILE = tile
+        assert all(abs(a - b) < 1e-6 for a, b in zip(tiled.values, packed.values))
+        print("✓ NumPy backend tests passed")
+    
+    for use_numpy in ([False, True] if np is not None else [False]):
+        try:
+            CosineSimilarity.symmetric_similarity_matrix(["hello", ""], use_numpy=use_numpy)
+            assert False, "Should raise ValueError"
+        except ValueError:
+            pass
+    print("✓ Zero vector tests passed")
+
+
+def test_cross_similarity():
+    """Test tiled queries-by-corpus scoring with per-query top-k."""
+    print("\nTesting cross similarity...")
+    
+    corpus = ["the cat sat on the mat", "the dog sat on the log", "python code",
+              "cats and dogs", "the cat and the dog", "a mat and a log", "code review"]
+    queries = ["cat on a mat", "python", "the dog", "log"]
+    
+    # Same scores as document_similarity, whatever the tiling
+    expected = [[CosineSimilarity.document_similarity(query, text) for text in corpus]
+                for query in queries]
+    rectangle = [[None] * len(corpus) for _ in queries]
+    for query_start, corpus_start, rows in CosineSimilarity.iter_cross_similarity(
+            queries, corpus, query_tile=3, corpus_tile=2, use_numpy=False):
+        for i, row in enumerate(rows):
+            rectangle[query_start + i][corpus_start:corpus_start + len(row)] = row
+    assert rectangle == expected
+    print("✓ Tiled score tests passed")
+    
+    # Top-k per query, ties broken by corpus index
+    for query_tile, corpus_tile in [(1, 1), (2, 3), (256, 4096)]:
+        top = CosineSimilarity.cross_similarity(queries, corpus, k=3, query_tile=query_tile,
+                                                corpus_tile=corpus_tile, use_numpy=False)
+        for scores, results in zip(expected, top):
+            ranked = sorted(range(len(corpus)), key=lambda index: (-scores[index], index))
+            assert results == [(index, scores[index]) for index in ranked[:3]]
+    assert len(CosineSimilarity.cross_similarity(queries, corpus, k=100)[0]) == len(corpus)
+    print("✓ Top-k reduction tests passed")
+    
+    # Vectors, and the NumPy backend
+    vectors = [[1, 0, 0], [0.5, 0.5, 0], [0, 0, 1]]
+    assert [[index for index, _ in results] for results in CosineSimilarity.cross_similarity(
+        [[1, 0.1, 0], [0, 0.2, 1]], vectors, k=2)] == [[0, 1], [2, 1]]
+    if np is not None:
+        top = CosineSimilarity.cross_similarity(queries, corpus, k=3, corpus_tile=2,
+                                                use_numpy=True)
+        for scores, results in zip(expected, top):
+            assert [round(score, 9) for _, score in results] == sorted(
+                (round(score, 9) for score in scores), reverse=True)[:3]
+        # Ties are broken by corpus index, as in the pure Python backend
+        tied = [[1, 0]] * 6 + [[0, 1]]
+        assert [index for index, _ in CosineSimilarity.cross_similarity(
+            [[1, 0]], tied, k=2, corpus_tile=7, use_numpy=True)[0]] == [0, 1]
+        print("✓ NumPy backend tests passed")
+    print("✓ Vector input tests passed")
+    
+    # Zero vectors are skipped instead of failing the whole call
+    for use_numpy in ([False, True] if np is not None else [False]):
+        top = CosineSimilarity.cross_similarity(["cat mat", "", "code"],
+                                                ["", "the cat sat on the mat", "python code"],
+                                                k=3, corpus_tile=2, use_numpy=use_numpy)
+        assert [[index for index, _ in results] for results in top] == [[1, 2], [], [2, 1]]
+    try:
+        list(CosineSimilarity.iter_cross_similarity(["cat"], ["", "cat"], use_numpy=False))
+        assert False, "Should raise ValueError"
+    except ValueError:
+        pass
+    print("✓ Zero vector tests passed")
+
+
 def run_all_tests():
     """Run all test functions."""
     print("=" * 60)
@@ -85,6 +832,23 @@ def run_all_tests():
         test_basic_operations()
         test_cosine_similarity()
         test_text_similarity()
+        test_sparse_vectors()
+        test_numpy_similarity_matrix()
+        test_normalized_vectors()
+        test_cosine_index()
+        test_inverted_index()
+        test_vocabulary()
+        test_streaming_similarity_matrix()
+        test_all_pairs()
+        test_token_id_interning()
+        test_profile_cache()
+        test_tfidf_weighting()
+        test_hashing_vectorizer()
+        test_compact_vectors()
+        test_instrumentation()
+        test_batch_mode()
+        test_symmetric_matrix()
+        test_cross_similarity()
         
         print("\n" + "=" * 60)
         print("ALL TESTS PASSED! ✓")
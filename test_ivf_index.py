@@ -0,0 +1,131 @@
+"""
+Test script for the cluster-partitioned (IVF) index.
+
+This script checks spherical k-means training, list assignment, and
+recall of the approximate index against exact cosine similarity search.
+"""
+
+import random
+
+from cosine_similarity import CosineSimilarity, SparseVector
+from ivf_index import IVFIndex
+
+
+def make_clustered_vectors(count, dimension, seed=3):
+    """Build vectors scattered around a few random directions."""
+    rng = random.Random(seed)
+    centers = [[rng.gauss(0, 1) for _ in range(dimension)] for _ in range(10)]
+    return [[value + rng.gauss(0, 0.3) for value in rng.choice(centers)]
+            for _ in range(count)]
+
+
+def test_training():
+    """Test centroids, list assignment and incremental insertion."""
+    print("Testing IVF training...")
+    
+    vectors = make_clustered_vectors(400, 12)
+    index = IVFIndex(dimension=12, lists=8, seed=2)
+    index.add_all(vectors)
+    index.add([0.0] * 12, "zero")
+    assert not index.is_trained
+    try:
+        index.query(vectors[0])
+        assert False, "Should raise ValueError"
+    except ValueError:
+        pass
+    
+    # Mini-batch training on a sample lists every non-zero vector once
+    index.train(sample_size=200, batch_size=50, iterations=30)
+    assert index.is_trained
+    for centroid in index._centroids:
+        assert abs(CosineSimilarity.magnitude(centroid) - 1.0) < 1e-9
+    assert sum(index.list_sizes()) == 400
+    assert index.list_sizes().count(0) < 8
+    try:
+        IVFIndex(dimension=12, lists=2).train([[1.0] * 12, [1.0] * 11, [0.5] * 12])
+        assert False, "Should raise ValueError"
+    except ValueError:
+        pass
+    print("✓ Training tests passed")
+    
+    # Vectors added after training go straight into their nearest list
+    index.add(SparseVector.from_dense(vectors[0]), "copy")
+    assert sum(index.list_sizes()) == 401
+    assert index.query(vectors[0], k=2, nprobe=1)[1][0] in (0, "copy")
+    print("✓ Incremental insertion tests passed")
+
+
+def test_approximate_queries():
+    """Test exact re-ranking and the recall/latency trade-off."""
+    print("\nTesting IVF queries...")
+    
+    generated = make_clustered_vectors(620, 16)
+    vectors, queries = generated[:600], generated[600:]
+    index = IVFIndex(dimension=16, lists=8, nprobe=2, seed=1)
+    index.add_all(vectors)
+    index.train()
+    
+    # Returned scores are exact cosine similarities, best first
+    results = index.query(queries[0], k=5)
+    for item_id, score in results:
+        assert score == CosineSimilarity.cosine_similarity(queries[0], vectors[item_id])
+    assert [score for _, score in results] == sorted(
+        (score for _, score in results), reverse=True)
+    print("✓ Exact re-ranking tests passed")
+    
+    # Probing more lists scans more and never loses recall; all lists is exact
+    report = index.tradeoff_report(queries, k=10, nprobes=[1, 2, 4, 8])
+    recalls = [row["recall_at_k"] for row in report]
+    assert recalls == sorted(recalls)
+    assert recalls[0] > 0.7 and recalls[-1] == 1.0
+    assert report[0]["scanned"] < report[-1]["scanned"] == 1.0
+    assert index.recall_at_k(queries, k=10, nprobe=8) == 1.0
+    print("✓ Recall trade-off tests passed")
+    
+    # Exclusion filter
+    first = index.query(vectors[0], k=1)[0][0]
+    assert index.query(vectors[0], k=1, exclude={first})[0][0] != first
+    print("✓ Exclusion filter tests passed")
+    
+    # nprobe must be between 1 and the number of lists
+    for nprobe in (0, 9):
+        for probe in (lambda: index.probe(queries[0], nprobe),
+                      lambda: index.query(queries[0], nprobe=nprobe)):
+            try:
+                probe()
+                assert False, "Should raise ValueError"
+            except ValueError:
+                pass
+    print("✓ nprobe range tests passed")
+    
+    # Ids must match the vectors one for one
+    try:
+        IVFIndex(dimension=16).add_all(vectors[:3], ids=["a", "b"])
+        assert False, "Should raise ValueError"
+    except ValueError:
+        pass
+    print("✓ Id count tests passed")
+
+
+def run_all_tests():
+    """Run all test functions."""
+    print("=" * 60)
+    print("IVF INDEX - UNIT TESTS")
+    print("=" * 60)
+    
+    try:
+        test_training()
+        test_approximate_queries()
+        
+        print("\n" + "=" * 60)
+        print("ALL TESTS PASSED! ✓")
+        print("=" * 60)
+        
+    except AssertionError as e:
+        print(f"\n❌ Test failed: {e}")
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+
+
+if __name__ == "__main__":
+    run_all_tests()
@@ -0,0 +1,96 @@
+"""
+Test script for the random-hyperplane LSH index.
+
+This script checks signatures, candidate retrieval and recall of the
+approximate index against exact cosine similarity search.
+"""
+
+import random
+
+from cosine_similarity import CosineSimilarity, SparseVector
+from lsh_index import LSHIndex
+
+
+def make_clustered_vectors(count, dimension, seed=3):
+    """Build vectors scattered around a few random directions."""
+    rng = random.Random(seed)
+    centers = [[rng.gauss(0, 1) for _ in range(dimension)] for _ in range(10)]
+    return [[value + rng.gauss(0, 0.3) for value in rng.choice(centers)]
+            for _ in range(count)]
+
+
+def test_signatures():
+    """Test that signatures follow the vector direction, not its length."""
+    print("Testing LSH signatures...")
+    
+    index = LSHIndex(dimension=4, bits=8, tables=3, seed=5)
+    signatures = index.signatures([1, -2, 3, 0.5])
+    assert len(signatures) == 3
+    assert all(0 <= signature < 2 ** 8 for signature in signatures)
+    assert index.signatures([2, -4, 6, 1]) == signatures
+    assert index.signatures(SparseVector.from_dense([1, -2, 3, 0.5])) == signatures
+    print("✓ Signature tests passed")
+
+
+def test_approximate_queries():
+    """Test exact re-ranking, candidate pruning and recall."""
+    print("\nTesting LSH queries...")
+    
+    # Queries come from the same clusters as the stored vectors
+    generated = make_clustered_vectors(620, 16)
+    vectors, queries = generated[:600], generated[600:]
+    index = LSHIndex(dimension=16, bits=8, tables=8, seed=1)
+    index.add_all(vectors)
+    
+    # Returned scores are exact cosine similarities, best first
+    results = index.query(queries[0], k=5)
+    for item_id, score in results:
+        assert score == CosineSimilarity.cosine_similarity(queries[0], vectors[item_id])
+    assert [score for _, score in results] == sorted(
+        (score for _, score in results), reverse=True)
+    print("✓ Exact re-ranking tests passed")
+    
+    # Only a fraction of the corpus is scored, yet recall stays high
+    assert len(index.candidates(queries[0])) < len(vectors)
+    assert index.recall_at_k(queries, k=10) > 0.8
+    probing = LSHIndex(dimension=16, bits=8, tables=8, probe_radius=1, seed=1)
+    probing.add_all(vectors)
+    assert probing.recall_at_k(queries, k=10) >= index.recall_at_k(queries, k=10)
+    print("✓ Candidate pruning and recall tests passed")
+    
+    # Exclusion filter
+    first = index.query(vectors[0], k=1)[0][0]
+    assert index.query(vectors[0], k=1, exclude={first})[0][0] != first
+    print("✓ Exclusion filter tests passed")
+    
+    # Ids must match the vectors one for one
+    try:
+        LSHIndex(dimension=16).add_all(vectors[:3], ids=["a", "b"])
+        assert False, "Should raise ValueError"
+    except ValueError:
+        pass
+    print("✓ Id count tests passed")
+
+
+def run_all_tests():
+    """Run all test functions."""
+    print("=" * 60)
+    print("LSH INDEX - UNIT TESTS")
+    print("=" * 60)
+    
+    try:
+        test_signatures()
+        test_approximate_queries()
+        
+        print("\n" + "=" * 60)
+        print("ALL TESTS PASSED! ✓")
+        print("=" * 60)
+        
+    except AssertionError as e:
+        print(f"\n❌ Test failed: {e}")
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+
+
+if __name__ == "__main__":
+    run_all_tests()
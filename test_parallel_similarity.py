@@ -0,0 +1,82 @@
+"""
+Test script for the parallel similarity matrix.
+
+This script checks that the process-pool computation reproduces the serial
+similarity matrix exactly and reports how the work was distributed.
+"""
+
+import random
+
+from cosine_similarity import CosineSimilarity
+from parallel_similarity import parallel_similarity_matrix
+
+
+def make_corpus(count, seed=7):
+    """Build a small random corpus of short documents."""
+    rng = random.Random(seed)
+    words = ["data", "python", "machine", "learning", "vector", "cosine",
+             "matrix", "text", "search", "model", "index", "query"]
+    return [" ".join(rng.choice(words) for _ in range(rng.randint(1, 8)))
+            for _ in range(count)]
+
+
+def test_parallel_matches_serial():
+    """Test that parallel results equal the serial results exactly."""
+    print("Testing parallel similarity matrix...")
+    
+    texts = make_corpus(60)
+    expected = CosineSimilarity.similarity_matrix(texts, use_numpy=False)
+    
+    result = parallel_similarity_matrix(texts, workers=3, block_size=7)
+    assert result.matrix == expected
+    print("✓ Multi-process result matches serial result")
+    
+    result = parallel_similarity_matrix(texts, workers=1)
+    assert result.matrix == expected
+    print("✓ Single-process result matches serial result")
+    
+    for workers in (0, -1):
+        try:
+            parallel_similarity_matrix(texts, workers=workers)
+            assert False, "Should raise ValueError"
+        except ValueError:
+            pass
+    print("✓ Worker count validation tests passed")
+
+
+def test_work_distribution_report():
+    """Test the per-worker statistics."""
+    print("\nTesting work distribution report...")
+    
+    texts = make_corpus(40)
+    result = parallel_similarity_matrix(texts, workers=2, block_size=5)
+    assert 1 <= len(result.workers) <= 2
+    assert sum(stats.blocks for stats in result.workers) == 8
+    assert sum(stats.rows for stats in result.workers) == 40
+    assert sum(stats.pairs for stats in result.workers) == 40 * 40
+    assert "worker" in result.format_report()
+    print("✓ Work distribution report tests passed")
+
+
+def run_all_tests():
+    """Run all test functions."""
+    print("=" * 60)
+    print("PARALLEL SIMILARITY - UNIT TESTS")
+    print("=" * 60)
+    
+    try:
+        test_parallel_matches_serial()
+        test_work_distribution_report()
+        
+        print("\n" + "=" * 60)
+        print("ALL TESTS PASSED! ✓")
+        print("=" * 60)
+        
+    except AssertionError as e:
+        print(f"\n❌ Test failed: {e}")
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+
+
+if __name__ == "__main__":
+    run_all_tests()
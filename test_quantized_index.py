@@ -0,0 +1,139 @@
+"""
+Test script for the int8 quantized vector index.
+
+This script checks quantization, exact re-scoring and the ranking error of
+the quantized scan against exact cosine similarity search.
+"""
+
+import random
+from array import array
+
+from cosine_similarity import CosineSimilarity, CompactVector, SparseVector, np
+from quantized_index import QuantizedIndex
+
+
+def make_clustered_vectors(count, dimension, seed=3):
+    """Build vectors scattered around a few random directions."""
+    rng = random.Random(seed)
+    centers = [[rng.gauss(0, 1) for _ in range(dimension)] for _ in range(10)]
+    return [[value + rng.gauss(0, 0.3) for value in rng.choice(centers)]
+            for _ in range(count)]
+
+
+def test_quantization():
+    """Test int8 codes, scales and memory use."""
+    print("Testing quantization...")
+    
+    codes, scale = QuantizedIndex.quantize([0.2, -0.4, 0.1, 0.0])
+    assert codes.typecode == "b" and max(abs(code) for code in codes) == 127
+    for code, value in zip(codes, [0.2, -0.4, 0.1, 0.0]):
+        assert abs(code * scale - value) <= scale / 2
+    zero_codes, zero_scale = QuantizedIndex.quantize([0.0, 0.0])
+    assert zero_codes.tolist() == [0, 0] and zero_scale == 0.0
+    assert QuantizedIndex.quantize(SparseVector.from_dense([0.2, -0.4, 0.1, 0.0]))[0] == codes
+    
+    vectors = make_clustered_vectors(100, 64)
+    index = QuantizedIndex.from_vectors(vectors)
+    float32_bytes = sum(CompactVector(vector).nbytes for vector in vectors)
+    assert index.scan_nbytes < float32_bytes / 3
+    # Originals kept for re-scoring (as float32) are counted, unless fetched
+    # elsewhere
+    assert index.nbytes == index.scan_nbytes + 100 * 64 * 4
+    external = QuantizedIndex.from_vectors(vectors, original=vectors.__getitem__)
+    assert external.nbytes == external.scan_nbytes == index.scan_nbytes
+    try:
+        QuantizedIndex.from_vectors(vectors, ids=["a", "b"])
+        assert False, "Should raise ValueError"
+    except ValueError:
+        pass
+    print("✓ Quantization tests passed")
+
+
+def test_quantized_queries():
+    """Test exact re-scoring and ranking error against exact search."""
+    print("\nTesting quantized queries...")
+    
+    generated = make_clustered_vectors(520, 24)
+    vectors, queries = generated[:500], generated[500:]
+    index = QuantizedIndex.from_vectors(vectors)
+    
+    # Returned scores are exact cosine similarities of the kept float32
+    # originals, best first
+    results = index.query(queries[0], k=5)
+    for item_id, score in results:
+        assert score == CosineSimilarity.cosine_similarity(
+            queries[0], array("f", vectors[item_id]))
+    assert [score for _, score in results] == sorted(
+        (score for _, score in results), reverse=True)
+    print("✓ Exact re-scoring tests passed")
+    
+    # Estimated scores are close, and re-scoring recovers the exact top-k
+    report = index.ranking_report(queries, k=10)
+    assert report["max_abs_score_error"] < 0.02
+    assert report["approximate_recall_at_k"] > 0.8
+    assert report["recall_at_k"] >= report["approximate_recall_at_k"]
+    assert report["recall_at_k"] > 0.95
+    print("✓ Ranking error tests passed")
+    
+    # Originals can come from elsewhere, e.g. a disk-backed store
+    fetched = []
+    external = QuantizedIndex.from_vectors(
+        vectors, original=lambda position: fetched.append(position) or vectors[position])
+    external_results = external.query(queries[0], k=5)
+    assert [item_id for item_id, _ in external_results] == [item_id for item_id, _ in results]
+    for item_id, score in external_results:
+        assert score == CosineSimilarity.cosine_similarity(queries[0], vectors[item_id])
+    assert len(fetched) == 5 * 4
+    print("✓ External original tests passed")
+    
+    # Zero vectors are stored but never returned
+    index.add([0.0] * 24, "zero")
+    assert "zero" in index
+    assert all(item_id != "zero" for item_id, _ in index.query(queries[0], k=len(index)))
+    try:
+        index.query([0.0] * 24)
+        assert False, "Should raise ValueError"
+    except ValueError:
+        pass
+    print("✓ Zero vector tests passed")
+    
+    # The NumPy scan ranks like the pure Python one, ties by position
+    if np is not None:
+        for query in queries:
+            python = index.approximate_query(query, k=7, use_numpy=False)
+            fast = index.approximate_query(query, k=7, use_numpy=True)
+            assert [item_id for item_id, _ in fast] == [item_id for item_id, _ in python]
+            assert all(abs(a - b) < 1e-5 for (_, a), (_, b) in zip(fast, python))
+        tied = QuantizedIndex.from_vectors([[1.0, 0.0]] * 6 + [[0.0, 1.0]])
+        tied.BLOCK_ROWS = 4
+        assert [item_id for item_id, _ in tied.approximate_query(
+            [1.0, 0.0], k=3, use_numpy=True)] == [0, 1, 2]
+        blocked = QuantizedIndex.from_vectors(vectors)
+        blocked.BLOCK_ROWS = 64
+        assert (blocked.approximate_query(queries[0], k=7, use_numpy=True)
+                == index.approximate_query(queries[0], k=7, use_numpy=True))
+        print("✓ NumPy scan tests passed")
+
+
+def run_all_tests():
+    """Run all test functions."""
+    print("=" * 60)
+    print("QUANTIZED INDEX - UNIT TESTS")
+    print("=" * 60)
+    
+    try:
+        test_quantization()
+        test_quantized_queries()
+        
+        print("\n" + "=" * 60)
+        print("ALL TESTS PASSED! ✓")
+        print("=" * 60)
+        
+    except AssertionError as e:
+        print(f"\n❌ Test failed: {e}")
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+
+
+if __name__ == "__main__":
+    run_all_tests()
@@ -0,0 +1,99 @@
+"""
+Test script for the item-item collaborative filtering engine.
+
+This script checks neighbour lists against brute-force cosine similarity
+and the aggregation used for recommendations.
+"""
+
+import random
+
+from cosine_similarity import CosineSimilarity
+from recommender import ItemItemRecommender
+
+
+def make_ratings(users, items, per_user, seed=4):
+    """Build random (user, item, rating) triples."""
+    rng = random.Random(seed)
+    return [(f"u{user}", f"i{item}", rng.randint(1, 5))
+            for user in range(users) for item in rng.sample(range(items), per_user)]
+
+
+def test_neighbour_lists():
+    """Test that truncated neighbour lists match brute-force item similarity."""
+    print("Testing item neighbour lists...")
+    
+    ratings = make_ratings(users=40, items=30, per_user=5)
+    engine = ItemItemRecommender(neighbours=5)
+    engine.add_ratings(ratings)
+    engine.fit()
+    
+    users = sorted({user for user, _, _ in ratings}, key=lambda user: int(user[1:]))
+    columns = {}
+    for user, item, rating in ratings:
+        columns.setdefault(item, [0.0] * len(users))[users.index(user)] = float(rating)
+    for item, column in columns.items():
+        expected = sorted(((CosineSimilarity.cosine_similarity(column, other_column), other)
+                           for other, other_column in columns.items() if other != item),
+                          key=lambda entry: -entry[0])
+        expected = [score for score, _ in expected if score > 0][:5]
+        assert [score for _, score in engine.similar_items(item)] == expected
+    print("✓ Neighbour list tests passed")
+
+
+def test_recommendations():
+    """Test weighted aggregation over the neighbours of rated items."""
+    print("\nTesting recommendations...")
+    
+    engine = ItemItemRecommender(neighbours=2)
+    engine.add_ratings([("ann", "A", 5), ("ann", "B", 1),
+                        ("bob", "A", 5), ("bob", "C", 5), ("bob", "B", 1),
+                        ("cat", "B", 5), ("cat", "D", 5), ("dan", "C", 4)])
+    engine.fit()
+    recommendations = engine.recommend("ann")
+    assert {item for item, _ in recommendations} == {"C", "D"}
+    assert recommendations[0][0] == "C"
+    
+    # The score is the similarity-weighted average of the user's ratings
+    similarity = dict(engine.similar_items("A"))["C"]
+    weights = {other: score for other, score in engine.similar_items("B")}
+    expected = ((similarity * 5 + weights.get("C", 0.0) * 1)
+                / (similarity + weights.get("C", 0.0)))
+    assert abs(recommendations[0][1] - expected) < 1e-12
+    assert len(engine.recommend("ann", n=1)) == 1
+    print("✓ Aggregation tests passed")
+    
+    # Rated items are never recommended; new ratings count before refitting
+    engine.add_rating("ann", "C", 3)
+    assert [item for item, _ in engine.recommend("ann")] == ["D"]
+    engine.add_rating("ann", "C", 0)
+    assert "C" in dict(engine.recommend("ann"))
+    try:
+        engine.recommend("nobody")
+        assert False, "Should raise KeyError"
+    except KeyError:
+        pass
+    print("✓ Rated item and unknown user tests passed")
+
+
+def run_all_tests():
+    """Run all test functions."""
+    print("=" * 60)
+    print("ITEM-ITEM RECOMMENDER - UNIT TESTS")
+    print("=" * 60)
+    
+    try:
+        test_neighbour_lists()
+        test_recommendations()
+        
+        print("\n" + "=" * 60)
+        print("ALL TESTS PASSED! ✓")
+        print("=" * 60)
+        
+    except AssertionError as e:
+        print(f"\n❌ Test failed: {e}")
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+
+
+if __name__ == "__main__":
+    run_all_tests()
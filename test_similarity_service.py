@@ -0,0 +1,132 @@
+"""
+Test script for the micro-batching similarity service.
+
+This script checks batch scoring against document_similarity, the
+size/time batching windows, and a full server round trip.
+"""
+
+import asyncio
+import json
+
+from cosine_similarity import CosineSimilarity
+from similarity_service import MicroBatcher, SimilarityServer, generate_load
+
+
+def test_micro_batching():
+    """Test that batched scores match and batches follow the window."""
+    print("Testing micro-batching...")
+    
+    pairs = [("the cat sat", "the dog sat"), ("a b c", "c b a"),
+             ("hello world", "hello python"), ("the cat sat", "a cat")]
+    
+    async def submit_all(batcher):
+        return await asyncio.gather(*(batcher.submit(a, b) for a, b in pairs * 5))
+    
+    # Size window: 20 requests in batches of 8 -> 8, 8 and a timed-out 4
+    batcher = MicroBatcher(max_batch_size=8, max_delay=0.01)
+    scores = asyncio.run(submit_all(batcher))
+    assert scores == [CosineSimilarity.document_similarity(a, b) for a, b in pairs * 5]
+    assert batcher.batches == 3 and batcher.requests == 20
+    print("✓ Batched score tests passed")
+    
+    # Time window: everything submitted together lands in one batch
+    batcher = MicroBatcher(max_batch_size=100, max_delay=0.01)
+    asyncio.run(submit_all(batcher))
+    assert batcher.batches == 1
+    print("✓ Batching window tests passed")
+    
+    # An empty document only fails its own request
+    async def with_error():
+        batcher = MicroBatcher(max_batch_size=10, max_delay=0.01)
+        return await asyncio.gather(batcher.submit("a b", "a"), batcher.submit("", "a"),
+                                    return_exceptions=True)
+    
+    good, bad = asyncio.run(with_error())
+    assert good == CosineSimilarity.document_similarity("a b", "a")
+    assert isinstance(bad, ValueError)
+    
+    # A non-string document is rejected before it can reach a batch
+    async def with_wrong_type():
+        batcher = MicroBatcher(max_batch_size=10, max_delay=0.01)
+        return await asyncio.gather(batcher.submit(5, "a"), batcher.submit("a b", "a"),
+                                    return_exceptions=True)
+    
+    wrong, good = asyncio.run(with_wrong_type())
+    assert isinstance(wrong, TypeError)
+    assert good == CosineSimilarity.document_similarity("a b", "a")
+    print("✓ Per-request error tests passed")
+    
+    # An unexpected failure while scoring fails every request of the batch
+    class BrokenBatcher(MicroBatcher):
+        @staticmethod
+        def score_batch(pairs):
+            raise RuntimeError("scoring failed")
+    
+    async def with_broken_batch():
+        batcher = BrokenBatcher(max_batch_size=10, max_delay=0.01)
+        return await asyncio.wait_for(asyncio.gather(
+            batcher.submit("a", "b"), batcher.submit("c", "d"),
+            return_exceptions=True), timeout=5)
+    
+    assert all(isinstance(result, RuntimeError) for result in asyncio.run(with_broken_batch()))
+    print("✓ Batch failure tests passed")
+
+
+def test_server_round_trip():
+    """Test the JSON-lines protocol and the load generator."""
+    print("\nTesting similarity server...")
+    
+    async def run():
+        server = SimilarityServer(MicroBatcher(max_batch_size=16, max_delay=0.005))
+        port = await server.start()
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(b'{"id": 1, "a": "hello world", "b": "hello python"}\n')
+            writer.write(b'{"id": 2, "a": "", "b": "hello"}\n')
+            writer.write(b'{"id": 3, "a": "hello"}\nnot json\n')
+            writer.write(b'{"id": 4, "a": 5, "b": "hello"}\n')
+            responses = [json.loads(await reader.readline()) for _ in range(5)]
+            writer.close()
+            report = await generate_load("127.0.0.1", port, requests=200, concurrency=20)
+        finally:
+            await server.close()
+        return responses, report, server.batcher
+    
+    responses, report, batcher = asyncio.run(run())
+    by_id = {response["id"]: response for response in responses}
+    assert by_id[1]["similarity"] == CosineSimilarity.document_similarity(
+        "hello world", "hello python")
+    assert "zero vectors" in by_id[2]["error"]
+    assert "Missing field" in by_id[3]["error"]
+    assert "must be strings" in by_id[4]["error"]
+    assert "error" in by_id[None]
+    print("✓ Protocol tests passed")
+    
+    assert len(report.latencies) == 200 and report.errors == 0
+    assert 0 < report.percentile(50) <= report.percentile(99)
+    assert batcher.batches < batcher.requests
+    print("✓ Load generator tests passed")
+
+
+def run_all_tests():
+    """Run all test functions."""
+    print("=" * 60)
+    print("SIMILARITY SERVICE - UNIT TESTS")
+    print("=" * 60)
+    
+    try:
+        test_micro_batching()
+        test_server_round_trip()
+        
+        print("\n" + "=" * 60)
+        print("ALL TESTS PASSED! ✓")
+        print("=" * 60)
+        
+    except AssertionError as e:
+        print(f"\n❌ Test failed: {e}")
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+
+
+if __name__ == "__main__":
+    run_all_tests()
@@ -0,0 +1,105 @@
+"""
+Test script for the memory-mapped vector store.
+
+This script checks that vectors written to disk are read back in place and
+that top-k queries over the store agree with exact cosine similarity.
+"""
+
+import os
+import tempfile
+
+from cosine_similarity import CosineSimilarity, CosineIndex, SparseVector
+from vector_store import VectorStore
+
+
+def test_store_round_trip():
+    """Test writing and reading back vectors, norms and ids."""
+    print("Testing vector store round trip...")
+    
+    path = os.path.join(tempfile.mkdtemp(), "vectors.bin")
+    vectors = [[3, 4, 0], [0, 0, 0], [1, 2, 2], [0.5, 0.25, 0]]
+    VectorStore.write(path, vectors, ids=["a", "b", "c", "d"])
+    
+    with VectorStore(path) as store:
+        assert len(store) == 4 and store.dimension == 3
+        assert store.vector(0) == [3.0, 4.0, 0.0]
+        assert store.norm(0) == 5.0 and store.norm(1) == 0.0
+        assert store.item_id(2) == "c" and store.position("d") == 3
+        assert isinstance(store.row(3), memoryview)
+    print("✓ Round trip tests passed")
+    
+    # Test a store without ids, written through the streaming writer
+    with VectorStore.create(path, dimension=3) as writer:
+        writer.add(SparseVector.from_dict({2: 1.0}, 3))
+        writer.add([1, 1, 0])
+    with VectorStore(path) as store:
+        assert store.item_id(1) == 1 and store.vector(0) == [0.0, 0.0, 1.0]
+    try:
+        VectorStore.write(path, vectors, ids=["a", "b"])
+        assert False, "Should raise ValueError"
+    except ValueError:
+        pass
+    print("✓ Streaming writer tests passed")
+
+
+def test_store_queries():
+    """Test scoring and top-k queries over the store."""
+    print("\nTesting vector store queries...")
+    
+    path = os.path.join(tempfile.mkdtemp(), "vectors.bin")
+    vectors = [[1, 0, 0], [1, 1, 0], [0, 1, 0], [0, 0, 0], [1, 1, 1], [0, 0, 2]]
+    VectorStore.write(path, vectors)
+    index = CosineIndex.from_vectors(vectors)
+    query = [1, 0.5, 0.25]
+    
+    with VectorStore(path) as store:
+        # Values are exactly representable in float32, so scores are exact
+        assert (store.cosine_similarity(query, 4)
+                == CosineSimilarity.cosine_similarity(query, vectors[4]))
+        
+        expected = index.query(query, k=3)
+        assert store.query(query, k=3, use_numpy=False) == expected
+        assert store.query(query, k=10, exclude=[0], use_numpy=False) == [
+            entry for entry in index.query(query, k=10) if entry[0] != 0]
+        assert store.query(query, k=10, exclude=[0, "unknown"], use_numpy=False) == [
+            entry for entry in index.query(query, k=10) if entry[0] != 0]
+        if CosineSimilarity._resolve_numpy(None):
+            results = store.query(query, k=3, use_numpy=True)
+            assert [item_id for item_id, _ in results] == [i for i, _ in expected]
+            assert all(abs(score - exact) < 1e-6
+                       for (_, score), (_, exact) in zip(results, expected))
+    
+    # Tied scores keep row order, also across NumPy blocks
+    tied_path = os.path.join(tempfile.mkdtemp(), "tied.bin")
+    VectorStore.write(tied_path, [[1, 0]] * 7 + [[0, 1]])
+    with VectorStore(tied_path) as store:
+        for use_numpy in ([False, True] if CosineSimilarity._resolve_numpy(None)
+                          else [False]):
+            store.BLOCK_ROWS = 3
+            assert [item_id for item_id, _ in store.query(
+                [1, 0], k=2, use_numpy=use_numpy)] == [0, 1]
+    print("✓ Store query tests passed")
+
+
+def run_all_tests():
+    """Run all test functions."""
+    print("=" * 60)
+    print("VECTOR STORE - UNIT TESTS")
+    print("=" * 60)
+    
+    try:
+        test_store_round_trip()
+        test_store_queries()
+        
+        print("\n" + "=" * 60)
+        print("ALL TESTS PASSED! ✓")
+        print("=" * 60)
+        
+    except AssertionError as e:
+        print(f"\n❌ Test failed: {e}")
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+
+
+if __name__ == "__main__":
+    run_all_tests()
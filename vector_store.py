@@ -0,0 +1,497 @@
+"""
+Memory-Mapped Vector Store
+==========================
+
+This module stores fixed-width float32 vectors in a binary file that is read
+back with ``mmap``, so corpora larger than RAM can be scored without loading
+them into Python lists. Pages are brought in by the operating system only
+when the rows are touched.
+
+File Layout (little-endian):
+    header   magic "CSVS", version, flags, dimension, row count,
+             and the byte offsets of the sections below
+    rows     count × dimension float32 values
+    norms    count float64 magnitudes, precomputed when writing
+    ids      optional id table: count + 1 uint64 offsets into a UTF-8 blob
+
+Rows are exposed as zero-copy ``memoryview`` slices of the mapping. When
+NumPy is installed, top-k queries scan the rows in blocks through
+``numpy.frombuffer`` views of the same mapping.
+"""
+
+import heapq
+import itertools
+import math
+import mmap
+import struct
+import sys
+from array import array
+from typing import List, Tuple, Optional, Iterable, Collection, Hashable
+
+from cosine_similarity import CosineSimilarity, SparseVector, Vector, np
+
+
+MAGIC = b"CSVS"
+VERSION = 1
+FLAG_HAS_IDS = 1
+
+# magic, version, flags, dimension, count, norms offset, ids offset, blob offset
+HEADER = struct.Struct("<4sIIIQQQQ")
+
+
+def _check_byte_order() -> None:
+    """The file is little-endian and read without byte swapping."""
+    if sys.byteorder != "little":
+        raise RuntimeError("VectorStore requires a little-endian platform")
+
+
+class VectorStoreWriter:
+    """
+    Sequential writer for a vector store file.
+
+    Rows are written to disk as they are added; only the norms and ids are
+    kept in memory until ``close`` writes the trailing sections and header.
+    Use ``VectorStore.create`` to obtain a writer.
+
+    Example:
+        >>> import os, tempfile
+        >>> path = os.path.join(tempfile.mkdtemp(), "vectors.bin")
+        >>> with VectorStore.create(path, dimension=2) as writer:
+        ...     position = writer.add([3, 4], "a")
+        >>> with VectorStore(path) as store:
+        ...     store.norm(0), store.item_id(0)
+        (5.0, 'a')
+    """
+
+    def __init__(self, path: str, dimension: int):
+        """
+        Open a new vector store file for writing.
+
+        Args:
+            path: Destination file path (overwritten)
+            dimension: Length of every vector
+        """
+        _check_byte_order()
+        if dimension < 1:
+            raise ValueError("dimension must be at least 1")
+        self.path = path
+        self.dimension = dimension
+        self._file = open(path, "wb")
+        self._file.write(b"\0" * HEADER.size)
+        self._norms = array("d")
+        self._id_offsets = array("Q", [0])
+        self._id_blob = bytearray()
+        self._has_ids: Optional[bool] = None
+
+    def add(self, vector: Vector, item_id: Optional[str] = None) -> int:
+        """
+        Append one vector.
+
+        Args:
+            vector: Vector as a list of numbers or a SparseVector
+            item_id: Optional string id; either every row or no row has one
+
+        Returns:
+            int: Position of the row in the store
+
+        Raises:
+            ValueError: If the dimension differs or ids are used for some
+                rows only
+        """
+        if len(vector) != self.dimension:
+            raise ValueError("Vectors must have the same length")
+        has_id = item_id is not None
+        if self._has_ids is None:
+            self._has_ids = has_id
+        elif self._has_ids != has_id:
+            raise ValueError("Either every vector or no vector must have an id")
+
+        if isinstance(vector, SparseVector):
+            vector = vector.to_dense()
+        row = array("f", vector)
+        self._file.write(row.tobytes())
+
+        # Norm of the stored float32 values, so scores match the rows on disk
+        self._norms.append(math.sqrt(sum(value * value for value in row)))
+        if has_id:
+            self._id_blob += str(item_id).encode("utf-8")
+            self._id_offsets.append(len(self._id_blob))
+        return len(self._norms) - 1
+
+    def add_all(self, vectors: Iterable[Vector],
+                ids: Optional[Iterable[str]] = None) -> None:
+        """
+        Append several vectors.
+
+        Args:
+            vectors: Vectors as lists of numbers or SparseVectors
+            ids: Optional string ids, one per vector
+
+        Raises:
+            ValueError: If ids are given but their count differs from the
+                number of vectors (detected when the shorter one runs out)
+        """
+        if ids is None:
+            for vector in vectors:
+                self.add(vector)
+            return
+        missing = object()
+        for vector, item_id in itertools.zip_longest(vectors, ids, fillvalue=missing):
+            if vector is missing or item_id is missing:
+                raise ValueError("vectors and ids must have the same length")
+            self.add(vector, item_id)
+
+    def close(self) -> None:
+        """Write the norm and id sections and the header, then close the file."""
+        if self._file.closed:
+            return
+        count = len(self._norms)
+        norms_offset = self._file.tell()
+        self._file.write(self._norms.tobytes())
+
+        flags = ids_offset = blob_offset = 0
+        if self._has_ids:
+            flags |= FLAG_HAS_IDS
+            ids_offset = self._file.tell()
+            self._file.write(self._id_offsets.tobytes())
+            blob_offset = self._file.tell()
+            self._file.write(bytes(self._id_blob))
+
+        self._file.seek(0)
+        self._file.write(HEADER.pack(MAGIC, VERSION, flags, self.dimension, count,
+                                     norms_offset, ids_offset, blob_offset))
+        self._file.close()
+
+    def __enter__(self) -> "VectorStoreWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+
+class VectorStore:
+    """
+    Read-only, memory-mapped store of float32 vectors with precomputed norms.
+
+    Rows are never deserialized into lists: ``row`` returns a memoryview into
+    the mapping and queries read the rows in place.
+
+    Example:
+        >>> import os, tempfile
+        >>> path = os.path.join(tempfile.mkdtemp(), "vectors.bin")
+        >>> VectorStore.write(path, [[1, 0], [1, 1], [0, 1]], ids=["x", "y", "z"])
+        >>> with VectorStore(path) as store:
+        ...     [item_id for item_id, _ in store.query([1, 0.1], k=2)]
+        ['x', 'y']
+    """
+
+    # Rows scored per NumPy block during queries
+    BLOCK_ROWS = 8192
+
+    def __init__(self, path: str):
+        """
+        Open and memory-map a vector store file.
+
+        Args:
+            path: File written by VectorStoreWriter
+
+        Raises:
+            ValueError: If the file is not a vector store
+        """
+        _check_byte_order()
+        self.path = path
+        self._view = self._rows = self._norms = None
+        self._id_offsets = self._id_blob = None
+        self._positions = None
+        self._file = open(path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"{path} is not a vector store file")
+
+        (magic, version, flags, self.dimension, self._count, norms_offset,
+         ids_offset, blob_offset) = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a vector store file")
+
+        view = self._view = memoryview(self._mmap)
+        self._rows = view[HEADER.size:norms_offset].cast("f")
+        self._norms = view[norms_offset:norms_offset + 8 * self._count].cast("d")
+        if flags & FLAG_HAS_IDS:
+            self._id_offsets = view[ids_offset:blob_offset].cast("Q")
+            self._id_blob = view[blob_offset:]
+
+    @staticmethod
+    def create(path: str, dimension: int) -> VectorStoreWriter:
+        """
+        Start writing a new vector store file.
+
+        Args:
+            path: Destination file path (overwritten)
+            dimension: Length of every vector
+
+        Returns:
+            VectorStoreWriter: Writer to add vectors to
+        """
+        return VectorStoreWriter(path, dimension)
+
+    @staticmethod
+    def write(path: str, vectors: Iterable[Vector],
+              ids: Optional[Iterable[str]] = None,
+              dimension: Optional[int] = None) -> None:
+        """
+        Write vectors to a new vector store file in one call.
+
+        Args:
+            path: Destination file path (overwritten)
+            vectors: Vectors as lists of numbers or SparseVectors
+            ids: Optional string ids, one per vector
+            dimension: Vector length (defaults to the length of the first
+                vector)
+
+        Raises:
+            ValueError: If the store would be empty without a dimension, or
+                ids are given but their count differs from the vectors
+        """
+        vectors = iter(vectors)
+        first = next(vectors, None)
+        if first is None and dimension is None:
+            raise ValueError("Cannot infer the dimension of an empty store")
+        if first is not None:
+            vectors = itertools.chain([first], vectors)
+        with VectorStoreWriter(path, dimension or len(first)) as writer:
+            writer.add_all(vectors, ids)
+
+    def row(self, position: int) -> memoryview:
+        """
+        Return a zero-copy view of one stored vector.
+
+        Args:
+            position: Row position
+
+        Returns:
+            memoryview: float32 values of the row
+        """
+        if not 0 <= position < self._count:
+            raise IndexError("Row position out of range")
+        start = position * self.dimension
+        return self._rows[start:start + self.dimension]
+
+    def vector(self, position: int) -> List[float]:
+        """
+        Copy one stored vector into a list.
+
+        Args:
+            position: Row position
+
+        Returns:
+            List[float]: The vector
+        """
+        return self.row(position).tolist()
+
+    def norm(self, position: int) -> float:
+        """
+        Return the precomputed magnitude of a stored vector.
+
+        Args:
+            position: Row position
+
+        Returns:
+            float: The magnitude
+        """
+        return self._norms[position]
+
+    def item_id(self, position: int) -> Hashable:
+        """
+        Return the id of a stored vector (its position if ids were not stored).
+
+        Args:
+            position: Row position
+
+        Returns:
+            Hashable: The id
+        """
+        if self._id_offsets is None:
+            return position
+        start, end = self._id_offsets[position], self._id_offsets[position + 1]
+        return bytes(self._id_blob[start:end]).decode("utf-8")
+
+    def position(self, item_id: Hashable) -> int:
+        """
+        Return the row position of an id.
+
+        The reverse mapping is built on first use.
+
+        Args:
+            item_id: Id of a stored vector
+
+        Returns:
+            int: Row position
+
+        Raises:
+            KeyError: If the id is unknown
+        """
+        if self._id_offsets is None:
+            if isinstance(item_id, int) and 0 <= item_id < self._count:
+                return item_id
+            raise KeyError(item_id)
+        if self._positions is None:
+            self._positions = {self.item_id(i): i for i in range(self._count)}
+        return self._positions[item_id]
+
+    def cosine_similarity(self, query: Vector, position: int) -> float:
+        """
+        Calculate the cosine similarity between a query and a stored vector.
+
+        Args:
+            query: Query vector (list of numbers or SparseVector)
+            position: Row position
+
+        Returns:
+            float: Cosine similarity value between -1 and 1
+
+        Raises:
+            ValueError: If lengths differ or a zero vector is involved
+        """
+        if len(query) != self.dimension:
+            raise ValueError("Vectors must have the same length")
+        query_norm = CosineSimilarity.magnitude(query)
+        stored_norm = self._norms[position]
+        if query_norm == 0 or stored_norm == 0:
+            raise ValueError("Cannot compute cosine similarity for zero vectors")
+        dot_prod = CosineSimilarity.dot_product(query, self.row(position))
+        return max(-1.0, min(1.0, dot_prod / (query_norm * stored_norm)))
+
+    def query(self, query: Vector, k: int = 10,
+              exclude: Optional[Collection[Hashable]] = None,
+              use_numpy: Optional[bool] = None) -> List[Tuple[Hashable, float]]:
+        """
+        Find the k stored vectors most similar to a query.
+
+        Stored zero vectors are skipped. Only k candidates are kept in a
+        bounded heap while the rows are scanned in place.
+
+        Args:
+            query: Query vector (list of numbers or SparseVector)
+            k: Number of results to return
+            exclude: Ids that must not appear in the results (ids not in
+                the store are ignored)
+            use_numpy: Backend selection, as for
+                ``CosineSimilarity.similarity_matrix``
+
+        Returns:
+            List[Tuple[Hashable, float]]: Up to k (id, similarity) pairs,
+            best first; ties keep row order
+
+        Raises:
+            ValueError: If the query has the wrong length or is a zero vector
+        """
+        if len(query) != self.dimension:
+            raise ValueError("Vectors must have the same length")
+        query_norm = CosineSimilarity.magnitude(query)
+        if query_norm == 0:
+            raise ValueError("Cannot compute cosine similarity for zero vectors")
+        if k <= 0 or self._count == 0:
+            return []
+
+        excluded = set()
+        for item_id in exclude or ():
+            try:
+                excluded.add(self.position(item_id))
+            except KeyError:
+                pass
+        if CosineSimilarity._resolve_numpy(use_numpy):
+            best = self._top_k_numpy(query, query_norm, k, excluded)
+        else:
+            best = self._top_k_python(query, query_norm, k, excluded)
+        return [(self.item_id(position), score) for score, position in best]
+
+    def _top_k_python(self, query: Vector, query_norm: float, k: int,
+                      excluded: Collection[int]) -> List[Tuple[float, int]]:
+        """Scan every row with pure Python dot products."""
+        if isinstance(query, SparseVector):
+            query = query.to_dense()
+
+        def candidates():
+            for position in range(self._count):
+                stored_norm = self._norms[position]
+                if stored_norm == 0 or position in excluded:
+                    continue
+                dot_prod = CosineSimilarity._unchecked_dot(self.row(position), query)
+                score = max(-1.0, min(1.0, dot_prod / (query_norm * stored_norm)))
+                yield score, position
+
+        return heapq.nlargest(k, candidates(), key=lambda entry: entry[0])
+
+    def _top_k_numpy(self, query: Vector, query_norm: float, k: int,
+                     excluded: Collection[int]) -> List[Tuple[float, int]]:
+        """Scan the rows in blocks of zero-copy NumPy views."""
+        if isinstance(query, SparseVector):
+            query = query.to_dense()
+        # A float32 query keeps the product from upcasting each block of rows
+        query = np.asarray(query, dtype=np.float32)
+        rows = np.frombuffer(self._rows, dtype=np.float32).reshape(
+            self._count, self.dimension)
+        norms = np.frombuffer(self._norms, dtype=np.float64)
+
+        heap: List[Tuple[float, int]] = []
+        for start in range(0, self._count, self.BLOCK_ROWS):
+            block_norms = norms[start:start + self.BLOCK_ROWS]
+            dots = rows[start:start + self.BLOCK_ROWS] @ query
+            with np.errstate(divide="ignore", invalid="ignore"):
+                scores = np.clip(dots / (block_norms * query_norm), -1.0, 1.0)
+            scores[block_norms == 0] = -np.inf
+            for position in excluded:
+                if start <= position < start + len(scores):
+                    scores[position - start] = -np.inf
+
+            # Only the block's own top k can enter the running top k; ties
+            # with its k-th best are kept too, so earlier rows win them
+            if len(scores) > k:
+                chosen = np.argpartition(-scores, k - 1)[:k]
+                candidates = np.flatnonzero(scores >= scores[chosen].min())
+            else:
+                candidates = np.arange(len(scores))
+            for offset in candidates.tolist():
+                score = float(scores[offset])
+                if score == -np.inf:
+                    continue
+                entry = (score, -(start + offset))
+                if len(heap) < k:
+                    heapq.heappush(heap, entry)
+                elif entry > heap[0]:
+                    heapq.heapreplace(heap, entry)
+
+        return [(score, -negative_position)
+                for score, negative_position in sorted(heap, reverse=True)]
+
+    def close(self) -> None:
+        """Release the memory mapping and close the file."""
+        if self._mmap is None:
+            return
+        # Views into the mapping must be released before it can be closed
+        for view in (self._rows, self._norms, self._id_offsets, self._id_blob,
+                     self._view):
+            if view is not None:
+                view.release()
+        self._view = self._rows = self._norms = None
+        self._id_offsets = self._id_blob = None
+        try:
+            self._mmap.close()
+        except BufferError:
+            # Rows handed out by row() are still alive; the mapping is
+            # unmapped once the last of them is garbage collected
+            pass
+        self._mmap = None
+        self._file.close()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __enter__(self) -> "VectorStore":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()